@@ -0,0 +1,49 @@
+import argparse
+import sys
+
+from backend.benchmarks import BenchmarkSuite, DEFAULT_SCENARIOS, compare_with_baseline, default_baseline_path, \
+    load_report, save_report
+from backend.benchmarks.suite import format_header
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="engine benchmark on synthetic data")
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 10, 50], help="证券数")
+    parser.add_argument('--bars', type=int, nargs='+', default=[250, 1000, 2500], help="每只证券的K线条数")
+    parser.add_argument('--scenarios', nargs='+', default=None,
+                        choices=[scenario.name for scenario in DEFAULT_SCENARIOS], help="默认全部场景")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--min-seconds', type=float, default=0.25, help="每个组合累计计时的最少秒数")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=default_baseline_path(), help="基准文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基准, 不做比较")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="允许的相对波动")
+    parser.add_argument('--output', default=None, help="本次结果写入该JSON文件")
+    args = parser.parse_args()
+
+    scenarios = DEFAULT_SCENARIOS if args.scenarios is None \
+        else [scenario for scenario in DEFAULT_SCENARIOS if scenario.name in args.scenarios]
+    suite = BenchmarkSuite(args.symbols, args.bars, scenarios, repeats=args.repeats,
+                           min_seconds=args.min_seconds, seed=args.seed)
+
+    print(format_header())
+    report = suite.run(verbose=True)
+    if args.output is not None:
+        save_report(report, args.output)
+
+    if args.save_baseline:
+        save_report(report, args.baseline)
+        print("baseline saved: %s" % args.baseline)
+        sys.exit(0)
+
+    baseline = load_report(args.baseline)
+    if baseline is None:
+        print("no baseline at %s, run with --save-baseline first" % args.baseline)
+        sys.exit(0)
+
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    if regressions:
+        print("regressions against %s:" % args.baseline)
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+    print("no regressions against %s" % args.baseline)
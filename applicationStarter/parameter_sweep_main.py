@@ -0,0 +1,15 @@
+from backend.event_engine.parameter_sweep import ParameterSweepRunner
+from backend.strategy_library.MovingAverageCrossStrategy import MovingAverageCrossAbstractStrategy
+
+if __name__ == '__main__':
+    print("start...")
+
+    runner = ParameterSweepRunner(
+        MovingAverageCrossAbstractStrategy,
+        {'short_window': [3, 5, 10], 'long_window': [10, 20, 40, 60]},
+        ['SH510300', 'SH510500', 'SH510050'],
+        '2016-10-10',
+        initial_capital=100000.0
+    )
+    result = runner.run()
+    print(result.sort_values('sharpe_ratio', ascending=False).to_string())
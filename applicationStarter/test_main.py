@@ -1,12 +1,15 @@
-from backend.commons.data_handlers.backtest_data_handler import BackTestDataHandler
+from backend.commons.data_handlers.cached_data_handler import CachedBackTestDataHandler
 from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.enums.run_mode_enums import RunModeEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
 from backend.event_engine.back_test_engine import BackTestEngine
 from backend.strategy_library.MovingAverageCrossStrategy import MovingAverageCrossAbstractStrategy
+from dao.mongo import ensure_registered_indexes
 from ud_strategies_test.BollingCrossStrategy import BoolingCrossStrategy
 
 if __name__ == '__main__':
     print("start...")
+    ensure_registered_indexes()
 
     portfolio_id = 1
     back_test_name = "test"
@@ -16,7 +19,7 @@ if __name__ == '__main__':
     initial_capital = 1000.0
     start_date_str = '2016-10-10'
     date_format_enum = DateFormatStrEnum.DAY_BASE
-    data_handler = BackTestDataHandler(SymbolTypeEnum.CHINA_STOCK, [])
+    data_handler = CachedBackTestDataHandler(SymbolTypeEnum.CHINA_STOCK, [])
     # strategy = MovingAverageCrossAbstractStrategy(1, data_handler, short_window=5, long_window=10)
     strategy = BoolingCrossStrategy(1, data_handler, long_window=5, short_window=3, num_std=1)
 
@@ -30,7 +33,8 @@ if __name__ == '__main__':
         start_date_str,
         date_format_enum,
         data_handler,
-        strategy
+        strategy,
+        run_mode=RunModeEnum.FAST
     )
     back_test_engine.simulate_trading()
     print("回测已完成, 干巴爹!")
@@ -0,0 +1,4 @@
+from backend.benchmarks.scenarios import BenchmarkScenario, EngineMovingAverageCrossScenario, \
+    PortfolioFillScenario, PerformanceStatisticScenario, DataLookupScenario, DEFAULT_SCENARIOS
+from backend.benchmarks.suite import BenchmarkSuite, compare_with_baseline, default_baseline_path, load_report, \
+    save_report
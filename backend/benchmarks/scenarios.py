@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+from typing import Callable, List
+
+import numpy as np
+import pandas
+
+from backend.commons.data_handlers.point_in_time import PointInTimeView
+from backend.commons.data_handlers.synthetic_data_handler import SyntheticDataHandler
+from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.enums.order_type_enums import DirectionTypeEnum, OrderTypeEnum
+from backend.commons.enums.persistence_policy_enums import PersistencePolicyEnum
+from backend.commons.enums.run_mode_enums import RunModeEnum
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.events.base import OrderEvent
+from backend.commons.order_execution.order_execute_handler import SimulatedOrderExecuteHandler
+from backend.commons.performance.base_performance import create_statistic_summary
+from backend.commons.performance.streaming import StreamingMetrics
+from backend.commons.portfolios.base import Portfolio, ORDER_LOT_SIZE
+from backend.event_engine.back_test_engine import BackTestEngine
+from backend.event_engine.scheduler import MergedCalendarScheduler
+from backend.strategy_library.MovingAverageCrossStrategy import MovingAverageCrossAbstractStrategy
+
+
+class BenchmarkScenario(object):
+    """
+    基准测试场景
+    prepare 完成不计时的准备工作, 返回一次计时运行的函数, 该函数返回本次处理的事件数;
+    每次重复运行都重新调用 prepare, 场景之间不共享可变状态
+    """
+
+    name: str = None
+
+    def prepare(self, data_handler: SyntheticDataHandler, symbol_type: SymbolTypeEnum,
+                symbol_list: List[str]) -> Callable[[], int]:
+        raise NotImplementedError("Should implement prepare()")
+
+
+class EngineMovingAverageCrossScenario(BenchmarkScenario):
+    """
+    BackTestEngine(FAST) + MovingAverageCrossAbstractStrategy 完整回测, 组合不写入mongo
+    事件数为 市场/信号/订单/成交 事件总数
+    """
+
+    name = 'engine_ma_cross'
+
+    def __init__(self, short_window: int = 5, long_window: int = 20, initial_capital: float = 100000.0):
+        self._short_window: int = short_window
+        self._long_window: int = long_window
+        self._initial_capital: float = initial_capital
+
+    def prepare(self, data_handler: SyntheticDataHandler, symbol_type: SymbolTypeEnum,
+                symbol_list: List[str]) -> Callable[[], int]:
+        calendar = data_handler.get_trade_calendar(symbol_list)
+        strategy = MovingAverageCrossAbstractStrategy(1, data_handler, short_window=self._short_window,
+                                                      long_window=self._long_window)
+        engine = BackTestEngine(
+            1,
+            "benchmark-%s" % self.name,
+            "",
+            symbol_type,
+            symbol_list,
+            self._initial_capital,
+            calendar.first_date(),
+            DateFormatStrEnum.DAY_BASE,
+            data_handler,
+            strategy,
+            run_mode=RunModeEnum.FAST,
+            persistence_policy=PersistencePolicyEnum.NEVER,
+            trade_calendar=calendar
+        )
+
+        def run() -> int:
+            with contextlib.redirect_stdout(io.StringIO()):
+                engine.simulate_trading()
+            return engine.events()
+
+        return run
+
+
+class PortfolioFillScenario(BenchmarkScenario):
+    """
+    组合逐日估值及成交处理, 不经过策略: 每个交易日对当日有行情的证券交替下达固定数量的买入/卖出市价单,
+    模拟成交并更新组合; 订单数量固定, 不经过 generate_order_event 按现金计算, 保证证券数增加时每只证券都有成交
+    事件数为 订单/成交 事件总数
+    """
+
+    name = 'portfolio_fills'
+
+    def prepare(self, data_handler: SyntheticDataHandler, symbol_type: SymbolTypeEnum,
+                symbol_list: List[str]) -> Callable[[], int]:
+        calendar = data_handler.get_trade_calendar(symbol_list)
+        scheduler = MergedCalendarScheduler(
+            dict([(symbol, calendar.dates(symbol)) for symbol in symbol_list]), symbol_list
+        )
+        portfolio = Portfolio(1, "benchmark-%s" % self.name, "", calendar.first_date(), DateFormatStrEnum.DAY_BASE,
+                              symbol_list, 100000.0 * len(symbol_list), is_back_test=True,
+                              persistence_policy=PersistencePolicyEnum.NEVER)
+        execution_handler = SimulatedOrderExecuteHandler()
+
+        def run() -> int:
+            # 模拟成交会打印交易通知
+            with contextlib.redirect_stdout(io.StringIO()):
+                return _replay()
+
+        def _replay() -> int:
+            events = 0
+            n = 0
+            while scheduler.has_next():
+                step = scheduler.next_step()
+                date_str = step.date_str
+                symbols = step.symbols()
+                portfolio.update_time_index_for_date(date_str, symbols, data_handler)
+                direction_type = DirectionTypeEnum.BUY if n % 2 == 0 else DirectionTypeEnum.SELL
+                n += 1
+                for symbol in symbols:
+                    order_event = OrderEvent(symbol, step.date_key, OrderTypeEnum.MARKET, ORDER_LOT_SIZE,
+                                             direction_type)
+                    events += 1
+                    fill_event = execution_handler.execute_order(data_handler, order_event)
+                    if fill_event is None:
+                        continue
+                    events += 1
+                    portfolio.update_fill(fill_event, data_handler, persist=False)
+                portfolio.persist()
+            portfolio.close()
+            return events
+
+        return run
+
+
+class PerformanceStatisticScenario(BenchmarkScenario):
+    """
+    绩效指标计算: 以每只证券的收盘价序列作为持有金额曲线,
+    分别用 create_statistic_summary 一次性计算和 StreamingMetrics 逐点增量计算
+    事件数为处理的曲线点数(两种方式合计)
+    """
+
+    name = 'performance_stats'
+
+    def prepare(self, data_handler: SyntheticDataHandler, symbol_type: SymbolTypeEnum,
+                symbol_list: List[str]) -> Callable[[], int]:
+        totals = [np.asarray(data_handler.get_bar_columns(symbol).close) * 1000.0 for symbol in symbol_list]
+        curves = [
+            pandas.DataFrame({'total': total, 'cash': total * 0.1, 'commission': np.full(len(total), 5.0),
+                              'traded_value': np.cumsum(total * 0.01)})
+            for total in totals
+        ]
+
+        def run() -> int:
+            events = 0
+            for curve, total in zip(curves, totals):
+                create_statistic_summary(curve, symbol_type)
+                metrics = StreamingMetrics()
+                for value in total.tolist():
+                    metrics.update(value)
+                metrics.statistic_summary(symbol_type)
+                events += 2 * len(total)
+            return events
+
+        return run
+
+
+class DataLookupScenario(BenchmarkScenario):
+    """
+    数据查询: 按合并后的交易日历逐日推进, 对当日有行情的证券分别查询
+    get_bar_value, get_previous_date 以及 PointInTimeView 最近20条收盘价
+    事件数为查询次数
+    """
+
+    name = 'data_lookups'
+
+    def __init__(self, window: int = 20):
+        self._window: int = window
+
+    def prepare(self, data_handler: SyntheticDataHandler, symbol_type: SymbolTypeEnum,
+                symbol_list: List[str]) -> Callable[[], int]:
+        calendar = data_handler.get_trade_calendar(symbol_list)
+        dates = calendar.dates()
+        symbol_dates = [(symbol, set(calendar.dates(symbol))) for symbol in symbol_list]
+        window = self._window
+
+        def run() -> int:
+            events = 0
+            view = PointInTimeView(data_handler)
+            for date_str in dates:
+                view.advance(date_str)
+                for symbol, trade_dates in symbol_dates:
+                    if date_str not in trade_dates:
+                        continue
+                    data_handler.get_bar_value(symbol, date_str, BarValTypeEnum.Close)
+                    data_handler.get_previous_date(symbol, date_str)
+                    view.close(symbol, window)
+                    events += 3
+            return events
+
+        return run
+
+
+DEFAULT_SCENARIOS: List[BenchmarkScenario] = [
+    EngineMovingAverageCrossScenario(),
+    PortfolioFillScenario(),
+    PerformanceStatisticScenario(),
+    DataLookupScenario()
+]
@@ -0,0 +1,215 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import datetime
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from backend.benchmarks.scenarios import BenchmarkScenario, DEFAULT_SCENARIOS
+from backend.commons.data_handlers.synthetic_data_handler import SyntheticDataHandler, synthetic_symbols
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+
+
+def default_baseline_path() -> str:
+    """
+    环境变量 QUANT_BENCHMARK_BASELINE, 默认 ~/.quant-trader/benchmark_baseline.json
+    基准与机器相关, 不放在代码仓库中
+    """
+    return os.environ.get("QUANT_BENCHMARK_BASELINE") \
+        or os.path.join(os.path.expanduser("~"), ".quant-trader", "benchmark_baseline.json")
+
+
+def result_key(scenario_name: str, symbols: int, bars: int) -> str:
+    return "%s/%dx%d" % (scenario_name, symbols, bars)
+
+
+class BenchmarkSuite(object):
+    """
+    可复现的基准测试
+    对 证券数 x K线条数 网格中的每个组合, 用 SyntheticDataHandler 生成固定种子的行情, 依次运行每个场景:
+    计时至少运行 repeats 次且累计不少于 min_seconds 秒(最多 max_repeats 次), 取最快一次; 另外在 tracemalloc 下运行一次记录峰值内存(tracemalloc 本身会拖慢运行, 不参与计时)
+    行情生成和场景准备不计入耗时和内存
+    """
+
+    def __init__(self,
+                 symbol_counts: List[int],
+                 bar_counts: List[int],
+                 scenarios: List[BenchmarkScenario] = None,
+                 repeats: int = 3,
+                 min_seconds: float = 0.25,
+                 max_repeats: int = 100,
+                 seed: int = 0,
+                 symbol_type: SymbolTypeEnum = SymbolTypeEnum.CHINA_STOCK):
+        """
+
+        :param symbol_counts: 证券数
+        :param bar_counts: 每只证券的K线条数
+        :param scenarios: 默认 DEFAULT_SCENARIOS
+        :param repeats: 计时最少重复次数
+        :param min_seconds: 单次运行很快时继续重复, 直到累计计时达到该秒数, 减少短场景的计时误差
+        :param max_repeats: 计时最多重复次数
+        :param seed: 行情随机种子
+        """
+        self._symbol_counts: List[int] = sorted(set(symbol_counts))
+        self._bar_counts: List[int] = sorted(set(bar_counts))
+        self._scenarios: List[BenchmarkScenario] = scenarios if scenarios is not None else DEFAULT_SCENARIOS
+        self._repeats: int = max(1, repeats)
+        self._min_seconds: float = min_seconds
+        self._max_repeats: int = max(self._repeats, max_repeats)
+        self._seed: int = seed
+        self._symbol_type: SymbolTypeEnum = symbol_type
+
+    def _time_once(self, scenario: BenchmarkScenario, data_handler: SyntheticDataHandler,
+                   symbol_list: List[str]) -> (int, float):
+        run = scenario.prepare(data_handler, self._symbol_type, symbol_list)
+        gc.collect()
+        start_time = time.perf_counter()
+        events = run()
+        return events, time.perf_counter() - start_time
+
+    def _peak_memory(self, scenario: BenchmarkScenario, data_handler: SyntheticDataHandler,
+                     symbol_list: List[str]) -> int:
+        run = scenario.prepare(data_handler, self._symbol_type, symbol_list)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    def run_one(self, scenario: BenchmarkScenario, symbols: int, bars: int) -> Dict[str, Any]:
+        data_handler = SyntheticDataHandler(self._symbol_type, [], bars, seed=self._seed)
+        symbol_list = synthetic_symbols(symbols)
+        data_handler.warm_up(symbol_list)
+
+        events = 0
+        best_seconds = None
+        total_seconds = 0.0
+        repeats = 0
+        while repeats < self._repeats or (total_seconds < self._min_seconds and repeats < self._max_repeats):
+            events, seconds = self._time_once(scenario, data_handler, symbol_list)
+            repeats += 1
+            total_seconds += seconds
+            if best_seconds is None or seconds < best_seconds:
+                best_seconds = seconds
+        peak_bytes = self._peak_memory(scenario, data_handler, symbol_list)
+        return {
+            'scenario': scenario.name,
+            'symbols': symbols,
+            'bars': bars,
+            'events': events,
+            'seconds': best_seconds,
+            'repeats': repeats,
+            'events_per_sec': events / best_seconds if best_seconds > 0 else 0.0,
+            'peak_memory_kb': peak_bytes / 1024.0
+        }
+
+    def run(self, verbose: bool = False) -> Dict[str, Any]:
+        """
+        :return: {'meta': 运行环境, 'results': map(result_key -> 结果)}
+        """
+        results = {}
+        for scenario in self._scenarios:
+            for symbols in self._symbol_counts:
+                for bars in self._bar_counts:
+                    result = self.run_one(scenario, symbols, bars)
+                    results[result_key(scenario.name, symbols, bars)] = result
+                    if verbose:
+                        print(format_result(result))
+        return {
+            'meta': {
+                'created': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'seed': self._seed,
+                'repeats': self._repeats,
+                'min_seconds': self._min_seconds
+            },
+            'results': results
+        }
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    return "%-20s %8d %8d %10d %10.3f %14.1f %14.1f" % (
+        result['scenario'], result['symbols'], result['bars'], result['events'], result['seconds'],
+        result['events_per_sec'], result['peak_memory_kb'])
+
+
+def format_header() -> str:
+    return "%-20s %8s %8s %10s %10s %14s %14s" % (
+        'scenario', 'symbols', 'bars', 'events', 'seconds', 'events/sec', 'peak_kb')
+
+
+def save_report(report: Dict[str, Any], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path: str) -> Optional[Dict[str, Any]]:
+    """
+    :return: 文件不存在时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _smallest_of(results: Dict[str, Dict[str, Any]], scenario_name: str) -> Optional[Dict[str, Any]]:
+    candidates = [r for r in results.values() if r['scenario'] == scenario_name]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: (r['symbols'] * r['bars'], r['symbols']))
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2
+                          ) -> List[str]:
+    """
+    与基准比较, 返回回退说明, 为空表示没有回退; 只比较两边都有的网格组合
+    - throughput: events/sec 低于基准的 (1 - tolerance)
+    - memory: 峰值内存高于基准的 (1 + tolerance)
+    - scaling: 相对同一场景最小网格组合的 events/sec 比值低于基准比值的 (1 - tolerance),
+      即随证券数/K线条数增长变慢得比基准更多, 不受机器整体快慢影响
+
+    :param tolerance: 允许的相对波动
+    """
+    regressions = []
+    current = report['results']
+    previous = baseline['results']
+    for key in sorted(current.keys()):
+        result = current[key]
+        base = previous.get(key)
+        if base is None:
+            continue
+
+        if result['events_per_sec'] < base['events_per_sec'] * (1.0 - tolerance):
+            regressions.append("%s throughput: %.1f events/sec, baseline %.1f (%+.1f%%)" % (
+                key, result['events_per_sec'], base['events_per_sec'],
+                (result['events_per_sec'] / base['events_per_sec'] - 1.0) * 100.0))
+
+        if result['peak_memory_kb'] > base['peak_memory_kb'] * (1.0 + tolerance):
+            regressions.append("%s memory: %.1f KB peak, baseline %.1f KB (%+.1f%%)" % (
+                key, result['peak_memory_kb'], base['peak_memory_kb'],
+                (result['peak_memory_kb'] / base['peak_memory_kb'] - 1.0) * 100.0 if base['peak_memory_kb'] else 0.0))
+
+        smallest = _smallest_of(current, result['scenario'])
+        base_smallest = previous.get(result_key(result['scenario'], smallest['symbols'], smallest['bars']))
+        if smallest is result or base_smallest is None \
+                or smallest['events_per_sec'] <= 0 or base_smallest['events_per_sec'] <= 0:
+            continue
+        scaling = result['events_per_sec'] / smallest['events_per_sec']
+        base_scaling = base['events_per_sec'] / base_smallest['events_per_sec']
+        if scaling < base_scaling * (1.0 - tolerance):
+            regressions.append("%s scaling: %.3f of %dx%d throughput, baseline %.3f" % (
+                key, scaling, smallest['symbols'], smallest['bars'], base_scaling))
+    return regressions
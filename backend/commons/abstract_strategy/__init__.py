@@ -1,9 +1,15 @@
 from abc import ABCMeta, abstractmethod
-from typing import Optional
+from typing import Callable, Optional
+
+import numpy as np
 
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.bar_columns import BarColumns
+from backend.commons.data_handlers.point_in_time import PointInTimeView
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
 from backend.commons.enums.event_type_enums import EventTypeEnum
 from backend.commons.events.base import MarketEvent, SignalEvent
+from backend.commons.indicators import AbstractIndicator, IndicatorSet
 
 
 class AbstractStrategy(metaclass=ABCMeta):
@@ -20,15 +26,73 @@ class AbstractStrategy(metaclass=ABCMeta):
     since it obtains the bar tuples from a queue object.
     """
 
+    # 指标不输入最近 indicator_lag 根可见K线, 0 表示输入截至 previous_date(包含) 的全部K线
+    indicator_lag: int = 0
+    # 策略自己的视图(update_indicators 未传入 data_view 时)按该格式把事件日期转换为字符串
+    date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE
+
     def __init__(self, data_handler: CommonDataHandler):
+        """
+
+        :param data_handler: 策略通过它读取历史K线(get_bar_columns / get_k_data_previous / get_bar 等)已废弃:
+            这些方法能看到当前日期及之后的K线, 不能防止未来函数; 历史数据应从 calculate_signals 的 data_view
+            或由 data_view 输入的指标读取
+        """
         self.data_handler = data_handler
+        self.indicators: IndicatorSet = IndicatorSet()
+        # 调用方未提供视图时 update_indicators 使用的视图
+        self._data_view: Optional[PointInTimeView] = None
+
+    def declare_indicator(self, name: str, factory: Callable[[], AbstractIndicator]):
+        """
+        声明流式指标, 每只证券使用 factory 创建一个实例, 由引擎在 calculate_signals 之前自动更新
+
+        :param name: 指标名, 通过 self.indicators.value(symbol, name) 读取
+        :param factory: 无参工厂, 例如 lambda: SMA(10)
+        """
+        self.indicators.declare(name, factory)
+
+    def update_indicators(self, market_event: MarketEvent, data_view: PointInTimeView = None):
+        """
+        引擎在 calculate_signals 之前调用, 输入截至 previous_date(包含) 的K线, 当前日期的K线不可见;
+        indicator_lag > 0 时再去掉最近的 indicator_lag 根K线
+        K线来自 data_view, 同一个视图内每只证券只获取一次列式K线
+
+        :param data_view: 引擎的当前时点视图, 为None时使用策略自己的视图并前移到 market_event 的日期
+        """
+        if len(self.indicators) == 0:
+            return
+        if data_view is None:
+            data_view = self._own_data_view(market_event)
+        symbol = market_event.symbol
+        self.indicators.feed(symbol, data_view.bar_columns(symbol, data_view.bar_count(symbol) - self.indicator_lag))
+
+    def _own_data_view(self, market_event: MarketEvent) -> PointInTimeView:
+        if self._data_view is None:
+            self._data_view = PointInTimeView(self.data_handler, reload_on_advance=True)
+        self._data_view.advance(market_event.date_str_of(self.date_format))
+        return self._data_view
 
     @abstractmethod
-    def calculate_signals(self, market_event: MarketEvent) -> Optional[SignalEvent]:
+    def calculate_signals(self, market_event: MarketEvent, data_view: PointInTimeView = None) -> Optional[SignalEvent]:
         """
         Provides the mechanisms to calculate the list of signals.
+
+        :param market_event:
+        :param data_view: 当前时点可见的历史数据(不含当前日期的K线), 历史数据只应从它或 self.indicators 读取,
+            不应再通过 data_handler 获取
         """
-        if market_event.event_type() != EventTypeEnum.MARKET:
+        if market_event.event_type != EventTypeEnum.MARKET:
             return None
 
         raise NotImplementedError()
+
+    def calculate_vectorized_signals(self, bar_columns: BarColumns) -> Optional[np.ndarray]:
+        """
+        向量化回测入口, 策略可选择实现
+        基于证券全部历史一次性计算信号, 返回与 bar_columns.dates 对齐的 SignalTypeEnum(或None) 数组,
+        第i个元素等于 calculate_signals 在 dates[i] 的 MarketEvent 上返回的信号类型
+
+        :return: 不支持向量化时返回 None
+        """
+        return None
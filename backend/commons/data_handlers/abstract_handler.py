@@ -1,12 +1,16 @@
 from abc import ABCMeta, abstractmethod
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, TYPE_CHECKING
 
 from pandas import DataFrame
 
+from backend.commons.data_handlers.bar_columns import BarColumns
+from backend.commons.data_handlers.trade_calendar import TradeCalendar
 from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
-from data_crawler.xueqiu_2_mongo import StockXueqiuData
+
+if TYPE_CHECKING:
+    from data_crawler.xueqiu_2_mongo import StockXueqiuData
 
 
 class CommonDataHandler(metaclass=ABCMeta):
@@ -18,7 +22,17 @@ class CommonDataHandler(metaclass=ABCMeta):
         """
         self._symbol_type = symbol_type
         self._cols_name: List[str] = cols_name
-        self._stock_xueqiu_data = StockXueqiuData()
+        self._xueqiu_data: Optional['StockXueqiuData'] = None
+
+    @property
+    def _stock_xueqiu_data(self) -> 'StockXueqiuData':
+        """
+        首次使用时才导入并创建, 不依赖mongo的数据处理器不会导入爬虫模块, 也不会建立mongo连接
+        """
+        if self._xueqiu_data is None:
+            from data_crawler.xueqiu_2_mongo import StockXueqiuData
+            self._xueqiu_data = StockXueqiuData()
+        return self._xueqiu_data
 
     @abstractmethod
     def get_previous_date(self, symbol: str, current_date_str: str) -> str:
@@ -28,6 +42,18 @@ class CommonDataHandler(metaclass=ABCMeta):
     def get_history_trade_date(self, symbol: str, min_date_str: str) -> List[str]:
         raise NotImplementedError()
 
+    def get_history_trade_dates(self, symbol_list: List[str], min_date_str: str) -> Dict[str, List[str]]:
+        """
+        批量获取多只证券的历史交易日期
+        """
+        return dict([(symbol, self.get_history_trade_date(symbol, min_date_str)) for symbol in symbol_list])
+
+    def get_trade_calendar(self, symbol_list: List[str]) -> TradeCalendar:
+        """
+        包含 symbol_list 全部历史交易日期的交易日历, 默认由 get_history_trade_dates 构建
+        """
+        return TradeCalendar(self.get_history_trade_dates(symbol_list, ''))
+
     @abstractmethod
     def get_bar(self, symbol: str, current_date_str: str) -> DataFrame:
         raise NotImplementedError()
@@ -42,3 +68,12 @@ class CommonDataHandler(metaclass=ABCMeta):
 
     def get_k_data_previous(self, symbol: str, current_date_str: str, count: int) -> DataFrame:
         raise NotImplementedError()
+
+    def get_bar_columns(self, symbol: str) -> BarColumns:
+        """
+        证券全部历史K线的列式数据, 供向量化回测使用
+        """
+        df = self._stock_xueqiu_data.get_his_k_data(symbol, '', '9999-12-31')
+        if df.empty:
+            return BarColumns.empty(symbol)
+        return BarColumns.from_data_frame(symbol, df)
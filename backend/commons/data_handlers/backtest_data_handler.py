@@ -1,30 +1,46 @@
-from typing import List, Optional
-from datetime import datetime as date_time_type
+from typing import Dict, List, Optional
 from pandas import DataFrame
 
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.trade_calendar import TradeCalendar, TradeCalendarStore
 from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
-from data_crawler.xueqiu_2_mongo import StockXueqiuData
 
 
 class BackTestDataHandler(CommonDataHandler):
-    def __init__(self, symbol_type: SymbolTypeEnum, cols_name: List[str]):
+    def __init__(self, symbol_type: SymbolTypeEnum, cols_name: List[str], calendar_store: TradeCalendarStore = None):
+        """
+
+        :param symbol_type
+        :param cols_name: 待获取列名称
+        :param calendar_store: 交易日历磁盘缓存, 默认 TradeCalendarStore()
+        """
         super(BackTestDataHandler, self).__init__(symbol_type, cols_name)
-        self._stock_xueqiu_data = StockXueqiuData()
+        self._calendar_store: TradeCalendarStore = calendar_store if calendar_store is not None \
+            else TradeCalendarStore()
+        self._trade_calendar: TradeCalendar = TradeCalendar()
+
+    def _load_trade_dates(self, symbol_list: List[str]) -> Dict[str, List[str]]:
+        data = self._stock_xueqiu_data.get_his_k_data_many(symbol_list, '', '9999-12-31',
+                                                           return_columns=['date'], as_frame=False)
+        return dict([(symbol, data[symbol]['date'].tolist()) for symbol in symbol_list])
+
+    def get_trade_calendar(self, symbol_list: List[str]) -> TradeCalendar:
+        """
+        每只证券的交易日期只从磁盘缓存或mongo加载一次, 之后的日期查询不访问mongo
+        """
+        return self._calendar_store.get_calendar(symbol_list, self._load_trade_dates, self._trade_calendar,
+                                                 watermark_fn=self._stock_xueqiu_data.get_watermark)
 
     def get_previous_date(self, symbol: str, current_date_str: str) -> Optional[str]:
-        data = self._stock_xueqiu_data.get_his_k_data(symbol, '2000-01-01', current_date_str)
-        dates = data.sort_index(ascending=False).index
-        for d in dates:
-            if d < current_date_str:
-                return d
-        return None
+        return self.get_trade_calendar([symbol]).previous_date(current_date_str, symbol)
 
     def get_history_trade_date(self, symbol, min_date_str: str) -> List[str]:
-        end_date = date_time_type.now().strftime('%Y-%m-%d')
-        data = self._stock_xueqiu_data.get_his_k_data(symbol, min_date_str, end_date)
-        return [d for d in data.index]
+        return self.get_trade_calendar([symbol]).date_range(min_date_str, None, symbol)
+
+    def get_history_trade_dates(self, symbol_list: List[str], min_date_str: str) -> Dict[str, List[str]]:
+        calendar = self.get_trade_calendar(symbol_list)
+        return dict([(symbol, calendar.date_range(min_date_str, None, symbol)) for symbol in symbol_list])
 
     def get_bar(self, symbol: str, current_date_str: str) -> DataFrame:
         return self._stock_xueqiu_data.get_his_k_data(symbol, current_date_str, current_date_str)
@@ -0,0 +1,144 @@
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
+
+# 列式存储的字段, date 为日期字符串('%Y-%m-%d', 分钟级为 '%Y-%m-%d %H:%M'), 其余为 float64
+BAR_COLUMN_NAMES: List[str] = ['date', 'open', 'high', 'low', 'close', 'volume']
+BAR_VALUE_COLUMN_NAMES: List[str] = ['open', 'high', 'low', 'close', 'volume']
+
+
+def date_array(dates) -> np.ndarray:
+    """
+    转换为连续的定长字符串数组, 宽度取最长日期的长度, 分钟级日期不会被截断;
+    同样的日期总是得到同样的宽度, 与输入数组本身的宽度无关
+
+    :param dates: 日期字符串序列
+    """
+    values = np.asarray(dates, dtype=str)
+    width = int(np.char.str_len(values).max()) if len(values) > 0 else 1
+    return np.ascontiguousarray(values, dtype='U%d' % max(1, width))
+
+
+_BAR_VAL_TYPE_2_COLUMN: Dict[BarValTypeEnum, str] = {
+    BarValTypeEnum.Open: 'open',
+    BarValTypeEnum.High: 'high',
+    BarValTypeEnum.Low: 'low',
+    BarValTypeEnum.Close: 'close',
+    BarValTypeEnum.Volume: 'volume',
+    # 暂无复权数据, 与 BackTestDataHandler 一致使用收盘价
+    BarValTypeEnum.ADJ_CLOSE: 'close',
+}
+
+
+class BarColumns(object):
+    """
+    单只证券全部历史K线的列式存储
+    date 升序排列, 所有查询均通过二分查找或下标运算完成
+    """
+
+    def __init__(
+            self,
+            symbol: str,
+            dates: np.ndarray,
+            open_: np.ndarray,
+            high: np.ndarray,
+            low: np.ndarray,
+            close: np.ndarray,
+            volume: np.ndarray
+    ):
+        """
+
+        :param symbol: 证券代码
+        :param dates: 交易日期, 升序
+        :param open_: 开盘价
+        :param high: 最高价
+        :param low: 最低价
+        :param close: 收盘价
+        :param volume: 成交量
+        """
+        self.symbol: str = symbol
+        self.dates: np.ndarray = dates
+        self.open: np.ndarray = open_
+        self.high: np.ndarray = high
+        self.low: np.ndarray = low
+        self.close: np.ndarray = close
+        self.volume: np.ndarray = volume
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name: str) -> np.ndarray:
+        if name == 'date':
+            return self.dates
+        return getattr(self, name)
+
+    @staticmethod
+    def column_of(bar_val_type: BarValTypeEnum) -> str:
+        return _BAR_VAL_TYPE_2_COLUMN[bar_val_type]
+
+    def index_of(self, date_str: str) -> Optional[int]:
+        """
+        日期对应的下标, 非交易日返回None
+        """
+        idx = int(np.searchsorted(self.dates, date_str, side='left'))
+        if idx < len(self.dates) and self.dates[idx] == date_str:
+            return idx
+        return None
+
+    def count_until(self, date_str: str) -> int:
+        """
+        date <= date_str 的记录条数
+        """
+        return int(np.searchsorted(self.dates, date_str, side='right'))
+
+    def count_before(self, date_str: str) -> int:
+        """
+        date < date_str 的记录条数
+        """
+        return int(np.searchsorted(self.dates, date_str, side='left'))
+
+    def fingerprint(self) -> str:
+        """
+        全部K线内容的摘要, K线变化(新增/修正)时改变
+        """
+        digest = hashlib.sha1(self.symbol.encode('utf-8'))
+        digest.update(date_array(self.dates).tobytes())
+        for name in BAR_VALUE_COLUMN_NAMES:
+            digest.update(np.ascontiguousarray(self.column(name), dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def to_data_frame(self, start: int, end: int, ascending: bool = True) -> DataFrame:
+        """
+        将 [start, end) 区间转换为以 date 为索引的 DataFrame
+        """
+        def rows(arr: np.ndarray) -> np.ndarray:
+            return arr[start:end] if ascending else arr[start:end][::-1]
+
+        df = DataFrame(
+            data=dict([(name, rows(self.column(name))) for name in BAR_COLUMN_NAMES]),
+            columns=BAR_COLUMN_NAMES
+        )
+        df.insert(0, 'symbol', self.symbol)
+        df.set_index(['date'], inplace=True)
+        return df
+
+    @staticmethod
+    def from_data_frame(symbol: str, df: DataFrame) -> 'BarColumns':
+        """
+        由 StockXueqiuData.get_his_k_data 返回的 DataFrame(以 date 为索引)构建
+        """
+        df = df.sort_index(ascending=True)
+        return BarColumns(
+            symbol,
+            np.asarray(df.index.values, dtype=str),
+            *[np.asarray(df[name].values, dtype=np.float64) for name in BAR_VALUE_COLUMN_NAMES]
+        )
+
+    @staticmethod
+    def empty(symbol: str) -> 'BarColumns':
+        return BarColumns(symbol, np.array([], dtype=str),
+                          *[np.array([], dtype=np.float64) for _ in BAR_VALUE_COLUMN_NAMES])
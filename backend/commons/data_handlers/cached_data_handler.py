@@ -0,0 +1,40 @@
+from typing import Dict, List
+
+import numpy as np
+
+from backend.commons.data_handlers.bar_columns import BarColumns, BAR_COLUMN_NAMES, BAR_VALUE_COLUMN_NAMES
+from backend.commons.data_handlers.columnar_data_handler import ColumnarDataHandler
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.features.feature_store import FeatureStore
+
+
+class CachedBackTestDataHandler(ColumnarDataHandler):
+    """
+    带内存缓存的回测数据处理器
+    每只证券首次被访问时从mongo读取全部历史并转为列式数组,
+    之后 get_bar / get_bar_value / get_previous_date / get_k_data_previous 不再访问mongo
+    """
+
+    _MIN_DATE_STR = ''
+    _MAX_DATE_STR = '9999-12-31'
+
+    def __init__(self, symbol_type: SymbolTypeEnum, cols_name: List[str], feature_store: FeatureStore = None):
+        super(CachedBackTestDataHandler, self).__init__(symbol_type, cols_name, feature_store)
+
+    def _load_bar_columns(self, symbol: str) -> BarColumns:
+        df = self._stock_xueqiu_data.get_his_k_data(symbol, self._MIN_DATE_STR, self._MAX_DATE_STR)
+        if df.empty:
+            return BarColumns.empty(symbol)
+        return BarColumns.from_data_frame(symbol, df)
+
+    def _load_bar_columns_many(self, symbol_list: List[str]) -> Dict[str, BarColumns]:
+        data = self._stock_xueqiu_data.get_his_k_data_many(symbol_list, self._MIN_DATE_STR, self._MAX_DATE_STR,
+                                                           return_columns=BAR_COLUMN_NAMES, as_frame=False)
+        return dict([
+            (symbol, BarColumns(
+                symbol,
+                np.asarray(data[symbol]['date'], dtype=str),
+                *[np.asarray(data[symbol][name], dtype=np.float64) for name in BAR_VALUE_COLUMN_NAMES]
+            ))
+            for symbol in symbol_list
+        ])
@@ -0,0 +1,115 @@
+from abc import abstractmethod
+from typing import Dict, List, Optional
+
+from pandas import DataFrame
+
+from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.bar_columns import BarColumns
+from backend.commons.data_handlers.trade_calendar import TradeCalendar
+from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.features.feature_store import FeatureStore
+
+
+class ColumnarDataHandler(CommonDataHandler):
+    """
+    基于 BarColumns 的数据处理器
+    每只证券的全部历史只加载一次, 之后所有查询都在内存中通过二分查找完成
+    子类只需实现 _load_bar_columns
+    """
+
+    def __init__(self, symbol_type: SymbolTypeEnum, cols_name: List[str], feature_store: FeatureStore = None):
+        """
+
+        :param symbol_type
+        :param cols_name: 待获取列名称, get_features 只返回这些列, 为空时返回全部
+        :param feature_store: 特征存储, 为None时 get_features 只返回当日K线
+        """
+        super(ColumnarDataHandler, self).__init__(symbol_type, cols_name)
+        self._feature_store: Optional[FeatureStore] = feature_store
+        # map(symbol_code -> BarColumns)
+        self._bar_columns: Dict[str, BarColumns] = {}
+        self._trade_calendar: TradeCalendar = TradeCalendar()
+
+    @abstractmethod
+    def _load_bar_columns(self, symbol: str) -> BarColumns:
+        raise NotImplementedError()
+
+    def _load_bar_columns_many(self, symbol_list: List[str]) -> Dict[str, BarColumns]:
+        """
+        批量加载, 子类可覆盖为一次查询
+        """
+        return dict([(symbol, self._load_bar_columns(symbol)) for symbol in symbol_list])
+
+    def warm_up(self, symbol_list: List[str]):
+        """
+        预加载证券历史数据
+        """
+        missing = [symbol for symbol in symbol_list if symbol not in self._bar_columns]
+        if missing:
+            self._bar_columns.update(self._load_bar_columns_many(missing))
+
+    def get_bar_columns(self, symbol: str) -> BarColumns:
+        columns = self._bar_columns.get(symbol)
+        if columns is None:
+            columns = self._load_bar_columns(symbol)
+            self._bar_columns[symbol] = columns
+        return columns
+
+    def get_previous_date(self, symbol: str, current_date_str: str) -> Optional[str]:
+        columns = self.get_bar_columns(symbol)
+        idx = columns.count_before(current_date_str) - 1
+        if idx < 0:
+            return None
+        return str(columns.dates[idx])
+
+    def get_history_trade_date(self, symbol: str, min_date_str: str) -> List[str]:
+        columns = self.get_bar_columns(symbol)
+        return columns.dates[columns.count_before(min_date_str):].tolist()
+
+    def get_history_trade_dates(self, symbol_list: List[str], min_date_str: str) -> Dict[str, List[str]]:
+        self.warm_up(symbol_list)
+        return dict([(symbol, self.get_history_trade_date(symbol, min_date_str)) for symbol in symbol_list])
+
+    def get_trade_calendar(self, symbol_list: List[str]) -> TradeCalendar:
+        """
+        由已加载的K线日期构建, 不额外访问数据源
+        """
+        self.warm_up(symbol_list)
+        for symbol in symbol_list:
+            if not self._trade_calendar.has(symbol):
+                self._trade_calendar.add(symbol, self.get_bar_columns(symbol).dates.tolist())
+        return self._trade_calendar
+
+    def get_bar(self, symbol: str, current_date_str: str) -> DataFrame:
+        columns = self.get_bar_columns(symbol)
+        idx = columns.index_of(current_date_str)
+        if idx is None:
+            return columns.to_data_frame(0, 0)
+        return columns.to_data_frame(idx, idx + 1)
+
+    def get_bar_value(self, symbol, current_date_str: str, bar_val_type: BarValTypeEnum) -> float:
+        columns = self.get_bar_columns(symbol)
+        idx = columns.index_of(current_date_str)
+        if idx is None:
+            raise KeyError("no bar for symbol=%s, date=%s" % (symbol, current_date_str))
+        return float(columns.column(BarColumns.column_of(bar_val_type))[idx])
+
+    def get_features(self, symbol: str, current_date_str: str) -> DataFrame:
+        """
+        配置了特征存储时, 返回当日K线及预先计算的特征(只使用当日及之前的K线)
+        """
+        if self._feature_store is None:
+            return self.get_bar(symbol, current_date_str)
+        return self._feature_store.get(self.get_bar_columns(symbol)).row(current_date_str, self._cols_name)
+
+    def get_k_data_previous(self, symbol: str, current_date_str: str, count: int) -> DataFrame:
+        """
+        与 BackTestDataHandler.get_k_data_previous 语义一致:
+        取 date <= current_date_str 的记录按日期倒序, 跳过第一条后取 count 条
+        """
+        columns = self.get_bar_columns(symbol)
+        end = columns.count_until(current_date_str) - 1
+        if end <= 0:
+            return columns.to_data_frame(0, 0, ascending=False)
+        return columns.to_data_frame(max(0, end - count), end, ascending=False)
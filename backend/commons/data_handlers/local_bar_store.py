@@ -0,0 +1,129 @@
+import os
+import tempfile
+from typing import List
+
+import numpy as np
+import pandas
+
+from backend.commons.data_handlers.bar_columns import BarColumns, BAR_COLUMN_NAMES, BAR_VALUE_COLUMN_NAMES, \
+    date_array
+
+
+def default_bar_store_dir() -> str:
+    """
+    环境变量 QUANT_BAR_STORE_DIR, 默认 ~/.quant-trader/bars
+    """
+    return os.environ.get("QUANT_BAR_STORE_DIR") \
+        or os.path.join(os.path.expanduser("~"), ".quant-trader", "bars")
+
+
+class LocalBarStore(object):
+    """
+    本地列式K线存储
+    每只证券一个目录, 每个字段一个 .npy 文件: <root_dir>/<symbol>/<column>.npy,
+    date 为定长字符串(宽度取最长日期的长度), 其余为 float64
+    读取时以 mmap_mode='r' 映射文件, 同一主机上的多个回测进程共享页缓存, 启动时不需要读入全部数据
+    """
+
+    def __init__(self, root_dir: str = None):
+        """
+
+        :param root_dir: 存储目录, 默认 default_bar_store_dir()
+        """
+        self._root_dir: str = root_dir if root_dir is not None else default_bar_store_dir()
+
+    def root_dir(self) -> str:
+        return self._root_dir
+
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self._root_dir, symbol)
+
+    def _column_path(self, symbol: str, column: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), "%s.npy" % column)
+
+    def has(self, symbol: str) -> bool:
+        return all(os.path.exists(self._column_path(symbol, name)) for name in BAR_COLUMN_NAMES)
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self._root_dir):
+            return []
+        return sorted([s for s in os.listdir(self._root_dir) if self.has(s)])
+
+    def write(self, bar_columns: BarColumns):
+        """
+        覆盖写入一只证券的全部K线
+        每个文件先写临时文件再原子替换, 读取方不会看到写了一半的文件
+        """
+        symbol_dir = self._symbol_dir(bar_columns.symbol)
+        os.makedirs(symbol_dir, exist_ok=True)
+        for name in BAR_COLUMN_NAMES:
+            if name == 'date':
+                values = date_array(bar_columns.dates)
+            else:
+                values = np.ascontiguousarray(bar_columns.column(name), dtype=np.float64)
+
+            fd, tmp_path = tempfile.mkstemp(dir=symbol_dir, suffix=".npy.tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, values, allow_pickle=False)
+                os.replace(tmp_path, self._column_path(bar_columns.symbol, name))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def read(self, symbol: str, mmap: bool = True) -> BarColumns:
+        """
+        :param mmap: True 以只读内存映射方式打开, False 读入内存
+        :return: 不存在时返回空的 BarColumns
+        """
+        if not self.has(symbol):
+            return BarColumns.empty(symbol)
+
+        mmap_mode = 'r' if mmap else None
+        columns = dict([
+            (name, np.load(self._column_path(symbol, name), mmap_mode=mmap_mode, allow_pickle=False))
+            for name in BAR_COLUMN_NAMES
+        ])
+        lengths = set([len(values) for values in columns.values()])
+        if len(lengths) != 1:
+            raise ValueError("inconsistent column lengths for symbol=%s: %s"
+                             % (symbol, dict([(k, len(v)) for k, v in columns.items()])))
+        return BarColumns(symbol, columns['date'], *[columns[name] for name in BAR_VALUE_COLUMN_NAMES])
+
+
+def export_mongo_2_local_bar_store(symbol_list: List[str], store: LocalBarStore = None,
+                                   start_date_str: str = '', end_date_str: str = '9999-12-31') -> int:
+    """
+    将 stock.xueqiu 集合中的K线导出到本地存储
+    :return: 导出的K线条数
+    """
+    # 只有导出时才需要mongo
+    from data_crawler.xueqiu_2_mongo import StockXueqiuData
+
+    store = store if store is not None else LocalBarStore()
+    data = StockXueqiuData().get_his_k_data_many(symbol_list, start_date_str, end_date_str,
+                                                 return_columns=BAR_COLUMN_NAMES, as_frame=False)
+    count = 0
+    for symbol in symbol_list:
+        store.write(BarColumns(
+            symbol,
+            date_array(data[symbol]['date']),
+            *[np.asarray(data[symbol][name], dtype=np.float64) for name in BAR_VALUE_COLUMN_NAMES]
+        ))
+        count += len(data[symbol]['date'])
+    return count
+
+
+def export_csv_2_local_bar_store(symbol_list: List[str], file_path_suffix: str, store: LocalBarStore = None) -> int:
+    """
+    将 load_data_2_csv_file 输出的文件(<symbol><file_path_suffix>)导出到本地存储
+    :return: 导出的K线条数
+    """
+    store = store if store is not None else LocalBarStore()
+    count = 0
+    for symbol in symbol_list:
+        df = pandas.read_csv(symbol + file_path_suffix, index_col='date', dtype={'date': str})
+        store.write(BarColumns.from_data_frame(symbol, df) if not df.empty else BarColumns.empty(symbol))
+        count += len(df)
+    return count
@@ -0,0 +1,29 @@
+from typing import List
+
+from backend.commons.data_handlers.bar_columns import BarColumns
+from backend.commons.data_handlers.columnar_data_handler import ColumnarDataHandler
+from backend.commons.data_handlers.local_bar_store import LocalBarStore
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.features.feature_store import FeatureStore
+
+
+class MemoryMapDataHandler(ColumnarDataHandler):
+    """
+    基于本地列式存储(LocalBarStore)的回测数据处理器, 不依赖mongo
+    K线以只读内存映射方式打开, 按需分页读入, 多个进程共享页缓存
+    """
+
+    def __init__(self, symbol_type: SymbolTypeEnum, cols_name: List[str], store: LocalBarStore = None,
+                 feature_store: FeatureStore = None):
+        """
+
+        :param symbol_type
+        :param cols_name: 待获取列名称
+        :param store: 本地K线存储, 默认 LocalBarStore()
+        :param feature_store: 特征存储
+        """
+        super(MemoryMapDataHandler, self).__init__(symbol_type, cols_name, feature_store)
+        self._store: LocalBarStore = store if store is not None else LocalBarStore()
+
+    def _load_bar_columns(self, symbol: str) -> BarColumns:
+        return self._store.read(symbol, mmap=True)
@@ -0,0 +1,131 @@
+from typing import Dict, Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.bar_columns import BarColumns, BAR_COLUMN_NAMES
+
+
+class PointInTimeView(object):
+    """
+    策略在某一时点可见的历史数据
+    每只证券只暴露 date < 当前日期 的K线, 与指标一致当前日期的K线不可见;
+    返回的都是底层列式数组的只读切片视图, 不复制数据, 每次调用只分配一个视图对象
+    引擎在整个回测中复用同一个实例, 每个交易日调用 advance 前移时点, 时点只能前移;
+    每只证券的列式K线只通过 get_bar_columns 获取一次, 在线运行时可在时点前移后重新获取以包含新的K线
+    """
+
+    def __init__(self, data_handler: CommonDataHandler, date_str: str = None, reload_on_advance: bool = False):
+        """
+
+        :param data_handler: 通过 get_bar_columns 获取每只证券的列式K线
+        :param date_str: 当前时点
+        :param reload_on_advance: 时点前移时丢弃已获取的K线, 用于K线持续增加的在线运行
+        """
+        self._data_handler: CommonDataHandler = data_handler
+        self._reload_on_advance: bool = reload_on_advance
+        self._date_str: Optional[str] = None
+        # map(symbol_code -> BarColumns)
+        self._bar_columns: Dict[str, BarColumns] = {}
+        # map(symbol_code -> 当前时点可见的K线条数), 时点前移时清空
+        self._ends: Dict[str, int] = {}
+        if date_str is not None:
+            self.advance(date_str)
+
+    def current_date(self) -> Optional[str]:
+        return self._date_str
+
+    def advance(self, date_str: str):
+        """
+        把时点前移到 date_str, 之后只可见 date < date_str 的K线
+        """
+        if self._date_str is not None and date_str < self._date_str:
+            raise ValueError("point in time can not move backwards: %s -> %s" % (self._date_str, date_str))
+        if date_str != self._date_str:
+            self._date_str = date_str
+            self._ends.clear()
+            if self._reload_on_advance:
+                self._bar_columns.clear()
+
+    def _columns_of(self, symbol: str) -> BarColumns:
+        columns = self._bar_columns.get(symbol)
+        if columns is None:
+            columns = self._data_handler.get_bar_columns(symbol)
+            self._bar_columns[symbol] = columns
+        return columns
+
+    def bar_count(self, symbol: str) -> int:
+        """
+        当前时点该证券可见的K线条数
+        """
+        end = self._ends.get(symbol)
+        if end is None:
+            end = 0 if self._date_str is None else self._columns_of(symbol).count_before(self._date_str)
+            self._ends[symbol] = end
+        return end
+
+    def column(self, symbol: str, name: str, count: int = None) -> np.ndarray:
+        """
+        可见部分的只读视图
+
+        :param name: BAR_COLUMN_NAMES 中的字段
+        :param count: 只取最近 count 条, 为None时取全部可见K线
+        """
+        end = self.bar_count(symbol)
+        start = 0 if count is None else max(0, end - count)
+        view = self._columns_of(symbol).column(name)[start:end]
+        view.flags.writeable = False
+        return view
+
+    def bar_columns(self, symbol: str, end: int = None) -> BarColumns:
+        """
+        可见部分前 end 条K线的列式只读视图, 可直接传给按 BarColumns 读取的代码(如指标)
+
+        :param end: 为None或超过可见条数时取全部可见K线
+        """
+        visible = self.bar_count(symbol)
+        end = visible if end is None else max(0, min(end, visible))
+        columns = self._columns_of(symbol)
+        views = []
+        for name in BAR_COLUMN_NAMES:
+            view = columns.column(name)[:end]
+            view.flags.writeable = False
+            views.append(view)
+        return BarColumns(symbol, *views)
+
+    def dates(self, symbol: str, count: int = None) -> np.ndarray:
+        return self.column(symbol, 'date', count)
+
+    def open(self, symbol: str, count: int = None) -> np.ndarray:
+        return self.column(symbol, 'open', count)
+
+    def high(self, symbol: str, count: int = None) -> np.ndarray:
+        return self.column(symbol, 'high', count)
+
+    def low(self, symbol: str, count: int = None) -> np.ndarray:
+        return self.column(symbol, 'low', count)
+
+    def close(self, symbol: str, count: int = None) -> np.ndarray:
+        return self.column(symbol, 'close', count)
+
+    def volume(self, symbol: str, count: int = None) -> np.ndarray:
+        return self.column(symbol, 'volume', count)
+
+    def last(self, symbol: str, name: str = 'close') -> Optional[float]:
+        """
+        最近一条可见K线的字段值, 没有可见K线时返回None
+        """
+        end = self.bar_count(symbol)
+        if end == 0:
+            return None
+        value = self._columns_of(symbol).column(name)[end - 1]
+        return str(value) if name == 'date' else float(value)
+
+    def to_data_frame(self, symbol: str, count: int = None, ascending: bool = True) -> DataFrame:
+        """
+        可见部分转换为以 date 为索引的 DataFrame, 会复制数据, 只用于调试或不在意开销的场景
+        """
+        end = self.bar_count(symbol)
+        start = 0 if count is None else max(0, end - count)
+        return self._columns_of(symbol).to_data_frame(start, end, ascending)
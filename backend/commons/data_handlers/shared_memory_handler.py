@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.commons.data_handlers.bar_columns import BarColumns, BAR_COLUMN_NAMES, BAR_VALUE_COLUMN_NAMES, \
+    date_array
+from backend.commons.data_handlers.columnar_data_handler import ColumnarDataHandler
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.features.feature_store import FeatureStore
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+# 每个数组按8字节对齐
+_ALIGNMENT = 8
+
+
+def shared_memory_available() -> bool:
+    return shared_memory is not None
+
+
+class SharedBarLayout(object):
+    """
+    共享内存块中各证券各字段数组的位置, 可序列化后传给工作进程
+    """
+
+    def __init__(self, block_name: str, size: int,
+                 arrays: Dict[str, Dict[str, Tuple[str, int, int]]]):
+        """
+
+        :param block_name: 共享内存块名称
+        :param size: 共享内存块字节数
+        :param arrays: map(symbol -> map(column -> (dtype, offset, length)))
+        """
+        self.block_name: str = block_name
+        self.size: int = size
+        self.arrays: Dict[str, Dict[str, Tuple[str, int, int]]] = arrays
+
+    def symbols(self) -> List[str]:
+        return list(self.arrays.keys())
+
+
+def _column_values(bar_columns: BarColumns, name: str) -> np.ndarray:
+    if name == 'date':
+        return date_array(bar_columns.dates)
+    return np.ascontiguousarray(bar_columns.column(name), dtype=np.float64)
+
+
+class SharedBarPublisher(object):
+    """
+    将一组证券的K线一次性写入一个共享内存块
+    发布方持有共享内存块, 所有使用方退出后调用 close() 释放
+    """
+
+    def __init__(self, bar_columns_list: List[BarColumns]):
+        if shared_memory is None:
+            raise RuntimeError("multiprocessing.shared_memory requires python 3.8+")
+
+        values: List[Tuple[str, str, np.ndarray]] = []
+        arrays: Dict[str, Dict[str, Tuple[str, int, int]]] = {}
+        offset = 0
+        for bar_columns in bar_columns_list:
+            symbol_arrays = {}
+            for name in BAR_COLUMN_NAMES:
+                arr = _column_values(bar_columns, name)
+                symbol_arrays[name] = (arr.dtype.str, offset, len(arr))
+                values.append((bar_columns.symbol, name, arr))
+                offset += (arr.nbytes + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+            arrays[bar_columns.symbol] = symbol_arrays
+
+        size = max(offset, 1)
+        self._block = shared_memory.SharedMemory(create=True, size=size)
+        for symbol, name, arr in values:
+            dtype, array_offset, length = arrays[symbol][name]
+            np.ndarray((length,), dtype=dtype, buffer=self._block.buf, offset=array_offset)[:] = arr
+
+        self.layout: SharedBarLayout = SharedBarLayout(self._block.name, size, arrays)
+
+    @staticmethod
+    def from_data_handler(data_handler, symbol_list: List[str]) -> 'SharedBarPublisher':
+        """
+        通过数据处理器加载证券K线后发布
+        """
+        if hasattr(data_handler, 'warm_up'):
+            data_handler.warm_up(symbol_list)
+        return SharedBarPublisher([data_handler.get_bar_columns(symbol) for symbol in symbol_list])
+
+    def close(self):
+        """
+        释放共享内存块
+        """
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SharedMemoryDataHandler(ColumnarDataHandler):
+    """
+    挂载到 SharedBarPublisher 发布的共享内存块上的只读数据处理器
+    BarColumns 的数组直接引用共享内存, 不复制, 工作进程增加时内存占用不变
+    """
+
+    def __init__(self, symbol_type: SymbolTypeEnum, cols_name: List[str], layout: SharedBarLayout,
+                 feature_store: FeatureStore = None):
+        """
+
+        :param symbol_type
+        :param cols_name: 待获取列名称
+        :param layout: SharedBarPublisher.layout
+        :param feature_store: 特征存储
+        """
+        super(SharedMemoryDataHandler, self).__init__(symbol_type, cols_name, feature_store)
+        if shared_memory is None:
+            raise RuntimeError("multiprocessing.shared_memory requires python 3.8+")
+        self._layout: SharedBarLayout = layout
+        self._block = None
+
+    def _attach(self):
+        if self._block is None:
+            self._block = shared_memory.SharedMemory(name=self._layout.block_name)
+        return self._block
+
+    def _view(self, dtype: str, offset: int, length: int) -> np.ndarray:
+        arr = np.ndarray((length,), dtype=dtype, buffer=self._attach().buf, offset=offset)
+        arr.flags.writeable = False
+        return arr
+
+    def _load_bar_columns(self, symbol: str) -> BarColumns:
+        symbol_arrays = self._layout.arrays.get(symbol)
+        if symbol_arrays is None:
+            return BarColumns.empty(symbol)
+        return BarColumns(symbol, self._view(*symbol_arrays['date']),
+                          *[self._view(*symbol_arrays[name]) for name in BAR_VALUE_COLUMN_NAMES])
+
+    def close(self):
+        """
+        断开共享内存, 之后不能再访问已返回的 BarColumns
+        """
+        self._bar_columns.clear()
+        if self._block is not None:
+            self._block.close()
+            self._block = None
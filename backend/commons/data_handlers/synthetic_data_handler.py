@@ -0,0 +1,83 @@
+import zlib
+from typing import List
+
+import numpy as np
+import pandas
+
+from backend.commons.data_handlers.bar_columns import BarColumns, date_array
+from backend.commons.data_handlers.columnar_data_handler import ColumnarDataHandler
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.features.feature_store import FeatureStore
+
+
+def synthetic_symbols(n: int, prefix: str = "SYN") -> List[str]:
+    """
+    生成 n 个合成证券代码: SYN000000, SYN000001, ...
+    """
+    return ["%s%06d" % (prefix, i) for i in range(n)]
+
+
+class SyntheticDataHandler(ColumnarDataHandler):
+    """
+    内存中的合成行情数据处理器, 不依赖mongo, 用于基准测试和调试
+    每只证券的收盘价为几何随机游走, 开盘/最高/最低价及成交量由收盘价派生;
+    交易日为 start_date_str 起的 n_bars 个工作日, 可按 suspension_ratio 随机停牌(缺失K线)
+    同样的 seed 和证券代码总是生成同样的K线, 与加载顺序无关
+    """
+
+    def __init__(self,
+                 symbol_type: SymbolTypeEnum,
+                 cols_name: List[str],
+                 n_bars: int,
+                 seed: int = 0,
+                 start_date_str: str = '2010-01-04',
+                 initial_price: float = 10.0,
+                 volatility: float = 0.02,
+                 suspension_ratio: float = 0.0,
+                 feature_store: FeatureStore = None):
+        """
+
+        :param symbol_type
+        :param cols_name: 待获取列名称
+        :param n_bars: 每只证券的K线条数(停牌前)
+        :param seed: 随机种子, 与证券代码一起决定每只证券的K线
+        :param start_date_str: 第一个交易日
+        :param initial_price: 初始价格
+        :param volatility: 日收益率标准差
+        :param suspension_ratio: 停牌比例, 第一条K线不会停牌
+        :param feature_store: 特征存储
+        """
+        super(SyntheticDataHandler, self).__init__(symbol_type, cols_name, feature_store)
+        self._n_bars: int = n_bars
+        self._seed: int = seed
+        self._initial_price: float = initial_price
+        self._volatility: float = volatility
+        self._suspension_ratio: float = suspension_ratio
+        self._dates: np.ndarray = date_array(pandas.bdate_range(start_date_str, periods=n_bars).strftime('%Y-%m-%d'))
+
+    def _random_state_of(self, symbol: str) -> np.random.RandomState:
+        # RandomState 的随机序列在各numpy版本间保持不变
+        return np.random.RandomState([self._seed & 0xffffffff, zlib.crc32(symbol.encode('utf-8'))])
+
+    def _load_bar_columns(self, symbol: str) -> BarColumns:
+        rs = self._random_state_of(symbol)
+        n = self._n_bars
+        returns = rs.normal(0.0, self._volatility, n)
+        close = self._initial_price * np.exp(np.cumsum(returns))
+        open_ = np.empty(n)
+        open_[0] = self._initial_price
+        open_[1:] = close[:-1] * np.exp(rs.normal(0.0, self._volatility / 4.0, n - 1))
+        high = np.maximum(open_, close) * (1.0 + np.abs(rs.normal(0.0, self._volatility / 2.0, n)))
+        low = np.minimum(open_, close) * (1.0 - np.abs(rs.normal(0.0, self._volatility / 2.0, n)))
+        volume = np.floor(rs.lognormal(13.0, 0.5, n))
+
+        keep = np.ones(n, dtype=bool)
+        if self._suspension_ratio > 0 and n > 1:
+            keep[1:] = rs.random_sample(n - 1) >= self._suspension_ratio
+
+        return BarColumns(
+            symbol,
+            self._dates[keep],
+            *[np.round(arr[keep], 3) for arr in [open_, high, low, close]],
+            volume[keep]
+        )
@@ -0,0 +1,209 @@
+import bisect
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.commons.data_handlers.bar_columns import date_array
+
+
+def default_trade_calendar_dir() -> str:
+    """
+    环境变量 QUANT_TRADE_CALENDAR_DIR, 默认 ~/.quant-trader/calendar
+    """
+    return os.environ.get("QUANT_TRADE_CALENDAR_DIR") \
+        or os.path.join(os.path.expanduser("~"), ".quant-trader", "calendar")
+
+
+class TradeCalendar(object):
+    """
+    交易日历
+    每只证券一个升序交易日期列表, 交易所日历默认为全部证券交易日期的并集;
+    previous / next / offset / range 查询都在内存中二分查找, 不访问mongo
+    symbol 为 None 时查询交易所日历
+    """
+
+    def __init__(self, symbol_dates: Dict[str, List[str]] = None, exchange_dates: List[str] = None):
+        """
+
+        :param symbol_dates: map(symbol_code -> 交易日期), 无需有序
+        :param exchange_dates: 交易所日历, 为None时取各证券交易日期的并集
+        """
+        # map(symbol_code -> 升序去重的交易日期)
+        self._symbol_dates: Dict[str, List[str]] = {}
+        self._fixed_exchange: bool = exchange_dates is not None
+        self._exchange_dates: Optional[List[str]] = \
+            sorted(set(exchange_dates)) if exchange_dates is not None else None
+        for symbol, dates in (symbol_dates or {}).items():
+            self.add(symbol, dates)
+
+    def add(self, symbol: str, dates: List[str]):
+        """
+        添加或替换一只证券的交易日期
+        """
+        self._symbol_dates[symbol] = sorted(set([str(d) for d in dates]))
+        if not self._fixed_exchange:
+            self._exchange_dates = None
+
+    def has(self, symbol: str) -> bool:
+        return symbol in self._symbol_dates
+
+    def symbols(self) -> List[str]:
+        return list(self._symbol_dates.keys())
+
+    def dates(self, symbol: str = None) -> List[str]:
+        """
+        升序交易日期, 调用方不应修改返回的列表
+        """
+        if symbol is not None:
+            return self._symbol_dates[symbol]
+        if self._exchange_dates is None:
+            exchange_dates = set()
+            for dates in self._symbol_dates.values():
+                exchange_dates.update(dates)
+            self._exchange_dates = sorted(exchange_dates)
+        return self._exchange_dates
+
+    def is_trade_date(self, date_str: str, symbol: str = None) -> bool:
+        dates = self.dates(symbol)
+        idx = bisect.bisect_left(dates, date_str)
+        return idx < len(dates) and dates[idx] == date_str
+
+    def first_date(self, symbol: str = None) -> Optional[str]:
+        dates = self.dates(symbol)
+        return dates[0] if dates else None
+
+    def last_date(self, symbol: str = None) -> Optional[str]:
+        dates = self.dates(symbol)
+        return dates[-1] if dates else None
+
+    def previous_date(self, date_str: str, symbol: str = None) -> Optional[str]:
+        """
+        严格早于 date_str 的最后一个交易日, 没有时返回None
+        """
+        dates = self.dates(symbol)
+        idx = bisect.bisect_left(dates, date_str) - 1
+        return dates[idx] if idx >= 0 else None
+
+    def next_date(self, date_str: str, symbol: str = None) -> Optional[str]:
+        """
+        严格晚于 date_str 的第一个交易日, 没有时返回None
+        """
+        dates = self.dates(symbol)
+        idx = bisect.bisect_right(dates, date_str)
+        return dates[idx] if idx < len(dates) else None
+
+    def offset(self, date_str: str, n: int, symbol: str = None) -> Optional[str]:
+        """
+        相对 date_str 偏移 n 个交易日, n > 0 向后, n < 0 向前
+        date_str 不是交易日时, 偏移1 即下一个交易日, 偏移-1 即上一个交易日; n == 0 时只有交易日返回自身
+        超出日历范围时返回None
+        """
+        dates = self.dates(symbol)
+        if n > 0:
+            idx = bisect.bisect_right(dates, date_str) - 1 + n
+        elif n < 0:
+            idx = bisect.bisect_left(dates, date_str) + n
+        else:
+            return date_str if self.is_trade_date(date_str, symbol) else None
+        return dates[idx] if 0 <= idx < len(dates) else None
+
+    def date_range(self, start_date_str: str = None, end_date_str: str = None, symbol: str = None) -> List[str]:
+        """
+        [start_date_str, end_date_str] 闭区间内的交易日, 边界为None时不限制
+        """
+        dates = self.dates(symbol)
+        start = 0 if start_date_str is None else bisect.bisect_left(dates, start_date_str)
+        end = len(dates) if end_date_str is None else bisect.bisect_right(dates, end_date_str)
+        return dates[start:end]
+
+
+class TradeCalendarStore(object):
+    """
+    交易日历磁盘缓存
+    每只证券一个 .npy 文件: <root_dir>/<symbol>.npy, 保存定长字符串交易日期(宽度取最长日期的长度);
+    文件超过 max_age_seconds, 或者最后一个日期与 watermark_fn 返回的最新K线日期不一致时重新加载
+    """
+
+    def __init__(self, root_dir: str = None, max_age_seconds: float = 24 * 3600.0):
+        """
+
+        :param root_dir: 缓存目录, 默认 default_trade_calendar_dir()
+        :param max_age_seconds: 缓存有效期
+        """
+        self._root_dir: str = root_dir if root_dir is not None else default_trade_calendar_dir()
+        self._max_age_seconds: float = max_age_seconds
+        self.loaded: int = 0
+
+    def path_of(self, symbol: str) -> str:
+        return os.path.join(self._root_dir, "%s.npy" % symbol)
+
+    def load(self, symbol: str) -> Optional[List[str]]:
+        """
+        :return: 缓存不存在或已过期时返回None
+        """
+        path = self.path_of(symbol)
+        if not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > self._max_age_seconds:
+            return None
+        return np.load(path, allow_pickle=False).tolist()
+
+    def save(self, symbol: str, dates: List[str]):
+        os.makedirs(self._root_dir, exist_ok=True)
+        # 先写临时文件再原子替换, 并发进程不会读到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(dir=self._root_dir, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, date_array(sorted(dates)), allow_pickle=False)
+            os.replace(tmp_path, self.path_of(symbol))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def invalidate(self, symbol: str):
+        path = self.path_of(symbol)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def get_calendar(
+            self,
+            symbol_list: List[str],
+            loader: Callable[[List[str]], Dict[str, List[str]]],
+            calendar: TradeCalendar = None,
+            watermark_fn: Callable[[str], Optional[str]] = None,
+            refresh: bool = False
+    ) -> TradeCalendar:
+        """
+        把 symbol_list 中尚未加入 calendar 的证券加入日历: 优先读磁盘缓存, 缓存失效的证券一次调用 loader 加载并写回缓存
+
+        :param loader: 批量加载交易日期, map(symbol_code -> 交易日期)
+        :param calendar: 追加到该日历, 为None时新建
+        :param watermark_fn: 返回证券最新K线日期, 用于校验缓存是否过期, 为None时只按有效期判断
+        :param refresh: 忽略磁盘缓存
+        """
+        calendar = calendar if calendar is not None else TradeCalendar()
+        to_load = []
+        for symbol in symbol_list:
+            if calendar.has(symbol):
+                continue
+            dates = None if refresh else self.load(symbol)
+            if dates is not None and watermark_fn is not None \
+                    and (dates[-1] if dates else None) != watermark_fn(symbol):
+                dates = None
+            if dates is None:
+                to_load.append(symbol)
+            else:
+                calendar.add(symbol, dates)
+
+        if to_load:
+            loaded = loader(to_load)
+            self.loaded += len(to_load)
+            for symbol in to_load:
+                dates = loaded.get(symbol, [])
+                self.save(symbol, dates)
+                calendar.add(symbol, dates)
+        return calendar
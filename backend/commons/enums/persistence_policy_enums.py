@@ -0,0 +1,17 @@
+from enum import Enum
+
+
+class PersistencePolicyEnum(Enum):
+    """
+    证券投资组合持久化策略
+    EVERY_EVENT 每个事件写入一次
+    EVERY_N_EVENTS 每N个事件写入一次
+    INTERVAL 距上次写入超过指定秒数时写入
+    END_OF_RUN 运行结束时写入一次, 适用于回测
+    NEVER 不写入mongo, 适用于基准测试等不需要保存结果的场景
+    """
+    EVERY_EVENT = "EVERY_EVENT"
+    EVERY_N_EVENTS = "EVERY_N_EVENTS"
+    INTERVAL = "INTERVAL"
+    END_OF_RUN = "END_OF_RUN"
+    NEVER = "NEVER"
@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class PipelineStageEnum(Enum):
+    """
+    事件处理流水线的阶段, 用于耗时统计
+    阶段计时为包含式: DATA_FETCH 会同时计入外层阶段
+    """
+    MARK_TO_MARKET = "mark_to_market"
+    UPDATE_INDICATORS = "update_indicators"
+    CALCULATE_SIGNALS = "calculate_signals"
+    GENERATE_ORDER = "generate_order_event"
+    EXECUTE_ORDER = "execute_order"
+    UPDATE_FILL = "update_fill"
+    PERSIST = "persist"
+    DATA_FETCH = "data_fetch"
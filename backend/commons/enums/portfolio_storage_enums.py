@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class PortfolioStorageEnum(Enum):
+    """
+    证券投资组合在mongo中的存储结构
+    DOCUMENT 每个组合一个文档, 历史记录保存在文档内的数组中
+    BUCKETED 每个组合一个头文档, 历史记录按行数分桶保存在独立的集合中, 适用于分钟级或长周期回测
+    """
+    DOCUMENT = "DOCUMENT"
+    BUCKETED = "BUCKETED"
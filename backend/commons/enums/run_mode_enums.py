@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class RunModeEnum(Enum):
+    """
+    回测运行模式
+    HEARTBEAT 按心跳轮询事件队列, 每次心跳后休眠
+    FAST 不休眠, 一次性处理完全部历史事件
+    """
+    HEARTBEAT = "HEARTBEAT"
+    FAST = "FAST"
@@ -1,9 +1,12 @@
 from abc import ABCMeta
+from typing import Optional
 
 from backend.commons.enums import order_type_enums
 from backend.commons.enums.event_type_enums import EventTypeEnum
 from backend.commons.enums.order_type_enums import OrderTypeEnum, DirectionTypeEnum
 from backend.commons.enums.signal_type_enums import SignalTypeEnum
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.utils.date_keys import key_2_date_str, optional_date_str, format_key
 
 
 class AbstractEvent(metaclass=ABCMeta):
@@ -11,25 +14,36 @@ class AbstractEvent(metaclass=ABCMeta):
     Event is base class providing an interface for all subsequent
     (inherited) events, that will trigger further events in the
     trading infrastructure.
+
+    事件使用 __slots__ 并直接访问字段, 日期以整数日期键(date_keys)保存,
+    event_type 为类属性, 不占用实例空间; 日期字符串只在访问数据源等边界处由持有 DateFormatStrEnum 的调用方按需格式化
     """
+    __slots__ = ('symbol', 'date_key')
 
-    def __init__(self, symbol: str, date_str: str, event_type: EventTypeEnum):
-        self._symbol = symbol
-        self._date_str = date_str
-        self._event_type = event_type
+    event_type: EventTypeEnum = None
 
-    def symbol(self):
-        return self._symbol
+    def __init__(self, symbol: str, date_key: int):
+        """
 
-    def event_type(self):
-        return self._event_type
+        :param symbol: 证券代码
+        :param date_key: 日期键, 见 backend.commons.utils.date_keys
+        """
+        self.symbol: str = symbol
+        self.date_key: int = date_key
 
-    def date_str(self):
-        return self._date_str
+    @property
+    def date_str(self) -> str:
+        """
+        日线格式的日期, 日内键使用 date_str_of
+        """
+        return key_2_date_str(self.date_key)
+
+    def date_str_of(self, date_format: DateFormatStrEnum) -> str:
+        return key_2_date_str(self.date_key, date_format)
 
     def __str__(self) -> str:
         return "AbstractEvent(symbol_code=%s, date_time=%s, event_type=%s)" \
-               % (self.symbol(), self.date_str(), self.event_type())
+               % (self.symbol, format_key(self.date_key), self.event_type)
 
 
 class MarketEvent(AbstractEvent):
@@ -37,17 +51,32 @@ class MarketEvent(AbstractEvent):
     Handles the event of receiving a new market update with
     corresponding bars.
     """
+    __slots__ = ('previous_key',)
+
+    event_type: EventTypeEnum = EventTypeEnum.MARKET
 
-    def __init__(self, symbol: str, date_str: str, previous_date: str):
+    def __init__(self, symbol: str, date_key: int, previous_key: Optional[int]):
         """
         Initialises the MarketEvent.
+
+        :param previous_key: 该证券上一个交易日的日期键, 没有时为None
+        """
+        super(MarketEvent, self).__init__(symbol, date_key)
+        self.previous_key: Optional[int] = previous_key
+
+    @property
+    def previous_date(self) -> Optional[str]:
+        """
+        日线格式的上一个交易日, 日内键使用 previous_date_of
         """
-        super(MarketEvent, self).__init__(symbol, date_str, EventTypeEnum.MARKET)
-        self.previous_date = previous_date
+        return optional_date_str(self.previous_key)
+
+    def previous_date_of(self, date_format: DateFormatStrEnum) -> Optional[str]:
+        return optional_date_str(self.previous_key, date_format)
 
     def __str__(self) -> str:
         return "MarketEvent(symbol_code=%s, date_time=%s, event_type=%s, previous_date_time=%s)" \
-               % (self.symbol(), self.date_str(), self.event_type(), self.previous_date)
+               % (self.symbol, format_key(self.date_key), self.event_type, format_key(self.previous_key))
 
 
 class SignalEvent(AbstractEvent):
@@ -56,7 +85,11 @@ class SignalEvent(AbstractEvent):
     This is received by a Portfolio object and acted upon.
     """
 
-    def __init__(self, symbol: str, date_str: str, signal_type: SignalTypeEnum, strategy_id: int, strength):
+    __slots__ = ('signal_type', 'strategy_id', 'strength')
+
+    event_type: EventTypeEnum = EventTypeEnum.SIGNAL
+
+    def __init__(self, symbol: str, date_key: int, signal_type: SignalTypeEnum, strategy_id: int, strength):
         """
         Initialises the SignalEvent.
 
@@ -68,14 +101,14 @@ class SignalEvent(AbstractEvent):
         strength - An adjustment factor "suggestion" used to scale
             quantity at the portfolios level. Useful for pairs strategies.
         """
-        super(SignalEvent, self).__init__(symbol, date_str, EventTypeEnum.SIGNAL)
+        super(SignalEvent, self).__init__(symbol, date_key)
         self.strategy_id: int = strategy_id
         self.signal_type: SignalTypeEnum = signal_type
         self.strength = strength
 
     def __str__(self) -> str:
         return "SignalEvent(symbol_code=%s, date_time=%s, event_type=%s, signal_type=%s, strategy_id=%s,strength=%s)" \
-               % (self.symbol(), self.date_str(), self.event_type(), self.signal_type, self.strategy_id,
+               % (self.symbol, format_key(self.date_key), self.event_type, self.signal_type, self.strategy_id,
                   self.strength)
 
 
@@ -86,7 +119,11 @@ class OrderEvent(AbstractEvent):
     quantity and a direction.
     """
 
-    def __init__(self, symbol: str, date_str: str, order_type: OrderTypeEnum, quantity: int,
+    __slots__ = ('order_type', 'quantity', 'direction_type')
+
+    event_type: EventTypeEnum = EventTypeEnum.ORDER
+
+    def __init__(self, symbol: str, date_key: int, order_type: OrderTypeEnum, quantity: int,
                  direction_type: DirectionTypeEnum):
         """
         Initialises the order type, setting whether it is
@@ -102,7 +139,7 @@ class OrderEvent(AbstractEvent):
         quantity - Non-negative integer for quantity.
         direction - 'BUY' or 'SELL' for long or short.
         """
-        super(OrderEvent, self).__init__(symbol, date_str, EventTypeEnum.ORDER)
+        super(OrderEvent, self).__init__(symbol, date_key)
         if quantity is None or quantity < 0:
             raise ArithmeticError("quantity must >= 0")
         self.order_type: OrderTypeEnum = order_type
@@ -112,7 +149,7 @@ class OrderEvent(AbstractEvent):
     def __str__(self) -> str:
         return "OrderEvent(symbol_code=%s, date_time=%s, event_type=%s, order_type=%s, quantity=%s" \
                ",direction_type=%s)" \
-               % (self.symbol(), self.date_str(), self.event_type(), self.order_type, self.quantity,
+               % (self.symbol, format_key(self.date_key), self.event_type, self.order_type, self.quantity,
                   self.direction_type)
 
 
@@ -129,9 +166,13 @@ class FillEvent(AbstractEvent):
     the cost.
     """
 
+    __slots__ = ('quantity', 'direction_type', 'fill_cost', 'commission', 'exchanger')
+
+    event_type: EventTypeEnum = EventTypeEnum.FILL
+
     def __init__(self,
                  symbol: str,
-                 date_str: str,
+                 date_key: int,
                  quantity: int,
                  direction_type: order_type_enums.DirectionTypeEnum,
                  fill_cost: float,
@@ -146,7 +187,7 @@ class FillEvent(AbstractEvent):
         calculate it based on the trade size and Interactive
         Brokers fees.
 
-        :param date_str: - The bar-resolution when the order was filled.
+        :param date_key: - The bar-resolution when the order was filled. 日期键
         :param symbol - The instrument which was filled.
         :param quantity - The filled quantity. 数量
         :param direction_type - The direction of fill ('BUY' or 'SELL')
@@ -154,7 +195,7 @@ class FillEvent(AbstractEvent):
         :param commission 佣金
         :param exchanger - The exchange where the order was filled. 交易所名称
         """
-        super(FillEvent, self).__init__(symbol, date_str, EventTypeEnum.FILL)
+        super(FillEvent, self).__init__(symbol, date_key)
         self.quantity: int = quantity
         self.direction_type: order_type_enums.DirectionTypeEnum = direction_type
         self.fill_cost: float = fill_cost
@@ -164,5 +205,5 @@ class FillEvent(AbstractEvent):
     def __str__(self) -> str:
         return "FillEvent(symbol_code=%s, date_time=%s, event_type=%s, quantity=%s, direction_type=%s" \
                ",fill_cost=%s, commission=%s, exchanger=%s)" \
-               % (self.symbol(), self.date_str(), self.event_type(), self.quantity, self.direction_type,
+               % (self.symbol, format_key(self.date_key), self.event_type, self.quantity, self.direction_type,
                   self.fill_cost, self.commission, self.exchanger)
@@ -0,0 +1,2 @@
+from backend.commons.features.feature_set import FeatureSet, FEATURE_CODE_VERSION
+from backend.commons.features.feature_store import FeatureStore, FeatureColumns, default_feature_store_dir
@@ -0,0 +1,87 @@
+import hashlib
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas
+
+from backend.commons.data_handlers.bar_columns import BarColumns
+
+# 特征计算逻辑变化时递增, 使已持久化的特征失效
+FEATURE_CODE_VERSION = 1
+
+
+class FeatureSet(object):
+    """
+    可配置的特征集合, 对证券全部历史一次性向量化计算
+    第i行特征只使用 dates[i] 及之前的K线
+    ret_<h>: h 周期收益率
+    vol_<w>: w 周期收益率滚动标准差
+    ma_ratio_<s>_<l>: s 周期均线 / l 周期均线 - 1
+    volume_z_<w>: 成交量相对 w 周期均值的 z-score
+    """
+
+    def __init__(
+            self,
+            return_horizons: List[int] = (1, 5, 20),
+            volatility_windows: List[int] = (20,),
+            ma_ratio_windows: List[Tuple[int, int]] = ((5, 20),),
+            volume_zscore_windows: List[int] = (20,)
+    ):
+        """
+
+        :param return_horizons: 收益率周期
+        :param volatility_windows: 波动率窗口
+        :param ma_ratio_windows: (短均线, 长均线) 窗口
+        :param volume_zscore_windows: 成交量 z-score 窗口
+        """
+        self.return_horizons: List[int] = [int(h) for h in return_horizons]
+        self.volatility_windows: List[int] = [int(w) for w in volatility_windows]
+        self.ma_ratio_windows: List[Tuple[int, int]] = [(int(s), int(l)) for s, l in ma_ratio_windows]
+        self.volume_zscore_windows: List[int] = [int(w) for w in volume_zscore_windows]
+
+    def definition(self) -> Dict[str, object]:
+        return {
+            "code_version": FEATURE_CODE_VERSION,
+            "return_horizons": self.return_horizons,
+            "volatility_windows": self.volatility_windows,
+            "ma_ratio_windows": [list(w) for w in self.ma_ratio_windows],
+            "volume_zscore_windows": self.volume_zscore_windows
+        }
+
+    def version(self) -> str:
+        """
+        特征定义的摘要, 作为持久化文件的版本号
+        """
+        text = json.dumps(self.definition(), sort_keys=True)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+    def feature_names(self) -> List[str]:
+        return ["ret_%d" % h for h in self.return_horizons] \
+               + ["vol_%d" % w for w in self.volatility_windows] \
+               + ["ma_ratio_%d_%d" % (s, l) for s, l in self.ma_ratio_windows] \
+               + ["volume_z_%d" % w for w in self.volume_zscore_windows]
+
+    def compute(self, bar_columns: BarColumns) -> Dict[str, np.ndarray]:
+        """
+        :return: map(特征名 -> 与 bar_columns.dates 对齐的 float64 数组), 窗口不足处为 NaN
+        """
+        close = pandas.Series(bar_columns.close)
+        volume = pandas.Series(bar_columns.volume)
+        returns = close.pct_change()
+
+        features = {}
+        for h in self.return_horizons:
+            features["ret_%d" % h] = close.pct_change(h).values
+        for w in self.volatility_windows:
+            features["vol_%d" % w] = returns.rolling(w, min_periods=w).std().values
+        for s, l in self.ma_ratio_windows:
+            short_mav = close.rolling(s, min_periods=s).mean()
+            long_mav = close.rolling(l, min_periods=l).mean()
+            features["ma_ratio_%d_%d" % (s, l)] = (short_mav / long_mav - 1.0).values
+        for w in self.volume_zscore_windows:
+            mean = volume.rolling(w, min_periods=w).mean()
+            std = volume.rolling(w, min_periods=w).std()
+            features["volume_z_%d" % w] = ((volume - mean) / std.replace(0.0, np.nan)).values
+
+        return dict([(name, np.asarray(values, dtype=np.float64)) for name, values in features.items()])
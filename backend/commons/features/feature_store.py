@@ -0,0 +1,123 @@
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+from pandas import DataFrame, Index
+
+from backend.commons.data_handlers.bar_columns import BarColumns, BAR_VALUE_COLUMN_NAMES
+from backend.commons.features.feature_set import FeatureSet
+
+
+def default_feature_store_dir() -> str:
+    """
+    环境变量 QUANT_FEATURE_STORE_DIR, 默认 ~/.quant-trader/features
+    """
+    return os.environ.get("QUANT_FEATURE_STORE_DIR") \
+        or os.path.join(os.path.expanduser("~"), ".quant-trader", "features")
+
+
+class FeatureColumns(object):
+    """
+    单只证券全部历史的特征, 列式存储, 按日期二分查找
+    """
+
+    def __init__(self, bar_columns: BarColumns, features: Dict[str, np.ndarray], feature_names: List[str]):
+        """
+
+        :param bar_columns: 计算特征所用的K线
+        :param features: map(特征名 -> 与 bar_columns.dates 对齐的数组)
+        :param feature_names: 特征列顺序
+        """
+        self.bar_columns: BarColumns = bar_columns
+        self.features: Dict[str, np.ndarray] = features
+        self.feature_names: List[str] = feature_names
+
+    def row(self, date_str: str, cols_name: List[str] = None) -> DataFrame:
+        """
+        以 date 为索引的单行 DataFrame, 包含K线字段和全部特征, 非交易日返回空表
+
+        :param cols_name: 只返回这些列, 为空时返回全部
+        """
+        idx = self.bar_columns.index_of(date_str)
+        start, end = (0, 0) if idx is None else (idx, idx + 1)
+
+        names = ['symbol'] + BAR_VALUE_COLUMN_NAMES + self.feature_names
+        if cols_name:
+            names = [name for name in names if name in cols_name]
+        data = {'symbol': [self.bar_columns.symbol] * (end - start)}
+        for name in BAR_VALUE_COLUMN_NAMES:
+            data[name] = self.bar_columns.column(name)[start:end]
+        for name in self.feature_names:
+            data[name] = self.features[name][start:end]
+
+        df = DataFrame(dict([(name, data[name]) for name in names]), columns=names,
+                       index=Index(self.bar_columns.dates[start:end], name='date'))
+        return df
+
+
+class FeatureStore(object):
+    """
+    特征持久化
+    每只证券每个特征集版本一个 .npz 文件: <root_dir>/<symbol>/<version>.npz,
+    文件中保存计算时K线的指纹, K线或特征定义变化时才重新计算
+    """
+
+    def __init__(self, feature_set: FeatureSet = None, root_dir: str = None):
+        """
+
+        :param feature_set: 特征集合, 默认 FeatureSet()
+        :param root_dir: 存储目录, 默认 default_feature_store_dir()
+        """
+        self.feature_set: FeatureSet = feature_set if feature_set is not None else FeatureSet()
+        self._root_dir: str = root_dir if root_dir is not None else default_feature_store_dir()
+        self._version: str = self.feature_set.version()
+        # map(symbol -> FeatureColumns)
+        self._cache: Dict[str, FeatureColumns] = {}
+        self.computed: int = 0
+
+    def path_of(self, symbol: str) -> str:
+        return os.path.join(self._root_dir, symbol, "%s.npz" % self._version)
+
+    def get(self, bar_columns: BarColumns) -> FeatureColumns:
+        symbol = bar_columns.symbol
+        cached = self._cache.get(symbol)
+        if cached is not None and cached.bar_columns is bar_columns:
+            return cached
+
+        fingerprint = bar_columns.fingerprint()
+        features = self._load(symbol, fingerprint)
+        if features is None:
+            features = self.feature_set.compute(bar_columns)
+            self.computed += 1
+            self._save(symbol, fingerprint, features)
+
+        feature_columns = FeatureColumns(bar_columns, features, self.feature_set.feature_names())
+        self._cache[symbol] = feature_columns
+        return feature_columns
+
+    def _load(self, symbol: str, fingerprint: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self.path_of(symbol)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["__fingerprint__"]) != fingerprint:
+                return None
+            names = self.feature_set.feature_names()
+            if any(name not in data.files for name in names):
+                return None
+            return dict([(name, data[name]) for name in names])
+
+    def _save(self, symbol: str, fingerprint: str, features: Dict[str, np.ndarray]):
+        path = self.path_of(symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换, 并发进程不会读到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, __fingerprint__=np.array(fingerprint), **features)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,3 @@
+from backend.commons.indicators.base import RingBuffer, AbstractIndicator, IndicatorSet
+from backend.commons.indicators.technical import SMA, EMA, RollingStd, BollingerBands, RSI, ATR, RollingMax, \
+    RollingMin
@@ -0,0 +1,145 @@
+from abc import ABCMeta, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.commons.data_handlers.bar_columns import BarColumns
+
+
+class RingBuffer(object):
+    """
+    定长环形缓冲区, 写满后覆盖最早的值
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive: %s" % capacity)
+        self._data: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        self._capacity: int = capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def capacity(self) -> int:
+        return self._capacity
+
+    def is_full(self) -> bool:
+        return self._size == self._capacity
+
+    def append(self, value: float) -> Optional[float]:
+        """
+        追加一个值
+        :return: 被覆盖的最早的值, 未写满时返回None
+        """
+        evicted = float(self._data[self._head]) if self._size == self._capacity else None
+        self._data[self._head] = value
+        self._head = (self._head + 1) % self._capacity
+        if self._size < self._capacity:
+            self._size += 1
+        return evicted
+
+    def oldest(self) -> float:
+        return float(self._data[(self._head - self._size) % self._capacity])
+
+    def latest(self) -> float:
+        return float(self._data[(self._head - 1) % self._capacity])
+
+    def values(self) -> np.ndarray:
+        """
+        按时间升序的副本
+        """
+        start = (self._head - self._size) % self._capacity
+        return np.roll(self._data, -start)[:self._size]
+
+
+class AbstractIndicator(metaclass=ABCMeta):
+    """
+    流式指标, 每根K线 O(1) 更新
+    """
+
+    def __init__(self, field: str = 'close'):
+        """
+
+        :param field: update_bar 读取的K线字段
+        """
+        self.field: str = field
+        self.value: Optional[float] = None
+        self.count: int = 0
+
+    @abstractmethod
+    def update(self, value: float) -> Optional[float]:
+        """
+        追加一个数值, 返回更新后的指标值
+        """
+        raise NotImplementedError()
+
+    def update_bar(self, bar_columns: BarColumns, index: int) -> Optional[float]:
+        """
+        追加一根K线, 默认读取 field 字段
+        """
+        return self.update(float(bar_columns.column(self.field)[index]))
+
+    def is_ready(self) -> bool:
+        """
+        是否已积累足够的K线
+        """
+        return self.value is not None
+
+
+class IndicatorSet(object):
+    """
+    策略声明的全部指标, 每只证券一组独立的实例
+    记录每只证券最近一次输入的K线日期, 之后只输入更晚的K线, 重复输入会被忽略
+    """
+
+    def __init__(self):
+        # map(指标名 -> 无参工厂)
+        self._factories: Dict[str, Callable[[], AbstractIndicator]] = {}
+        # map(symbol -> map(指标名 -> 实例))
+        self._instances: Dict[str, Dict[str, AbstractIndicator]] = {}
+        # map(symbol -> 最近一次输入的K线日期)
+        self._last_dates: Dict[str, str] = {}
+
+    def declare(self, name: str, factory: Callable[[], AbstractIndicator]):
+        self._factories[name] = factory
+
+    def names(self) -> List[str]:
+        return list(self._factories.keys())
+
+    def __len__(self):
+        return len(self._factories)
+
+    def _instances_of(self, symbol: str) -> Dict[str, AbstractIndicator]:
+        instances = self._instances.get(symbol)
+        if instances is None:
+            instances = dict([(name, factory()) for name, factory in self._factories.items()])
+            self._instances[symbol] = instances
+        return instances
+
+    def feed(self, symbol: str, bar_columns: BarColumns):
+        """
+        输入证券的K线, 只处理上次输入的日期之后的部分
+
+        :param bar_columns: 截至某一日期的K线, 通常为 PointInTimeView.bar_columns 返回的可见部分
+        """
+        if not self._factories or len(bar_columns) == 0:
+            return
+        last_date = self._last_dates.get(symbol)
+        end = len(bar_columns)
+        start = 0 if last_date is None else bar_columns.count_until(last_date)
+        if start >= end:
+            return
+
+        instances = self._instances_of(symbol)
+        for i in range(start, end):
+            for indicator in instances.values():
+                indicator.update_bar(bar_columns, i)
+        self._last_dates[symbol] = str(bar_columns.dates[end - 1])
+
+    def get(self, symbol: str, name: str) -> AbstractIndicator:
+        return self._instances_of(symbol)[name]
+
+    def value(self, symbol: str, name: str) -> Optional[float]:
+        return self.get(symbol, name).value
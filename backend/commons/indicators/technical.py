@@ -0,0 +1,221 @@
+import collections
+import math
+from typing import Deque, Optional, Tuple
+
+from backend.commons.data_handlers.bar_columns import BarColumns
+from backend.commons.indicators.base import AbstractIndicator, RingBuffer
+
+
+class SMA(AbstractIndicator):
+    """
+    简单移动平均, 维护窗口内的累计和
+    不足 window 根时为已有数据的平均值(与 rolling(window, min_periods=1) 一致)
+    """
+
+    def __init__(self, window: int, field: str = 'close'):
+        super(SMA, self).__init__(field)
+        self.window: int = window
+        self._buffer: RingBuffer = RingBuffer(window)
+        self._sum = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        evicted = self._buffer.append(value)
+        self._sum += value - (evicted if evicted is not None else 0.0)
+        self.count += 1
+        self.value = self._sum / len(self._buffer)
+        return self.value
+
+    def is_ready(self) -> bool:
+        return self._buffer.is_full()
+
+
+class EMA(AbstractIndicator):
+    """
+    指数移动平均, alpha = 2 / (window + 1), 以第一个值为初始值(与 ewm(span=window, adjust=False) 一致)
+    """
+
+    def __init__(self, window: int, field: str = 'close'):
+        super(EMA, self).__init__(field)
+        self.window: int = window
+        self.alpha: float = 2.0 / (window + 1)
+
+    def update(self, value: float) -> Optional[float]:
+        self.count += 1
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def is_ready(self) -> bool:
+        return self.count >= self.window
+
+
+class RollingStd(AbstractIndicator):
+    """
+    滚动标准差, 维护窗口内的累计和与平方和
+    """
+
+    def __init__(self, window: int, field: str = 'close', ddof: int = 0):
+        super(RollingStd, self).__init__(field)
+        self.window: int = window
+        self.ddof: int = ddof
+        self.mean: Optional[float] = None
+        self._buffer: RingBuffer = RingBuffer(window)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        evicted = self._buffer.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+        if evicted is not None:
+            self._sum -= evicted
+            self._sum_sq -= evicted * evicted
+        self.count += 1
+
+        n = len(self._buffer)
+        self.mean = self._sum / n
+        if n - self.ddof <= 0:
+            self.value = None
+        else:
+            self.value = math.sqrt(max(0.0, (self._sum_sq - self._sum * self.mean) / (n - self.ddof)))
+        return self.value
+
+    def is_ready(self) -> bool:
+        return self._buffer.is_full()
+
+
+class BollingerBands(AbstractIndicator):
+    """
+    布林带, value 为中轨, upper/lower 为中轨 ± num_std 倍标准差
+    """
+
+    def __init__(self, window: int = 20, num_std: float = 2.0, field: str = 'close'):
+        super(BollingerBands, self).__init__(field)
+        self.num_std: float = num_std
+        self._std: RollingStd = RollingStd(window, field)
+        self.upper: Optional[float] = None
+        self.lower: Optional[float] = None
+
+    def update(self, value: float) -> Optional[float]:
+        std = self._std.update(value)
+        self.count += 1
+        self.value = self._std.mean
+        self.upper = self.value + self.num_std * std
+        self.lower = self.value - self.num_std * std
+        return self.value
+
+    def is_ready(self) -> bool:
+        return self._std.is_ready()
+
+
+class RSI(AbstractIndicator):
+    """
+    相对强弱指标, Wilder 平滑: 前 window 个涨跌幅取简单平均, 之后 avg = (avg * (window - 1) + x) / window
+    """
+
+    def __init__(self, window: int = 14, field: str = 'close'):
+        super(RSI, self).__init__(field)
+        self.window: int = window
+        self._previous: Optional[float] = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._changes = 0
+
+    def update(self, value: float) -> Optional[float]:
+        self.count += 1
+        previous, self._previous = self._previous, value
+        if previous is None:
+            return self.value
+
+        change = value - previous
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        self._changes += 1
+        if self._changes <= self.window:
+            self._avg_gain += (gain - self._avg_gain) / self._changes
+            self._avg_loss += (loss - self._avg_loss) / self._changes
+        else:
+            self._avg_gain = (self._avg_gain * (self.window - 1) + gain) / self.window
+            self._avg_loss = (self._avg_loss * (self.window - 1) + loss) / self.window
+
+        if self._changes < self.window:
+            return self.value
+        if self._avg_loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + self._avg_gain / self._avg_loss)
+        return self.value
+
+
+class ATR(AbstractIndicator):
+    """
+    平均真实波幅, Wilder 平滑, 需要 high/low/close
+    """
+
+    def __init__(self, window: int = 14):
+        super(ATR, self).__init__('close')
+        self.window: int = window
+        self._previous_close: Optional[float] = None
+        self._avg = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        return self.update_hlc(value, value, value)
+
+    def update_bar(self, bar_columns: BarColumns, index: int) -> Optional[float]:
+        return self.update_hlc(float(bar_columns.high[index]), float(bar_columns.low[index]),
+                               float(bar_columns.close[index]))
+
+    def update_hlc(self, high: float, low: float, close: float) -> Optional[float]:
+        if self._previous_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self._previous_close), abs(low - self._previous_close))
+        self._previous_close = close
+        self.count += 1
+
+        if self.count <= self.window:
+            self._avg += (true_range - self._avg) / self.count
+        else:
+            self._avg = (self._avg * (self.window - 1) + true_range) / self.window
+        if self.count >= self.window:
+            self.value = self._avg
+        return self.value
+
+
+class RollingMax(AbstractIndicator):
+    """
+    滚动最大值, 单调队列, 均摊 O(1)
+    """
+
+    def __init__(self, window: int, field: str = 'close'):
+        super(RollingMax, self).__init__(field)
+        self.window: int = window
+        # (序号, 值), 值单调递减
+        self._deque: Deque[Tuple[int, float]] = collections.deque()
+
+    def _dominates(self, new_value: float, old_value: float) -> bool:
+        return new_value >= old_value
+
+    def update(self, value: float) -> Optional[float]:
+        while self._deque and self._dominates(value, self._deque[-1][1]):
+            self._deque.pop()
+        self._deque.append((self.count, value))
+        if self._deque[0][0] <= self.count - self.window:
+            self._deque.popleft()
+        self.count += 1
+        self.value = self._deque[0][1]
+        return self.value
+
+    def is_ready(self) -> bool:
+        return self.count >= self.window
+
+
+class RollingMin(RollingMax):
+    """
+    滚动最小值, 单调队列, 均摊 O(1)
+    """
+
+    def _dominates(self, new_value: float, old_value: float) -> bool:
+        return new_value <= old_value
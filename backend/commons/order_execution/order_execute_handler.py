@@ -4,6 +4,7 @@ from typing import Optional
 
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
 from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
 from backend.commons.enums.event_type_enums import EventTypeEnum
 from backend.commons.events.base import FillEvent, OrderEvent
 
@@ -44,14 +45,17 @@ class SimulatedOrderExecuteHandler(AbstractOrderExecuteHandler):
     handler.
     """
 
-    def __init__(self):
+    def __init__(self, date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE):
         """
         Initialises the handler, setting the event queues
         up internally.
 
         Parameters:
         events - The Queue of Event objects.
+
+        :param date_format: 日期格式, 按该格式向数据源查询成交价
         """
+        self._date_format: DateFormatStrEnum = date_format
 
     def execute_order(self, data_handler: CommonDataHandler, order_event: OrderEvent) -> Optional[FillEvent]:
         """
@@ -65,14 +69,14 @@ class SimulatedOrderExecuteHandler(AbstractOrderExecuteHandler):
         self._send_notice(order_event)
 
         # 处理花费
-        if order_event.event_type() == EventTypeEnum.ORDER:
-            adj_close: float = data_handler.get_bar_value(order_event.symbol(), order_event.date_str(),
+        if order_event.event_type == EventTypeEnum.ORDER:
+            adj_close: float = data_handler.get_bar_value(order_event.symbol, order_event.date_str_of(self._date_format),
                                                           BarValTypeEnum.ADJ_CLOSE)
             fill_cost: float = float(order_event.quantity * adj_close)
 
             commission: float = self._commission_from_guojin(order_event)
 
-            fill_event = FillEvent(order_event.symbol(), order_event.date_str(), order_event.quantity,
+            fill_event = FillEvent(order_event.symbol, order_event.date_key, order_event.quantity,
                                    order_event.direction_type, fill_cost, commission, '国金证券')
             return fill_event
 
@@ -81,8 +85,15 @@ class SimulatedOrderExecuteHandler(AbstractOrderExecuteHandler):
 
     @staticmethod
     def _commission_from_guojin(order_event: OrderEvent) -> float:
+        return SimulatedOrderExecuteHandler.commission(order_event.quantity)
+
+    @staticmethod
+    def commission(quantity: int) -> float:
+        """
+        按成交数量计算佣金
+        """
         # todo
-        return order_event.quantity * 0.0025
+        return quantity * 0.0025
 
     def _fill_cost(self) -> float:
         raise NotImplementedError()
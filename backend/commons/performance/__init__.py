@@ -6,12 +6,37 @@ class StatisticSummary:
                  total_return: float,
                  sharpe_ratio: float,
                  max_drawn_down: float,
-                 drawn_down_duration: int
+                 drawn_down_duration: int,
+                 sortino_ratio: float = None,
+                 calmar_ratio: float = None,
+                 cagr: float = None,
+                 volatility: float = None,
+                 turnover: float = None,
+                 win_rate: float = None
                  ):
+        """
+
+        :param total_return: 总收益率(%)
+        :param sharpe_ratio: 年化夏普比率
+        :param max_drawn_down: 最大回撤(%)
+        :param drawn_down_duration: 最长回撤持续周期数
+        :param sortino_ratio: 年化索提诺比率
+        :param calmar_ratio: 卡玛比率, 年化收益率 / 最大回撤
+        :param cagr: 年化复合收益率(%)
+        :param volatility: 年化波动率(%)
+        :param turnover: 换手率, 累计成交金额 / 平均总金额
+        :param win_rate: 盈利周期占比(%), 收益率>0 的周期数 / 收益率非0的周期数
+        """
         self.total_return: float = total_return
         self.sharpe_ratio: float = sharpe_ratio
         self.max_drawn_down: float = max_drawn_down
         self.drawn_down_duration: int = drawn_down_duration
+        self.sortino_ratio: float = sortino_ratio
+        self.calmar_ratio: float = calmar_ratio
+        self.cagr: float = cagr
+        self.volatility: float = volatility
+        self.turnover: float = turnover
+        self.win_rate: float = win_rate
 
 
 class EquityCurve:
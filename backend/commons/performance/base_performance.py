@@ -3,26 +3,71 @@
 
 # performance.py
 
+from typing import Optional
+
 import numpy as np
 import pandas
-import pandas as pd
 
-# todo 补全指标计算
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.performance import StatisticSummary, EquityCurve
+
+# map((证券类型, 日期格式) -> 每年周期数)
+# A股每年约252个交易日, 每日交易4小时(240分钟)
+_PERIODS_PER_YEAR = {
+    (SymbolTypeEnum.CHINA_STOCK, DateFormatStrEnum.DAY_BASE): 252,
+    (SymbolTypeEnum.CHINA_STOCK, DateFormatStrEnum.HOUR_BASE): 252 * 4,
+    (SymbolTypeEnum.CHINA_STOCK, DateFormatStrEnum.MINUTE_BASE): 252 * 240,
+}
 
 
-def create_sharpe_ratio(returns, symbol_type: SymbolTypeEnum) -> float:
+def periods_per_year(symbol_type: SymbolTypeEnum,
+                     date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> Optional[int]:
+    """
+    年化使用的每年周期数, 未知的组合返回None
+    """
+    return _PERIODS_PER_YEAR.get((symbol_type, date_format))
+
+
+def create_sharpe_ratio(returns, symbol_type: SymbolTypeEnum,
+                        date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> Optional[float]:
     """
     Create the Sharpe ratio for the strategy, based on a
     benchmark of zero (i.e. no risk-free rate information).
 
     Parameters:
     returns - A pandas Series representing period percentage returns.
-    periods - Daily (252), Hourly (252*6.5), Minutely(252*6.5*60) etc.
+    date_format - 决定年化周期数, 见 periods_per_year
     """
-    if symbol_type == SymbolTypeEnum.CHINA_STOCK:
-        periods = 252
-        return np.sqrt(periods) * (np.mean(returns)) / np.std(returns)
+    periods = periods_per_year(symbol_type, date_format)
+    if periods is None:
+        return None
+    returns = np.asarray(returns, dtype=np.float64)
+    returns = returns[~np.isnan(returns)]
+    return np.sqrt(periods) * np.mean(returns) / np.std(returns)
+
+
+def _draw_downs(pnl: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    以 np.maximum.accumulate 计算最高净值, 回撤持续期为连续回撤的游程长度
+    与原逐点循环一致: 最高净值从0开始, 第一个点不计算
+    """
+    n = len(pnl)
+    draw_down = np.full(n, np.nan)
+    duration = np.full(n, np.nan)
+    if n < 2:
+        return draw_down, duration
+
+    hwm = np.maximum.accumulate(np.maximum(pnl[1:], 0.0))
+    draw_down[1:] = hwm - pnl[1:]
+
+    # 游程: 每个点距最近一次无回撤(或起点)的周期数
+    index = np.arange(n)
+    in_draw_down = np.zeros(n, dtype=bool)
+    in_draw_down[1:] = draw_down[1:] != 0
+    last_reset = np.maximum.accumulate(np.where(in_draw_down, 0, index))
+    duration[1:] = (index - last_reset)[1:]
+    return draw_down, duration
 
 
 def create_draw_downs(pnl: pandas.Series) -> (pandas.Series, float, int):
@@ -37,19 +82,83 @@ def create_draw_downs(pnl: pandas.Series) -> (pandas.Series, float, int):
     Returns:
     drawdown, duration - Highest peak-to-trough drawdown and duration.
     """
+    draw_down, duration = _draw_downs(np.asarray(pnl, dtype=np.float64))
+    draw_down = pandas.Series(draw_down, index=pnl.index)
+    duration = pandas.Series(duration, index=pnl.index)
+    return draw_down, draw_down.max(), duration.max()
 
-    # Calculate the cumulative returns curve
-    # and set up the High Water Mark
-    hwm = [0]
 
-    # Create the drawdown and duration series
-    idx = pnl.index
-    draw_down = pd.Series(index=idx)
-    duration = pd.Series(index=idx)
+def create_statistic_summary(curve: pandas.DataFrame, symbol_type: SymbolTypeEnum,
+                             date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE
+                             ) -> (StatisticSummary, EquityCurve):
+    """
+    由包含 total 列的持有金额曲线一次性计算全部绩效指标
+    会在 curve 上追加 returns, equity_curve, draw_down 列
+    curve 包含 traded_value(累计成交金额) 列时计算换手率
 
-    # Loop over the index range
-    for t in range(1, len(idx)):
-        hwm.append(max(hwm[t - 1], pnl[t]))
-        draw_down[t] = (hwm[t] - pnl[t])
-        duration[t] = (0 if draw_down[t] == 0 else duration[t - 1] + 1)
-    return draw_down, draw_down.max(), duration.max()
+    :param curve: 持有金额曲线
+    :param symbol_type: 证券类型
+    :param date_format: 周期粒度, 决定年化周期数
+    """
+    total = curve['total'].values.astype(np.float64)
+    n = len(total)
+
+    returns = np.full(n, np.nan)
+    if n > 1:
+        returns[1:] = total[1:] / total[:-1] - 1.0
+    pnl = np.full(n, np.nan)
+    if n > 1:
+        pnl[1:] = np.cumprod(1.0 + returns[1:])
+    draw_down, duration = _draw_downs(pnl)
+
+    curve['returns'] = returns
+    curve['equity_curve'] = pnl
+    curve['draw_down'] = draw_down
+
+    periods = periods_per_year(symbol_type, date_format)
+    period_returns = returns[1:]
+    n_returns = len(period_returns)
+
+    total_return = pnl[-1] - 1.0 if n > 1 else np.nan
+    max_drawn_down = np.nanmax(draw_down) if n > 1 else np.nan
+    drawn_down_duration = np.nanmax(duration) if n > 1 else np.nan
+
+    sharpe_ratio = sortino_ratio = calmar_ratio = cagr = volatility = None
+    if periods is not None and n_returns > 0:
+        mean = np.mean(period_returns)
+        std = np.std(period_returns)
+        downside = np.sqrt(np.mean(np.minimum(period_returns, 0.0) ** 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe_ratio = np.sqrt(periods) * mean / std
+            sortino_ratio = np.sqrt(periods) * mean / downside
+            cagr = pnl[-1] ** (periods / float(n_returns)) - 1.0 if pnl[-1] > 0 else -1.0
+            calmar_ratio = cagr / max_drawn_down if max_drawn_down > 0 else np.nan
+        volatility = std * np.sqrt(periods) * 100.0
+        cagr *= 100.0
+
+    turnover = None
+    if 'traded_value' in curve.columns and n > 1:
+        # traded_value 为累计成交金额(买卖均取绝对值), 同一周期内的买入和卖出不会相互抵消
+        traded_value = curve['traded_value'].values.astype(np.float64)
+        mean_total = np.mean(total)
+        turnover = (traded_value[-1] - traded_value[0]) / mean_total if mean_total != 0 else np.nan
+
+    win_rate = None
+    if n_returns > 0:
+        active = np.count_nonzero(period_returns)
+        win_rate = np.count_nonzero(period_returns > 0) * 100.0 / active if active > 0 else np.nan
+
+    stats = StatisticSummary(
+        total_return * 100.0,
+        sharpe_ratio,
+        max_drawn_down * 100.0,
+        drawn_down_duration,
+        sortino_ratio,
+        calmar_ratio,
+        cagr,
+        volatility,
+        turnover,
+        win_rate
+    )
+
+    return stats, EquityCurve(curve)
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import copy
+import math
+from typing import Optional
+
+import numpy as np
+
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.performance import StatisticSummary
+from backend.commons.performance.base_performance import periods_per_year
+
+
+class StreamingMetrics(object):
+    """
+    增量计算的绩效指标
+    每追加一个总金额 O(1) 更新: 收益率均值/方差(Welford), 最高净值, 当前/最大回撤及回撤持续期
+    与 create_statistic_summary 按完整资金曲线计算的结果一致, 用于在线监控和进度输出
+    """
+
+    def __init__(self):
+        self.count: int = 0
+        self.first_total: Optional[float] = None
+        self.last_total: Optional[float] = None
+
+        # 收益率的 Welford 累计量
+        self.return_count: int = 0
+        self.return_mean: float = 0.0
+        self._return_m2: float = 0.0
+
+        # 与 create_draw_downs 一致, 最高净值从0开始
+        self.high_water_mark: float = 0.0
+        self.draw_down: float = 0.0
+        self.max_draw_down: float = 0.0
+        self.draw_down_duration: int = 0
+        self.max_draw_down_duration: int = 0
+
+    def update(self, total: float):
+        """
+        追加一个时间点的总金额
+        """
+        total = float(total)
+        self.count += 1
+        if self.first_total is None:
+            self.first_total = total
+            self.last_total = total
+            return
+
+        previous_total = self.last_total
+        self.last_total = total
+        if previous_total != 0:
+            ret = total / previous_total - 1.0
+            self.return_count += 1
+            delta = ret - self.return_mean
+            self.return_mean += delta / self.return_count
+            self._return_m2 += delta * (ret - self.return_mean)
+
+        equity = self.equity()
+        self.high_water_mark = max(self.high_water_mark, equity)
+        self.draw_down = self.high_water_mark - equity
+        self.draw_down_duration = 0 if self.draw_down == 0 else self.draw_down_duration + 1
+        self.max_draw_down = max(self.max_draw_down, self.draw_down)
+        self.max_draw_down_duration = max(self.max_draw_down_duration, self.draw_down_duration)
+
+    def copy(self) -> 'StreamingMetrics':
+        return copy.copy(self)
+
+    def equity(self) -> float:
+        """
+        当前净值, 起始为1
+        """
+        if not self.first_total:
+            return 1.0
+        return self.last_total / self.first_total
+
+    def total_return(self) -> float:
+        return self.equity() - 1.0
+
+    def return_std(self) -> float:
+        """
+        收益率总体标准差, 与 np.std 一致(ddof=0)
+        """
+        if self.return_count == 0:
+            return float('nan')
+        return math.sqrt(self._return_m2 / self.return_count)
+
+    def sharpe_ratio(self, periods: Optional[int]) -> Optional[float]:
+        """
+        :param periods: 每年周期数, 为None时不计算
+        """
+        if periods is None or self.return_count == 0:
+            return None
+        std = self.return_std()
+        if std == 0:
+            return float('nan')
+        return np.sqrt(periods) * self.return_mean / std
+
+    def statistic_summary(self, symbol_type: SymbolTypeEnum,
+                          date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> StatisticSummary:
+        periods = periods_per_year(symbol_type, date_format)
+        return StatisticSummary(
+            self.total_return() * 100.0,
+            self.sharpe_ratio(periods),
+            self.max_draw_down * 100.0,
+            self.max_draw_down_duration
+        )
+
+    def __str__(self):
+        return "StreamingMetrics(count=%s, total_return=%.4f, high_water_mark=%.4f, draw_down=%.4f, " \
+               "max_draw_down=%.4f, max_draw_down_duration=%s)" \
+               % (self.count, self.total_return(), self.high_water_mark, self.draw_down, self.max_draw_down,
+                  self.max_draw_down_duration)
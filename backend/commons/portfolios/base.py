@@ -1,7 +1,6 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional
 
 import pandas
-import pandas as pd
 
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
 from backend.commons.enums import order_type_enums, bar_val_type_enums
@@ -9,15 +8,24 @@ from backend.commons.enums.bar_val_type_enums import BarValTypeEnum
 from backend.commons.enums.date_format_enums import DateFormatStrEnum
 from backend.commons.enums.event_type_enums import EventTypeEnum
 from backend.commons.enums.order_type_enums import OrderTypeEnum
+from backend.commons.enums.persistence_policy_enums import PersistencePolicyEnum
+from backend.commons.enums.portfolio_storage_enums import PortfolioStorageEnum
 from backend.commons.enums.signal_type_enums import SignalTypeEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
 from backend.commons.events.base import FillEvent, OrderEvent, SignalEvent, MarketEvent
 from backend.commons.performance import StatisticSummary, EquityCurve
-from backend.commons.performance.base_performance import create_sharpe_ratio, create_draw_downs
-from backend.commons.portfolios.domain import PositionDO, HoldingDO, PortfolioDO
+from backend.commons.performance.base_performance import create_statistic_summary
+from backend.commons.performance.streaming import StreamingMetrics
+from backend.commons.portfolios.domain import PortfolioDO
+from backend.commons.portfolios.ledger import PortfolioLedger
+from backend.commons.portfolios.persistence import DocumentPortfolioStore, BucketedPortfolioStore, \
+    PortfolioPersister
 # todo 完善功能 重要
 from dao.mongo import MongoBase
 
+# 每手股数, 下单数量按整手计算
+ORDER_LOT_SIZE = 100
+
 
 class Portfolio(object):
     """
@@ -43,7 +51,12 @@ class Portfolio(object):
             date_format: DateFormatStrEnum,
             symbol_list: List[str],
             initial_capital: float = 100000.0,
-            is_back_test: bool = False
+            is_back_test: bool = False,
+            persistence_policy: PersistencePolicyEnum = None,
+            persist_every_n_events: int = 100,
+            persist_interval_seconds: float = 5.0,
+            storage: PortfolioStorageEnum = PortfolioStorageEnum.DOCUMENT,
+            bucket_rows: int = 1000
     ):
         """
         证券投资组合账户
@@ -52,6 +65,11 @@ class Portfolio(object):
         :param symbol_list:
         :param initial_capital:
         :param is_back_test:
+        :param persistence_policy: 持久化策略, 默认回测为 END_OF_RUN, 在线为 EVERY_EVENT
+        :param persist_every_n_events: EVERY_N_EVENTS 的事件数
+        :param persist_interval_seconds: INTERVAL 的间隔秒数
+        :param storage: mongo存储结构, BUCKETED 时历史记录按 bucket_rows 行分桶保存在 <table>_bucket 集合
+        :param bucket_rows: 每个桶的行数
         """
         """
         Initialises the portfolios with bars and an event queue.
@@ -64,59 +82,58 @@ class Portfolio(object):
         start_date - The start date (bar) of the portfolios.
         initial_capital - The starting capital in USD.
         """
-        self._mongo = MongoBase("portfolio", "back_test" if is_back_test else "online")
-        self._portfolio_do = PortfolioDO(
-            portfolio_id, name, description, start_date_str, date_format,
-            symbol_list, initial_capital,
-            self._init_all_positions(start_date_str, symbol_list),
-            self._init_current_positions(start_date_str, symbol_list),
-            self._init_all_holdings(start_date_str, initial_capital, symbol_list),
-            self._init_current_holdings(start_date_str, initial_capital, symbol_list)
+        table_name = "back_test" if is_back_test else "online"
+        self._mongo = MongoBase("portfolio", table_name)
+        self._portfolio_id: int = portfolio_id
+        self._name: str = name
+        self._description: str = description
+        self._start_date_str: str = start_date_str
+        self._date_format: DateFormatStrEnum = date_format
+        self._symbol_list: List[str] = symbol_list
+        self._initial_capital: float = initial_capital
+        self._ledger: PortfolioLedger = PortfolioLedger(symbol_list, start_date_str, initial_capital)
+        # 已计入增量指标的行数, 日期结束(不会再被成交修改)的行才计入
+        self._metrics: StreamingMetrics = StreamingMetrics()
+        self._metrics_rows = 0
+
+        if persistence_policy is None:
+            persistence_policy = PersistencePolicyEnum.END_OF_RUN if is_back_test \
+                else PersistencePolicyEnum.EVERY_EVENT
+        if storage == PortfolioStorageEnum.BUCKETED:
+            store = BucketedPortfolioStore(self._mongo, MongoBase("portfolio", table_name + "_bucket"), bucket_rows)
+        else:
+            store = DocumentPortfolioStore(self._mongo)
+        self._persister: PortfolioPersister = PortfolioPersister(
+            store, self._ledger, portfolio_id, self._header_dict,
+            persistence_policy, persist_every_n_events, persist_interval_seconds
         )
-        self._mongo.table.update({"portfolio_id": self._portfolio_do.portfolio_id},
-                                 {"$set": self._portfolio_do.convert_2_dict()}, upsert=True)
+        # 创建时整体写入一次, 之后只写增量
+        self._persister.flush()
 
         self._equity_curve: pandas.DataFrame = None
 
     def _update_portfolio_2_mongo(self):
-        self._mongo.table.update({"portfolio_id": self._portfolio_do.portfolio_id},
-                                 {"$set": self._portfolio_do.convert_2_dict()}, upsert=True)
+        self._persister.on_event()
 
-    @staticmethod
-    def _init_all_positions(start_date_str: str, symbol_list: List[str]) -> List[PositionDO]:
-        """
-                Constructs the positions list using the start_date
-                to determine when the time index will begin.
-                """
-        d = dict([(s, 0) for s in symbol_list])
-        return [PositionDO(start_date_str, d)]
-
-    @staticmethod
-    def _init_current_positions(start_date_str, symbol_list: List[str]) -> PositionDO:
-        """
-                Constructs the positions list using the start_date
-                to determine when the time index will begin.
-                """
-        d = dict([(s, 0) for s in symbol_list])
-        return PositionDO(start_date_str, d)
-
-    @staticmethod
-    def _init_all_holdings(start_date_str: str, init_capital: float, symbol_list: List[str]) -> List[HoldingDO]:
-        """
-        Constructs the holdings list using the start_date
-        to determine when the time index will begin.
-        """
-        d = dict([(s, 0.0) for s in symbol_list])
-        return [HoldingDO(start_date_str, init_capital, 0.0, init_capital, d)]
+    def _header_dict(self):
+        return PortfolioDO(
+            self._portfolio_id, self._name, self._description, self._start_date_str, self._date_format,
+            self._symbol_list, self._initial_capital,
+            None, self._ledger.current_position_do(), None, self._ledger.current_holding_do()
+        ).convert_header_2_dict()
 
-    @staticmethod
-    def _init_current_holdings(start_date_str: str, init_capital: float, symbol_list: List[str]) -> HoldingDO:
+    def portfolio_do(self) -> PortfolioDO:
         """
-        Constructs the holdings list using the start_dated
-        to determine when the time index will begin.
+        由账本构建 PortfolioDO, 仅用于序列化
         """
-        d = dict([(s, 0.0) for s in symbol_list])
-        return HoldingDO(start_date_str, init_capital, 0.0, init_capital, d)
+        return PortfolioDO(
+            self._portfolio_id, self._name, self._description, self._start_date_str, self._date_format,
+            self._symbol_list, self._initial_capital,
+            self._ledger.all_position_do(),
+            self._ledger.current_position_do(),
+            self._ledger.all_holding_do(),
+            self._ledger.current_holding_do()
+        )
 
     def update_time_index_for_market_event(self, market_event: MarketEvent, data_handler: CommonDataHandler):
         """
@@ -126,44 +143,47 @@ class Portfolio(object):
 
         Makes use of a MarketEvent from the events queue.
         """
-        current_date = market_event.date_str()
-
-        # Update positions
-        # ================
-        dp = dict([(s, 0) for s in self._portfolio_do.symbol_list])
-        position = PositionDO(current_date, dp)
-
-        # 复制previousPosition 方便后续计算
-        for symbol_code in self._portfolio_do.symbol_list:
-            dp[symbol_code] = self._portfolio_do.current_position.symbol_position[symbol_code]
+        self.update_time_index_for_date(market_event.date_str_of(self._date_format), [market_event.symbol], data_handler)
+        self._update_portfolio_2_mongo()
 
-        # Append the current positions
-        self._portfolio_do.all_position.append(position)
+    def update_time_index_for_date(self, current_date: str, symbols_with_bar: List[str],
+                                   data_handler: CommonDataHandler):
+        """
+        每个交易日只调用一次, 为当日追加一条头寸记录和一条持有金额记录
+        当日有行情的证券按收盘价重新估值, 其余证券沿用上一次估值
 
+        :param current_date: 交易日期
+        :param symbols_with_bar: 当日有行情的证券
+        :param data_handler:
+        """
         # Update holdings
         # ===============
-        dh = dict((k, v) for k, v in [(s, 0) for s in self._portfolio_do.symbol_list])
-        holding = HoldingDO(current_date, self._portfolio_do.current_holding.cash,
-                            self._portfolio_do.current_holding.commission,
-                            self._portfolio_do.current_holding.total, dh)
-
-        # 复制previousHolding 方便后续计算
-        for symbol_code in self._portfolio_do.symbol_list:
+        for symbol_code in symbols_with_bar:
             # Approximation to the real value
-            market_value: float = float(
-                self._portfolio_do.current_position.symbol_position[symbol_code]
-                * data_handler.get_bar_value(symbol_code, market_event.date_str(),
-                                             bar_val_type_enums.BarValTypeEnum.ADJ_CLOSE)
-            )
-            dh[symbol_code] = market_value
-
-            holding.total += market_value
-            holding.total += self._portfolio_do.current_holding.cash
-
-        # Append the current holdings
-        self._portfolio_do.all_holding.append(holding)
+            if self._ledger.quantity_of(symbol_code) != 0:
+                self._ledger.mark(symbol_code, data_handler.get_bar_value(symbol_code, current_date,
+                                                                          bar_val_type_enums.BarValTypeEnum.ADJ_CLOSE))
+            else:
+                self._ledger.mark(symbol_code, 0.0)
+
+        if self._ledger.dates()[-1] != current_date:
+            self._metrics_rows = self._update_metrics(self._metrics, self._metrics_rows)
+
+        # Append the current positions and holdings
+        self._ledger.append_row(current_date)
+
+    def persist(self):
+        """
+        组合状态发生变化, 按持久化策略决定是否写入mongo
+        """
         self._update_portfolio_2_mongo()
 
+    def close(self):
+        """
+        写入全部未持久化的状态并等待写入完成
+        """
+        self._persister.close()
+
     # ======================
     # FILL/POSITION HANDLING
     # ======================
@@ -172,52 +192,31 @@ class Portfolio(object):
         Acts on a SignalEvent to generate new orders
         based on the portfolios logic.
         """
-        if signal_event.event_type() == EventTypeEnum.SIGNAL:
+        if signal_event.event_type == EventTypeEnum.SIGNAL:
             order_event = self._generate_naive_order(signal_event, data_handler)
             return order_event
         else:
             return None
 
-    def update_fill(self, fill_event: FillEvent, data_handler: CommonDataHandler):
+    def update_fill(self, fill_event: FillEvent, data_handler: CommonDataHandler, persist: bool = True):
         """
         Updates the portfolios current positions and holdings
         from a FillEvent.
-        """
-        if fill_event.event_type() == EventTypeEnum.FILL:
-            self._update_positions_from_fill(fill_event)
-            self._update_holdings_from_fill(fill_event, data_handler)
-            self._update_portfolio_2_mongo()
 
-    def _update_positions_from_fill(self, fill_event: FillEvent):
-        """
-        Takes a Fill object and updates the position matrix to
-        reflect the new position.
-
-        Parameters:
-        fill - The Fill object to update the positions with.
+        :param persist: 是否立即写入mongo, 回测引擎每个交易日统一写入一次
         """
-        # Check whether the fill is a buy or sell
-        fill_dir = 0
-        if fill_event.direction_type == order_type_enums.DirectionTypeEnum.BUY:
-            fill_dir = 1
-        if fill_event.direction_type == order_type_enums.DirectionTypeEnum.SELL:
-            fill_dir = -1
-
-        # Update positions list with new quantities
-        self._portfolio_do.current_position.date_str = fill_event.date_str()
-        self._portfolio_do.current_position.symbol_position[fill_event.symbol()] += fill_dir * fill_event.quantity
-        all_position = self._portfolio_do.all_position
-        for p in all_position:
-            if p.date_str == fill_event.date_str():
-                p.symbol_position[fill_event.symbol()] += fill_dir * fill_event.quantity
+        if fill_event.event_type == EventTypeEnum.FILL:
+            self._update_positions_and_holdings_from_fill(fill_event, data_handler)
+            if persist:
+                self._update_portfolio_2_mongo()
 
-    def _update_holdings_from_fill(self, fill_event: FillEvent, data_handler: CommonDataHandler):
+    def _update_positions_and_holdings_from_fill(self, fill_event: FillEvent, data_handler: CommonDataHandler):
         """
-        Takes a Fill object and updates the holdings matrix to
-        reflect the holdings value.
+        Takes a Fill object and updates the position and holdings
+        matrix to reflect the new position and holdings value.
 
         Parameters:
-        fill - The Fill object to update the holdings with.
+        fill - The Fill object to update the positions with.
         """
         # Check whether the fill is a buy or sell
         fill_dir = 0
@@ -228,22 +227,12 @@ class Portfolio(object):
 
         # Update holdings list with new quantities
         fill_cost = data_handler.get_bar_value(
-            fill_event.symbol(), fill_event.date_str(), bar_val_type_enums.BarValTypeEnum.ADJ_CLOSE
+            fill_event.symbol, fill_event.date_str_of(self._date_format), bar_val_type_enums.BarValTypeEnum.ADJ_CLOSE
         )
         cost = fill_dir * fill_cost * fill_event.quantity
 
-        self._portfolio_do.current_holding.date_str = fill_event.date_str()
-        self._portfolio_do.current_holding.symbol_hold[fill_event.symbol()] += cost
-        self._portfolio_do.current_holding.commission += fill_event.commission
-        self._portfolio_do.current_holding.cash -= (cost + fill_event.commission)
-        self._portfolio_do.current_holding.total -= (cost + fill_event.commission)
-
-        for h in self._portfolio_do.all_holding:
-            if h.date_str == fill_event.date_str():
-                h.symbol_hold[fill_event.symbol()] += cost
-                h.commission += fill_event.commission
-                h.cash -= (cost + fill_event.commission)
-                h.total -= (cost + fill_event.commission)
+        self._ledger.apply_fill(fill_event.symbol, fill_event.date_str_of(self._date_format), fill_dir * fill_event.quantity,
+                                cost, fill_event.commission)
 
     def _generate_naive_order(self, signal_event: SignalEvent, data_handler: CommonDataHandler) -> Optional[OrderEvent]:
         """
@@ -256,34 +245,34 @@ class Portfolio(object):
         """
         order = None
 
-        symbol = signal_event.symbol()
+        symbol = signal_event.symbol
         signal_type = signal_event.signal_type
         strength = signal_event.strength
 
-        mkt_quantity = 100
+        mkt_quantity = ORDER_LOT_SIZE
 
-        cur_quantity = self._portfolio_do.current_position.symbol_position[symbol]
-        cur_cash = self._portfolio_do.current_holding.cash
+        cur_quantity = self._ledger.quantity_of(symbol)
+        cur_cash = self._ledger.current_cash
 
         order_type = OrderTypeEnum.MARKET
 
         order = None
         if signal_type == SignalTypeEnum.UP and cur_quantity == 0:
-            price = data_handler.get_bar_value(symbol, signal_event.date_str(), BarValTypeEnum.ADJ_CLOSE)
+            price = data_handler.get_bar_value(symbol, signal_event.date_str_of(self._date_format), BarValTypeEnum.ADJ_CLOSE)
             quantity = int(cur_cash / (mkt_quantity * price)) * mkt_quantity
 
-            order = OrderEvent(symbol, signal_event.date_str(), order_type, quantity,
+            order = OrderEvent(symbol, signal_event.date_key, order_type, quantity,
                                order_type_enums.DirectionTypeEnum.BUY)
 
         elif signal_type == SignalTypeEnum.DOWN and cur_quantity > 0:
-            order = OrderEvent(symbol, signal_event.date_str(), order_type, abs(cur_quantity),
+            order = OrderEvent(symbol, signal_event.date_key, order_type, abs(cur_quantity),
                                order_type_enums.DirectionTypeEnum.SELL)
 
         elif signal_type == SignalTypeEnum.HOLD and cur_quantity > 0:
             order = None
 
         elif signal_type == SignalTypeEnum.EXIT and cur_quantity > 0:
-            order = OrderEvent(symbol, signal_event.date_str(), order_type, abs(cur_quantity),
+            order = OrderEvent(symbol, signal_event.date_key, order_type, abs(cur_quantity),
                                order_type_enums.DirectionTypeEnum.SELL)
 
         return order
@@ -296,23 +285,23 @@ class Portfolio(object):
         Creates a list of summary statistics for the portfolios.
         """
         self._create_equity_curve_data_frame()
+        return create_statistic_summary(self._equity_curve, symbol_type, self._date_format)
 
-        total_return = self._equity_curve['equity_curve'][-1]
-        returns = self._equity_curve['returns']
-        pnl = self._equity_curve['equity_curve']
+    def _update_metrics(self, metrics: StreamingMetrics, start_row: int) -> int:
+        for total in self._ledger.totals(start_row).tolist():
+            metrics.update(total)
+        return len(self._ledger)
 
-        sharpe_ratio = create_sharpe_ratio(returns, symbol_type)
-        draw_down, max_drawn_down, drawn_down_duration = create_draw_downs(pnl)
-        self._equity_curve['draw_down'] = draw_down
-
-        stats = StatisticSummary(
-            (total_return - 1.0) * 100.0,
-            sharpe_ratio,
-            max_drawn_down * 100.0,
-            drawn_down_duration
-        )
+    def streaming_metrics(self) -> StreamingMetrics:
+        """
+        包含当前日期(尚未结束)记录的增量指标快照, 不构建资金曲线
+        """
+        metrics = self._metrics.copy()
+        self._update_metrics(metrics, self._metrics_rows)
+        return metrics
 
-        return stats, EquityCurve(self._equity_curve)
+    def streaming_statistic_summary(self, symbol_type: SymbolTypeEnum) -> StatisticSummary:
+        return self.streaming_metrics().statistic_summary(symbol_type, self._date_format)
 
     def equity_curve(self):
         return self._equity_curve
@@ -322,18 +311,5 @@ class Portfolio(object):
         Creates a pandas DataFrame from the all_holdings
         list of dictionaries.
         """
-        converted_all_holding = []
-        for holding in self._portfolio_do.all_holding:
-            d: Dict[str, Any] = holding.symbol_hold
-            d['date'] = holding.date_str
-            d['cash'] = holding.cash
-            d['total'] = holding.total
-            d['commission'] = holding.commission
-            converted_all_holding.append(d)
-
-        curve = pd.DataFrame(converted_all_holding)
-        curve.set_index('date', inplace=True)
-        curve['returns'] = curve['total'].pct_change()
-        curve['equity_curve'] = (1.0 + curve['returns']).cumprod()
-        self._equity_curve = curve
-        self._update_portfolio_2_mongo()
+        self._equity_curve = self._ledger.holding_data_frame()
+        self._persister.flush()
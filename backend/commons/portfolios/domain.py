@@ -126,6 +126,26 @@ class PortfolioDO(object):
         self.all_holding: List[HoldingDO] = all_holding
         self.current_holding: HoldingDO = current_holding
 
+    def convert_header_2_dict(self):
+        """
+        不含 all_position / all_holding 历史记录的部分
+        """
+        return {
+            "portfolio_id": self.portfolio_id,
+            "name": self.name,
+            "description": self.description,
+            "start_date_str": self.start_date_str,
+            "date_format": self.date_format.value,
+            "symbol_list": self.symbol_list,
+            "initial_capital": self.initial_capital,
+            "current_position":
+                None if self.current_position is None
+                else self.current_position.convert_2_dict(),
+            "current_holding":
+                None if self.current_holding is None
+                else self.current_holding.convert_2_dict()
+        }
+
     def convert_2_dict(self):
         return {
             "portfolio_id": self.portfolio_id,
@@ -0,0 +1,192 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas
+
+from backend.commons.portfolios.domain import PositionDO, HoldingDO
+
+
+class PortfolioLedger(object):
+    """
+    证券投资组合账本
+    按 日期 × 证券 预分配 numpy 数组保存每个时间点的头寸和持有金额, 以及现金/佣金/总金额/累计成交金额列,
+    容量不足时按2倍扩容; 日期到行号的索引为 dict, 按日期更新为 O(1)
+    PositionDO / HoldingDO 只在序列化时构建
+    """
+
+    def __init__(self, symbol_list: List[str], start_date_str: str, initial_capital: float,
+                 initial_capacity: int = 256):
+        """
+
+        :param symbol_list: 证券集合
+        :param start_date_str: 起始时间, 作为第一行
+        :param initial_capital: 起始资金
+        :param initial_capacity: 预分配行数
+        """
+        self.symbol_list: List[str] = symbol_list
+        self._symbol_index: Dict[str, int] = dict([(s, i) for i, s in enumerate(symbol_list)])
+
+        n_symbols = len(symbol_list)
+        capacity = max(1, initial_capacity)
+        self._quantity: np.ndarray = np.zeros((capacity, n_symbols), dtype=np.int64)
+        self._market_value: np.ndarray = np.zeros((capacity, n_symbols), dtype=np.float64)
+        self._cash: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        self._commission: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        self._total: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        # 累计成交金额(买卖均取绝对值), 用于计算换手率
+        self._traded_value: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        self._dates: List[str] = []
+        # map(date_str -> 行号), 同一日期可能对应多行(如在线引擎每个证券事件追加一行)
+        self._date_rows: Dict[str, List[int]] = {}
+        self._size = 0
+        # 上次持久化之后被修改过的最小行号
+        self._dirty_from = 0
+
+        # 当前状态
+        self.current_date_str: str = start_date_str
+        self.current_quantity: np.ndarray = np.zeros(n_symbols, dtype=np.int64)
+        self.current_market_value: np.ndarray = np.zeros(n_symbols, dtype=np.float64)
+        self.current_cash: float = initial_capital
+        self.current_commission: float = 0.0
+        self.current_total: float = initial_capital
+        self.current_traded_value: float = 0.0
+
+        self.append_row(start_date_str)
+
+    def __len__(self):
+        return self._size
+
+    def symbol_index(self, symbol: str) -> int:
+        return self._symbol_index[symbol]
+
+    def dates(self) -> List[str]:
+        return self._dates
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self._cash)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+
+        def grow(arr: np.ndarray) -> np.ndarray:
+            new_arr = np.zeros((capacity,) + arr.shape[1:], dtype=arr.dtype)
+            new_arr[:self._size] = arr[:self._size]
+            return new_arr
+
+        self._quantity = grow(self._quantity)
+        self._market_value = grow(self._market_value)
+        self._cash = grow(self._cash)
+        self._commission = grow(self._commission)
+        self._total = grow(self._total)
+        self._traded_value = grow(self._traded_value)
+
+    def mark(self, symbol: str, price: float):
+        """
+        按价格重新估值当前持有金额
+        """
+        j = self._symbol_index[symbol]
+        quantity = self.current_quantity[j]
+        self.current_market_value[j] = 0.0 if quantity == 0 else float(quantity * price)
+
+    def append_row(self, date_str: str):
+        """
+        以当前状态追加一行
+        """
+        self.current_date_str = date_str
+        self.current_total = self.current_cash + float(self.current_market_value.sum())
+
+        row = self._size
+        self._ensure_capacity(row + 1)
+        self._quantity[row] = self.current_quantity
+        self._market_value[row] = self.current_market_value
+        self._cash[row] = self.current_cash
+        self._commission[row] = self.current_commission
+        self._total[row] = self.current_total
+        self._traded_value[row] = self.current_traded_value
+        self._dates.append(date_str)
+        self._date_rows.setdefault(date_str, []).append(row)
+        self._size = row + 1
+
+    def apply_fill(self, symbol: str, date_str: str, quantity: int, cost: float, commission: float):
+        """
+        成交后更新当前状态以及该日期对应的行
+
+        :param symbol:
+        :param date_str: 成交日期
+        :param quantity: 带方向的成交数量, 买入为正
+        :param cost: 带方向的成交金额, 买入为正
+        :param commission: 佣金
+        """
+        j = self._symbol_index[symbol]
+        self.current_date_str = date_str
+        self.current_quantity[j] += quantity
+        self.current_market_value[j] += cost
+        self.current_commission += commission
+        self.current_traded_value += abs(cost)
+        self.current_cash -= (cost + commission)
+        # 现金换成等值持仓, 总金额只扣除佣金
+        self.current_total -= commission
+
+        for row in self._date_rows.get(date_str, []):
+            self._dirty_from = min(self._dirty_from, row)
+            self._quantity[row, j] += quantity
+            self._market_value[row, j] += cost
+            self._commission[row] += commission
+            self._cash[row] -= (cost + commission)
+            self._total[row] -= commission
+            self._traded_value[row] += abs(cost)
+
+    def take_dirty_from(self) -> int:
+        """
+        返回上次调用之后新增或被修改的第一行, 之后的行都需要重新持久化
+        """
+        dirty_from = self._dirty_from
+        self._dirty_from = self._size
+        return dirty_from
+
+    def totals(self, start_row: int = 0) -> np.ndarray:
+        """
+        从 start_row 开始每行的总金额
+        """
+        return self._total[start_row:self._size]
+
+    def quantity_of(self, symbol: str) -> int:
+        return int(self.current_quantity[self._symbol_index[symbol]])
+
+    # ======================
+    # 序列化
+    # ======================
+    def position_do(self, row: int) -> PositionDO:
+        return PositionDO(self._dates[row], dict(zip(self.symbol_list, self._quantity[row].tolist())))
+
+    def holding_do(self, row: int) -> HoldingDO:
+        return HoldingDO(self._dates[row], float(self._cash[row]), float(self._commission[row]),
+                         float(self._total[row]), dict(zip(self.symbol_list, self._market_value[row].tolist())))
+
+    def current_position_do(self) -> PositionDO:
+        return PositionDO(self.current_date_str, dict(zip(self.symbol_list, self.current_quantity.tolist())))
+
+    def current_holding_do(self) -> HoldingDO:
+        return HoldingDO(self.current_date_str, self.current_cash, self.current_commission, self.current_total,
+                         dict(zip(self.symbol_list, self.current_market_value.tolist())))
+
+    def all_position_do(self) -> List[PositionDO]:
+        return [self.position_do(row) for row in range(self._size)]
+
+    def all_holding_do(self) -> List[HoldingDO]:
+        return [self.holding_do(row) for row in range(self._size)]
+
+    def holding_data_frame(self) -> pandas.DataFrame:
+        """
+        以 date 为索引的持有金额表, 列为 各证券持有金额, cash, total, commission, traded_value
+        """
+        size = self._size
+        curve = pandas.DataFrame(self._market_value[:size].copy(), columns=self.symbol_list)
+        curve['date'] = self._dates
+        curve['cash'] = self._cash[:size].copy()
+        curve['total'] = self._total[:size].copy()
+        curve['commission'] = self._commission[:size].copy()
+        curve['traded_value'] = self._traded_value[:size].copy()
+        curve.set_index('date', inplace=True)
+        return curve
@@ -0,0 +1,371 @@
+import bisect
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas
+import pymongo
+from pymongo import UpdateOne
+
+from backend.commons.enums.persistence_policy_enums import PersistencePolicyEnum
+from backend.commons.portfolios.domain import HoldingDO
+from backend.commons.portfolios.ledger import PortfolioLedger
+from dao.mongo import MongoBase
+
+
+class PortfolioDelta(object):
+    def __init__(
+            self,
+            portfolio_id: int,
+            header: Dict[str, Any],
+            persisted_rows: int,
+            first_row: int,
+            positions: List[Dict[str, Any]],
+            holdings: List[Dict[str, Any]]
+    ):
+        """
+        两次持久化之间的增量
+
+        :param portfolio_id: 证券投资组合账户ID
+        :param header: 不含历史记录的账户信息, 见 PortfolioDO.convert_header_2_dict
+        :param persisted_rows: 之前已提交的历史记录行数, 为0表示首次写入
+        :param first_row: positions/holdings 第一条对应的行号
+        :param positions: 新增或被修改的头寸记录
+        :param holdings: 新增或被修改的持有金额记录
+        """
+        self.portfolio_id: int = portfolio_id
+        self.header: Dict[str, Any] = header
+        self.persisted_rows: int = persisted_rows
+        self.first_row: int = first_row
+        self.positions: List[Dict[str, Any]] = positions
+        self.holdings: List[Dict[str, Any]] = holdings
+
+
+class DocumentPortfolioStore(object):
+    """
+    每个证券投资组合一个mongo文档, 历史记录保存在 all_position / all_holding 数组中
+    首次写入整体覆盖, 之后只 $set 被修改的数组元素并 $push 新增记录
+    """
+
+    def __init__(self, mongo: MongoBase):
+        self._mongo = mongo
+
+    def write(self, delta: PortfolioDelta):
+        key = {"portfolio_id": delta.portfolio_id}
+        set_doc = dict(delta.header)
+
+        if delta.persisted_rows == 0:
+            set_doc["all_position"] = delta.positions
+            set_doc["all_holding"] = delta.holdings
+            self._mongo.table.bulk_write([UpdateOne(key, {"$set": set_doc}, upsert=True)], ordered=True)
+            return
+
+        # 已写入的行: 按下标覆盖; 新行: 追加
+        n_updated = max(0, min(len(delta.positions), delta.persisted_rows - delta.first_row))
+        for i in range(n_updated):
+            set_doc["all_position.%d" % (delta.first_row + i)] = delta.positions[i]
+            set_doc["all_holding.%d" % (delta.first_row + i)] = delta.holdings[i]
+
+        operations = [UpdateOne(key, {"$set": set_doc}, upsert=True)]
+        if len(delta.positions) > n_updated:
+            operations.append(UpdateOne(key, {"$push": {
+                "all_position": {"$each": delta.positions[n_updated:]},
+                "all_holding": {"$each": delta.holdings[n_updated:]}
+            }}))
+        self._mongo.table.bulk_write(operations, ordered=True)
+
+
+class BucketedPortfolioStore(object):
+    """
+    每个证券投资组合一个头文档(不含历史记录), 历史记录按行数分桶, 每个桶一个文档:
+    {portfolio_id, bucket_start, bucket_end, row_start, positions, holdings}
+    bucket_start/bucket_end 为桶内第一条/最后一条记录的日期, 同一日期的记录不会跨桶,
+    因此 (portfolio_id, bucket_start) 唯一, 按日期区间读取时只访问覆盖该区间的桶
+    每次写入只更新被修改或新增记录所在的桶
+    """
+
+    def __init__(self, header_mongo: MongoBase, bucket_mongo: MongoBase, bucket_rows: int = 1000):
+        """
+
+        :param header_mongo: 头文档所在集合
+        :param bucket_mongo: 分桶文档所在集合
+        :param bucket_rows: 每个桶的行数, 同一日期的记录放在同一个桶内, 因此个别桶会略多于该值
+        """
+        self._header_mongo = header_mongo
+        self._bucket_mongo = bucket_mongo
+        self._bucket_rows: int = max(1, bucket_rows)
+
+        # 每个桶的起始行号及起始日期, 按行号升序
+        self._bucket_row_starts: List[int] = []
+        self._bucket_dates: List[str] = []
+        self._assigned_rows = 0
+        self._last_date: Optional[str] = None
+
+    def _assign_buckets(self, first_row: int, positions: List[Dict[str, Any]]):
+        """
+        为尚未分桶的新行分配桶
+        """
+        for i in range(max(0, self._assigned_rows - first_row), len(positions)):
+            row = first_row + i
+            date_str = positions[i]["date_str"]
+            if not self._bucket_row_starts or (row - self._bucket_row_starts[-1] >= self._bucket_rows
+                                               and date_str != self._last_date):
+                self._bucket_row_starts.append(row)
+                self._bucket_dates.append(date_str)
+            self._last_date = date_str
+        self._assigned_rows = max(self._assigned_rows, first_row + len(positions))
+
+    def write(self, delta: PortfolioDelta):
+        key = {"portfolio_id": delta.portfolio_id}
+        if delta.persisted_rows == 0:
+            # 首次写入, 清除同一组合ID之前遗留的数据
+            self._bucket_mongo.table.delete_many(key)
+
+        self._assign_buckets(delta.first_row, delta.positions)
+        end_row = delta.first_row + len(delta.positions)
+
+        operations = []
+        b = max(0, bisect.bisect_right(self._bucket_row_starts, delta.first_row) - 1)
+        while delta.positions and b < len(self._bucket_row_starts) and self._bucket_row_starts[b] < end_row:
+            row_start = self._bucket_row_starts[b]
+            row_end = self._bucket_row_starts[b + 1] if b + 1 < len(self._bucket_row_starts) else end_row
+            operations.extend(self._bucket_operations(delta, b, row_start, min(row_end, end_row)))
+            b += 1
+        if operations:
+            self._bucket_mongo.table.bulk_write(operations, ordered=True)
+
+        header = dict(delta.header)
+        header["bucket_rows"] = self._bucket_rows
+        header["bucket_count"] = len(self._bucket_row_starts)
+        header["row_count"] = end_row
+        update = {"$set": header}
+        if delta.persisted_rows == 0:
+            update["$unset"] = {"all_position": "", "all_holding": ""}
+        self._header_mongo.table.bulk_write([UpdateOne(key, update, upsert=True)], ordered=True)
+
+    def _bucket_operations(self, delta: PortfolioDelta, b: int, row_start: int, row_end: int) -> List[UpdateOne]:
+        key = {"portfolio_id": delta.portfolio_id, "bucket_start": self._bucket_dates[b]}
+        lo = max(row_start, delta.first_row)
+        set_doc = {
+            "row_start": row_start,
+            "bucket_end": delta.positions[row_end - 1 - delta.first_row]["date_str"]
+        }
+
+        # 已写入的行: 按桶内下标覆盖; 新行: 追加
+        pushed_from = max(lo, min(row_end, delta.persisted_rows))
+        for row in range(lo, pushed_from):
+            set_doc["positions.%d" % (row - row_start)] = delta.positions[row - delta.first_row]
+            set_doc["holdings.%d" % (row - row_start)] = delta.holdings[row - delta.first_row]
+
+        operations = [UpdateOne(key, {"$set": set_doc}, upsert=True)]
+        if row_end > pushed_from:
+            operations.append(UpdateOne(key, {"$push": {
+                "positions": {"$each": delta.positions[pushed_from - delta.first_row:row_end - delta.first_row]},
+                "holdings": {"$each": delta.holdings[pushed_from - delta.first_row:row_end - delta.first_row]}
+            }}))
+        return operations
+
+    # ======================
+    # 读取
+    # ======================
+    def find_buckets(self, portfolio_id: int, start_date_str: str, end_date_str: str) -> List[Dict[str, Any]]:
+        """
+        按日期区间读取分桶文档, 只访问覆盖 [start_date_str, end_date_str] 的桶
+        """
+        first = self._bucket_mongo.table.find_one(
+            {"portfolio_id": portfolio_id, "bucket_start": {"$lte": start_date_str}},
+            {"bucket_start": 1},
+            sort=[("bucket_start", pymongo.DESCENDING)]
+        )
+        lower = first["bucket_start"] if first is not None else start_date_str
+        return list(self._bucket_mongo.table.find(
+            {"portfolio_id": portfolio_id, "bucket_start": {"$gte": lower, "$lte": end_date_str}},
+            {"_id": 0}
+        ).sort("bucket_start", pymongo.ASCENDING))
+
+    def read_holdings(self, portfolio_id: int, start_date_str: str, end_date_str: str) -> List[HoldingDO]:
+        holdings = []
+        for bucket in self.find_buckets(portfolio_id, start_date_str, end_date_str):
+            for item in bucket.get("holdings", []):
+                if start_date_str <= item["date_str"] <= end_date_str:
+                    holdings.append(HoldingDO.convert_from_dict(item))
+        return holdings
+
+    def read_equity_curve(self, portfolio_id: int, start_date_str: str, end_date_str: str) -> pandas.DataFrame:
+        """
+        与 PortfolioLedger.holding_data_frame 结构一致的持有金额表
+        """
+        rows = []
+        for holding in self.read_holdings(portfolio_id, start_date_str, end_date_str):
+            row = dict(holding.symbol_hold)
+            row.update({"date": holding.date_str, "cash": holding.cash, "total": holding.total,
+                        "commission": holding.commission})
+            rows.append(row)
+
+        curve = pandas.DataFrame(rows)
+        if not curve.empty:
+            curve.set_index("date", inplace=True)
+        return curve
+
+
+class PortfolioPersister(object):
+    """
+    证券投资组合异步持久化
+    事件循环线程中只截取增量, 由后台线程按提交顺序写入mongo, 事件循环不会阻塞在mongo上
+    某次写入失败后, 之后的增量都基于未写入的行, 不能再按下标写入: 后台线程跳过这些增量(记入 superseded_deltas),
+    下一次截取改为整体重写, 整体重写成功后恢复增量写入; 写入异常在下一次 flush/close 时抛出一次
+    """
+
+    def __init__(
+            self,
+            store,
+            ledger: PortfolioLedger,
+            portfolio_id: int,
+            header_fn: Callable[[], Dict[str, Any]],
+            policy: PersistencePolicyEnum = PersistencePolicyEnum.EVERY_EVENT,
+            every_n_events: int = 100,
+            interval_seconds: float = 5.0,
+            background: bool = True
+    ):
+        """
+
+        :param store: 写入方式, DocumentPortfolioStore 或 BucketedPortfolioStore
+        :param ledger: 证券投资组合账本
+        :param portfolio_id:
+        :param header_fn: 返回不含历史记录的账户信息
+        :param policy: 持久化策略
+        :param every_n_events: EVERY_N_EVENTS 的事件数
+        :param interval_seconds: INTERVAL 的间隔秒数
+        :param background: 是否使用后台线程写入, False 时在调用线程同步写入
+        """
+        self._store = store
+        self._ledger: PortfolioLedger = ledger
+        self._portfolio_id: int = portfolio_id
+        self._header_fn = header_fn
+        self._policy: PersistencePolicyEnum = policy
+        self._every_n_events: int = max(1, every_n_events)
+        self._interval_seconds: float = interval_seconds
+        self._background: bool = background
+
+        self._events_since_flush = 0
+        self._last_flush_time = time.monotonic()
+        self._persisted_rows = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        # 写入失败后置为True, 下一次截取整体重写全部历史记录
+        self._rewrite_required: bool = False
+        # 写入失败后被整体重写取代而未写入的增量数
+        self.superseded_deltas: int = 0
+
+    def on_event(self):
+        """
+        组合状态发生变化时调用, 按持久化策略决定是否写入
+        """
+        self._events_since_flush += 1
+        if self._policy == PersistencePolicyEnum.EVERY_EVENT:
+            self.flush()
+        elif self._policy == PersistencePolicyEnum.EVERY_N_EVENTS:
+            if self._events_since_flush >= self._every_n_events:
+                self.flush()
+        elif self._policy == PersistencePolicyEnum.INTERVAL:
+            if time.monotonic() - self._last_flush_time >= self._interval_seconds:
+                self.flush()
+
+    def flush(self, wait: bool = False):
+        """
+        截取增量并提交写入
+        :param wait: 是否等待之前提交的全部写入完成
+        """
+        self._raise_if_failed()
+        if self._policy == PersistencePolicyEnum.NEVER:
+            return
+        delta = self._snapshot()
+        self._events_since_flush = 0
+        self._last_flush_time = time.monotonic()
+
+        if delta is not None:
+            if self._background:
+                self._ensure_writer()
+                self._queue.put(delta)
+            else:
+                self._write(delta)
+
+        if wait and self._background:
+            self._queue.join()
+            self._raise_if_failed()
+
+    def close(self):
+        """
+        写入剩余增量并等待后台线程完成; 之前的写入失败时再整体重写一次, 重写成功则不再抛出之前的异常
+        """
+        try:
+            try:
+                self.flush(wait=True)
+            except BaseException as e:
+                if not self._rewrite_required:
+                    raise
+                print("portfolio %s: write failed (%r), rewriting all rows" % (self._portfolio_id, e))
+                self.flush(wait=True)
+        finally:
+            if self._writer is not None:
+                self._queue.put(None)
+                self._writer.join()
+                self._writer = None
+
+    def _snapshot(self) -> Optional[PortfolioDelta]:
+        first_row = self._ledger.take_dirty_from()
+        size = len(self._ledger)
+        if self._rewrite_required:
+            self._rewrite_required = False
+            self._persisted_rows = 0
+            first_row = 0
+        if self._persisted_rows > 0 and first_row >= size:
+            positions, holdings = [], []
+        else:
+            positions = [self._ledger.position_do(row).convert_2_dict() for row in range(first_row, size)]
+            holdings = [self._ledger.holding_do(row).convert_2_dict() for row in range(first_row, size)]
+
+        delta = PortfolioDelta(self._portfolio_id, self._header_fn(), self._persisted_rows, first_row,
+                               positions, holdings)
+        self._persisted_rows = size
+        return delta
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="portfolio-writer-%s" % self._portfolio_id,
+                                            daemon=True)
+            self._writer.start()
+
+    def _write(self, delta: PortfolioDelta):
+        try:
+            self._store.write(delta)
+        except BaseException:
+            self._rewrite_required = True
+            raise
+
+    def _write_loop(self):
+        # 写入失败后等待整体重写, 期间的增量被整体重写取代
+        awaiting_rewrite = False
+        while True:
+            delta = self._queue.get()
+            try:
+                if delta is None:
+                    return
+                if awaiting_rewrite and delta.persisted_rows > 0:
+                    self.superseded_deltas += 1
+                    continue
+                self._write(delta)
+                awaiting_rewrite = False
+            except BaseException as e:
+                awaiting_rewrite = True
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
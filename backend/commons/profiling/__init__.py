@@ -0,0 +1,2 @@
+from backend.commons.profiling.stage_profiler import StageProfiler, LatencyHistogram, NULL_PROFILER, \
+    DATA_FETCH_METHODS
@@ -0,0 +1,267 @@
+import contextlib
+import functools
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from dao.mongo.command_monitor import CommandStats, COMMAND_MONITOR
+
+try:
+    _now_ns = time.perf_counter_ns
+except AttributeError:  # python < 3.7
+    def _now_ns() -> int:
+        return int(time.perf_counter() * 1e9)
+
+# 数据处理器中被计入 DATA_FETCH 阶段的方法
+DATA_FETCH_METHODS: List[str] = [
+    'get_bar', 'get_bar_value', 'get_features', 'get_k_data_previous', 'get_bar_columns', 'get_previous_date'
+]
+
+
+class LatencyHistogram(object):
+    """
+    以2为底的对数分桶耗时直方图, 第i个桶统计 [2^(i-1), 2^i) 纳秒的调用, 记录一次只需一次整数运算
+    """
+    __slots__ = ('buckets', 'count', 'total_ns', 'min_ns', 'max_ns')
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * 64
+        self.count: int = 0
+        self.total_ns: int = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns: int = 0
+
+    def record(self, elapsed_ns: int):
+        self.buckets[min(63, elapsed_ns.bit_length())] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if self.min_ns is None or elapsed_ns < self.min_ns:
+            self.min_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def percentile_ns(self, q: float) -> int:
+        """
+        近似分位数, 返回所在桶的上界, 不超过最大值
+
+        :param q: 0 ~ 100
+        """
+        if self.count == 0:
+            return 0
+        threshold = self.count * q / 100.0
+        accumulated = 0
+        for i, n in enumerate(self.buckets):
+            accumulated += n
+            if n > 0 and accumulated >= threshold:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.count,
+            'total_ms': self.total_ns / 1e6,
+            'mean_us': self.total_ns / 1e3 / self.count if self.count else 0.0,
+            'min_us': (self.min_ns or 0) / 1e3,
+            'p50_us': self.percentile_ns(50) / 1e3,
+            'p90_us': self.percentile_ns(90) / 1e3,
+            'p99_us': self.percentile_ns(99) / 1e3,
+            'max_us': self.max_ns / 1e3,
+            # map(桶上界纳秒 -> 调用次数), 只输出非空桶
+            'histogram_ns': dict([(str(1 << i), n) for i, n in enumerate(self.buckets) if n > 0])
+        }
+
+
+class _NullStage(object):
+    """
+    关闭统计时使用的空上下文, 全局共享一个实例
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    """
+    一个阶段的计时上下文, 每个阶段只创建一次并重复使用
+    同一阶段嵌套进入时只统计最外层
+    """
+    __slots__ = ('name', 'histogram', '_profiler', '_depth', '_start_ns', '_outer')
+
+    def __init__(self, name: str, profiler: 'StageProfiler'):
+        self.name: str = name
+        self.histogram: LatencyHistogram = LatencyHistogram()
+        self._profiler: StageProfiler = profiler
+        self._depth = 0
+        self._start_ns = 0
+        self._outer: Optional[str] = None
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._outer = self._profiler.current_stage
+            self._profiler.current_stage = self.name
+            self._start_ns = _now_ns()
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self.histogram.record(_now_ns() - self._start_ns)
+            self._profiler.current_stage = self._outer
+        return False
+
+
+class StageProfiler(object):
+    """
+    事件处理流水线分阶段统计
+    每个阶段记录调用次数和耗时直方图, 同时订阅mongo命令监听器, 按命令和发起命令时所在的阶段统计查询次数及字节数;
+    关闭时 stage() 返回共享的空上下文, 不计时也不订阅mongo命令, 开销只有一次空的 with
+    只统计创建它的线程中的阶段, 其他线程(如组合持久化后台线程)发起的mongo命令计入 background
+    """
+
+    BACKGROUND_SCOPE = 'background'
+    NO_STAGE_SCOPE = 'no_stage'
+
+    def __init__(self, enabled: bool = True):
+        """
+
+        :param enabled: 是否统计
+        """
+        self.enabled: bool = enabled
+        self.current_stage: Optional[str] = None
+        # map(stage_name -> _Stage), 保持首次出现的顺序
+        self._stages: Dict[str, _Stage] = {}
+        self._owner_thread_id: int = threading.get_ident()
+        self._mongo_stats: Optional[CommandStats] = None
+        self._start_time: Optional[float] = None
+        self._elapsed_seconds: float = 0.0
+
+    def stage(self, name: str):
+        """
+        阶段计时上下文, 调用方可以缓存返回值重复使用
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = _Stage(name, self)
+            self._stages[name] = stage
+        return stage
+
+    def _mongo_scope(self) -> str:
+        if threading.get_ident() != self._owner_thread_id:
+            return self.BACKGROUND_SCOPE
+        return self.current_stage or self.NO_STAGE_SCOPE
+
+    def start(self):
+        """
+        开始统计mongo命令, 可在 stop 之后再次调用, 统计结果累加
+        """
+        if not self.enabled or self._start_time is not None:
+            return
+        self._owner_thread_id = threading.get_ident()
+        if self._mongo_stats is None:
+            self._mongo_stats = CommandStats(self._mongo_scope)
+        COMMAND_MONITOR.subscribe(self._mongo_stats)
+        self._start_time = time.perf_counter()
+
+    def stop(self):
+        if self._start_time is None:
+            return
+        COMMAND_MONITOR.unsubscribe(self._mongo_stats)
+        self._elapsed_seconds += time.perf_counter() - self._start_time
+        self._start_time = None
+
+    @contextlib.contextmanager
+    def instrumented(self, target: Any, method_names: List[str], stage_name: str) -> Iterator[Any]:
+        """
+        在 with 范围内把 target 的方法包装为 stage_name 阶段, 退出时恢复; 关闭统计时不做任何包装
+
+        :param target: 任意对象, 例如数据处理器
+        :param method_names: 被包装的方法名, 不存在的方法忽略
+        """
+        if not self.enabled:
+            yield target
+            return
+
+        stage = self.stage(stage_name)
+        wrapped = []
+        instance_attrs = getattr(target, '__dict__', None)
+        for name in method_names:
+            method = getattr(target, name, None)
+            # 没有实例字典(__slots__)或已被包装过的对象不处理
+            if method is None or instance_attrs is None or name in instance_attrs:
+                continue
+            setattr(target, name, self._wrap(stage, method))
+            wrapped.append(name)
+        try:
+            yield target
+        finally:
+            for name in wrapped:
+                delattr(target, name)
+
+    @staticmethod
+    def _wrap(stage: _Stage, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with stage:
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    def report(self) -> Dict[str, Any]:
+        """
+        :return: {'elapsed_seconds', 'stages': map(阶段 -> 统计), 'mongo': {'commands', 'scopes'}}
+        """
+        elapsed = self._elapsed_seconds
+        if self._start_time is not None:
+            elapsed += time.perf_counter() - self._start_time
+        return {
+            'enabled': self.enabled,
+            'elapsed_seconds': elapsed,
+            'stages': dict([(name, stage.histogram.to_dict()) for name, stage in self._stages.items()]),
+            'mongo': self._mongo_stats.to_dict() if self._mongo_stats is not None
+            else {'commands': {}, 'scopes': {}}
+        }
+
+    def to_json(self, path: str = None, indent: int = 2) -> str:
+        """
+        :param path: 不为None时同时写入该文件
+        """
+        content = json.dumps(self.report(), indent=indent, ensure_ascii=False)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        return content
+
+    def format_report(self) -> str:
+        """
+        供打印的文本表格
+        """
+        report = self.report()
+        lines = ["%-22s %10s %12s %10s %10s %10s %10s %8s %10s"
+                 % ('stage', 'calls', 'total_ms', 'mean_us', 'p50_us', 'p99_us', 'max_us', 'mongo', 'mongo_kb')]
+        scopes = report['mongo']['scopes']
+        for name, stage in report['stages'].items():
+            mongo = scopes.get(name, {})
+            lines.append("%-22s %10d %12.3f %10.2f %10.2f %10.2f %10.2f %8d %10.1f"
+                         % (name, stage['calls'], stage['total_ms'], stage['mean_us'], stage['p50_us'],
+                            stage['p99_us'], stage['max_us'], mongo.get('count', 0),
+                            (mongo.get('request_bytes', 0) + mongo.get('reply_bytes', 0)) / 1024.0))
+        for name in [s for s in scopes.keys() if s not in report['stages']]:
+            mongo = scopes[name]
+            lines.append("%-22s %10s %12s %10s %10s %10s %10s %8d %10.1f"
+                         % (name, '-', '-', '-', '-', '-', '-', mongo['count'],
+                            (mongo['request_bytes'] + mongo['reply_bytes']) / 1024.0))
+        return "\n".join(lines)
+
+
+NULL_PROFILER: StageProfiler = StageProfiler(enabled=False)
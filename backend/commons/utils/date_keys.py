@@ -0,0 +1,118 @@
+"""
+日期键
+引擎内部用整数表示日期, 只在与数据源/mongo交互时转换为字符串:
+日线为距 1970-01-01 的天数, 日内(小时/分钟)为距 1970-01-01 00:00:00 的纳秒数;
+两者量级不重叠, 由 is_day_key 区分, 同一类键的大小顺序与日期字符串顺序一致
+键的类型及转回字符串的格式都由调用方持有的 DateFormatStrEnum 决定, 与同一批中其他日期无关
+"""
+import datetime
+import functools
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_EPOCH = datetime.datetime(1970, 1, 1)
+# 小于该值的键为日线键(约27万年), 纳秒键只有在 1970-01-01 的前0.1秒内才会小于该值
+_DAY_KEY_LIMIT = 10 ** 8
+_DAY_STR_LEN = 10
+
+_STRFTIME_FORMATS: Dict[DateFormatStrEnum, str] = {
+    DateFormatStrEnum.DAY_BASE: '%Y-%m-%d',
+    DateFormatStrEnum.HOUR_BASE: '%Y-%m-%d %H',
+    DateFormatStrEnum.MINUTE_BASE: '%Y-%m-%d %H:%M',
+}
+
+
+def is_day_key(key: int) -> bool:
+    return -_DAY_KEY_LIMIT < key < _DAY_KEY_LIMIT
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def date_str_2_key(date_str: str, date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> int:
+    """
+    DAY_BASE 时 '%Y-%m-%d' 转为天数键, 其他格式转为纳秒键
+
+    :param date_format: 日期格式, DAY_BASE 时日期字符串不是 '%Y-%m-%d' 抛出 ValueError
+    """
+    if date_format == DateFormatStrEnum.DAY_BASE:
+        if len(date_str) != _DAY_STR_LEN:
+            raise ValueError("%r is not a %s date" % (date_str, date_format.name))
+        return datetime.date(int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10])).toordinal() \
+               - _EPOCH_ORDINAL
+    return int(np.datetime64(date_str, 'ns').astype(np.int64))
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def key_2_date_str(key: int, date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> str:
+    """
+    按 date_format 格式化: DAY_BASE 为 '%Y-%m-%d', HOUR_BASE 为 '%Y-%m-%d %H', MINUTE_BASE 为 '%Y-%m-%d %H:%M'
+
+    :param date_format: 日期格式, 与键的类型不一致(日线键配日内格式, 或相反)时抛出 ValueError
+    """
+    if is_day_key(key) != (date_format == DateFormatStrEnum.DAY_BASE):
+        raise ValueError("key %d does not match date format %s" % (key, date_format.name))
+    if date_format == DateFormatStrEnum.DAY_BASE:
+        return datetime.date.fromordinal(key + _EPOCH_ORDINAL).strftime(_STRFTIME_FORMATS[date_format])
+    return (_EPOCH + datetime.timedelta(microseconds=key // 1000)).strftime(_STRFTIME_FORMATS[date_format])
+
+
+def format_key(key: Optional[int]) -> Optional[str]:
+    """
+    仅用于日志/调试输出: 按键的类型格式化, 纳秒键带秒; 与数据源交互应使用 key_2_date_str
+    """
+    if key is None:
+        return None
+    if is_day_key(key):
+        return key_2_date_str(key)
+    return (_EPOCH + datetime.timedelta(microseconds=key // 1000)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def optional_key(date_str: Optional[str],
+                 date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> Optional[int]:
+    return None if date_str is None else date_str_2_key(date_str, date_format)
+
+
+def optional_date_str(key: Optional[int],
+                      date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> Optional[str]:
+    return None if key is None else key_2_date_str(key, date_format)
+
+
+def day_key_of(date_time: datetime.date) -> int:
+    """
+    date / datetime 所在日期的天数键
+    """
+    return date_time.toordinal() - _EPOCH_ORDINAL
+
+
+def datetime_2_key(date_time: datetime.datetime) -> int:
+    """
+    不带时区的 datetime 转为纳秒键
+    """
+    delta = date_time - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10 ** 9 + delta.microseconds * 1000
+
+
+def date_strs_2_keys(date_strs: Sequence[str],
+                     date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> np.ndarray:
+    """
+    批量转换, 键的类型由 date_format 决定, 见 date_str_2_key
+
+    :return: int64 数组
+    """
+    values = np.asarray(date_strs, dtype=str)
+    if len(values) == 0:
+        return np.array([], dtype=np.int64)
+    if date_format == DateFormatStrEnum.DAY_BASE:
+        lengths = np.char.str_len(values)
+        if not np.all(lengths == _DAY_STR_LEN):
+            raise ValueError("%r is not a %s date" % (values[lengths != _DAY_STR_LEN][0], date_format.name))
+        return values.astype('datetime64[D]').astype(np.int64)
+    return values.astype('datetime64[ns]').astype(np.int64)
+
+
+def keys_2_date_strs(keys: Sequence[int],
+                     date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE) -> List[str]:
+    return [key_2_date_str(key, date_format) for key in keys]
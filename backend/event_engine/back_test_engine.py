@@ -1,7 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import queue
+import collections
 import time
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -10,12 +10,21 @@ from pandas import DataFrame
 
 from backend.commons.abstract_strategy import AbstractStrategy
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.point_in_time import PointInTimeView
+from backend.commons.data_handlers.trade_calendar import TradeCalendar
 from backend.commons.enums.date_format_enums import DateFormatStrEnum
 from backend.commons.enums.event_type_enums import EventTypeEnum
+from backend.commons.enums.pipeline_stage_enums import PipelineStageEnum
+from backend.commons.enums.persistence_policy_enums import PersistencePolicyEnum
+from backend.commons.enums.portfolio_storage_enums import PortfolioStorageEnum
+from backend.commons.enums.run_mode_enums import RunModeEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
 from backend.commons.events.base import AbstractEvent, MarketEvent, SignalEvent, OrderEvent, FillEvent
 from backend.commons.order_execution.order_execute_handler import SimulatedOrderExecuteHandler
+from backend.commons.performance import StatisticSummary, EquityCurve
 from backend.commons.portfolios.base import Portfolio
+from backend.commons.profiling import StageProfiler, NULL_PROFILER, DATA_FETCH_METHODS
+from backend.event_engine.scheduler import MergedCalendarScheduler, BarStep
 
 
 class BackTestEngine(object):
@@ -37,7 +46,12 @@ class BackTestEngine(object):
                  start_date_str: str,
                  date_format_enum: DateFormatStrEnum,
                  data_handler: CommonDataHandler,
-                 strategy: AbstractStrategy):
+                 strategy: AbstractStrategy,
+                 run_mode: RunModeEnum = RunModeEnum.HEARTBEAT,
+                 persistence_policy: PersistencePolicyEnum = PersistencePolicyEnum.END_OF_RUN,
+                 portfolio_storage: PortfolioStorageEnum = PortfolioStorageEnum.DOCUMENT,
+                 trade_calendar: TradeCalendar = None,
+                 profiler: StageProfiler = None):
         """
         :param back_test_name
         :param symbol_type
@@ -46,6 +60,11 @@ class BackTestEngine(object):
         :param start_date_str:
         :param data_handler: 
         :param strategy: 
+        :param run_mode: HEARTBEAT 心跳轮询; FAST 不休眠直接处理完全部历史事件
+        :param persistence_policy: 组合持久化策略, 默认回测结束时写入一次
+        :param portfolio_storage: 组合在mongo中的存储结构
+        :param trade_calendar: 交易日历, 默认由 data_handler.get_trade_calendar 构建
+        :param profiler: 分阶段耗时及mongo命令统计, 默认不统计
         """
         self._portfolio_id = portfolio_id
         self._name = back_test_name
@@ -58,6 +77,16 @@ class BackTestEngine(object):
         self._date_format_enum = date_format_enum
         self._data_handler: CommonDataHandler = data_handler
         self._strategy: AbstractStrategy = strategy
+        self._run_mode: RunModeEnum = run_mode
+        self._profiler: StageProfiler = profiler if profiler is not None else NULL_PROFILER
+        # 预先取得各阶段的计时上下文, 关闭统计时都是同一个空上下文
+        self._stage_mark = self._profiler.stage(PipelineStageEnum.MARK_TO_MARKET.value)
+        self._stage_indicators = self._profiler.stage(PipelineStageEnum.UPDATE_INDICATORS.value)
+        self._stage_signals = self._profiler.stage(PipelineStageEnum.CALCULATE_SIGNALS.value)
+        self._stage_order = self._profiler.stage(PipelineStageEnum.GENERATE_ORDER.value)
+        self._stage_execute = self._profiler.stage(PipelineStageEnum.EXECUTE_ORDER.value)
+        self._stage_fill = self._profiler.stage(PipelineStageEnum.UPDATE_FILL.value)
+        self._stage_persist = self._profiler.stage(PipelineStageEnum.PERSIST.value)
 
         """
         
@@ -69,10 +98,13 @@ class BackTestEngine(object):
                                                self._date_format_enum,
                                                self._symbol_list,
                                                self._initial_capital,
-                                               is_back_test=True)
-        self._execution_handler: SimulatedOrderExecuteHandler = SimulatedOrderExecuteHandler()
+                                               is_back_test=True,
+                                               persistence_policy=persistence_policy,
+                                               storage=portfolio_storage)
+        self._execution_handler: SimulatedOrderExecuteHandler = SimulatedOrderExecuteHandler(self._date_format_enum)
 
-        self._global_events_que = queue.Queue()
+        # 回测在单线程中处理事件, 使用无锁的 deque
+        self._global_events_que: collections.deque = collections.deque()
 
         self._signals = 0
         self._orders = 0
@@ -80,36 +112,70 @@ class BackTestEngine(object):
         self._num_strategies = 1
         self._heartbeat_time = 0.1  # 0.1s
 
-        # map(symbol_code -> previous_processed_date_index)
-        # 前一次处理的历史交易日期Index
-        self._previous_trade_date_index: Dict[str, int] = {}
+        # 已处理市场事件数及耗时
+        self._market_events = 0
+        self._elapsed_seconds = 0.0
 
+        self._trade_calendar: TradeCalendar = trade_calendar if trade_calendar is not None \
+            else data_handler.get_trade_calendar(symbol_list)
         self._whole_history_trade_dates: Dict[str, List[str]] = self._init_whole_history_trade_dates()
+        self._scheduler: Optional[MergedCalendarScheduler] = None
+        # 策略可见的历史数据, 每个交易日前移一次
+        self._data_view: PointInTimeView = PointInTimeView(data_handler)
 
     def _init_whole_history_trade_dates(self) -> Dict[str, List[str]]:
-        whole_history_trade_dates = dict([
-            (symbol_code,
-             sorted(self._data_handler.get_history_trade_date(symbol_code, self._start_date_str), reverse=False))
+        return dict([
+            (symbol_code, self._trade_calendar.date_range(self._start_date_str, None, symbol_code))
             for symbol_code in self._symbol_list
         ])
 
-        return whole_history_trade_dates
+    def trade_calendar(self) -> TradeCalendar:
+        return self._trade_calendar
 
     def _init_first_market_events(self):
-        init_index = 1
-        for symbol_code in self._whole_history_trade_dates.keys():
-            bill_date_list = self._whole_history_trade_dates[symbol_code]
-            previous_date = self._data_handler.get_previous_date(symbol_code, bill_date_list[init_index])
-
-            self._previous_trade_date_index[symbol_code] = init_index
+        """
+        合并所有证券的交易日历, 每只证券从第二个交易日开始回放
+        """
+        self._scheduler = MergedCalendarScheduler(self._whole_history_trade_dates, self._symbol_list, init_index=1,
+                                                  date_format=self._date_format_enum)
 
-            self._global_events_que.put(MarketEvent(symbol_code, bill_date_list[init_index], previous_date))
+    def _dispatch_bar_step(self, step: BarStep):
+        """
+        处理一个交易日的截面行情:
+        组合按当日行情估值一次 => 逐个证券处理市场事件 => 组合持久化一次
+        """
+        date_str = step.date_str
+        with self._stage_mark:
+            self._portfolio.update_time_index_for_date(date_str, step.symbols(), self._data_handler)
+        self._data_view.advance(date_str)
+        self._global_events_que.extend(step.market_events)
+        self._drain_events()
+        with self._stage_persist:
+            self._portfolio.persist()
+
+    def _drain_events(self):
+        """
+        循环处理事件直到队列为空
+        """
+        events_que = self._global_events_que
+        while events_que:
+            current_event: MarketEvent = events_que.popleft()
+            if current_event is not None:
+                self._market_events += 1
+                self._process_event(current_event)
 
     def _run_back_test(self):
         """
         Executes the backtest.
         """
-
+        start_time = time.perf_counter()
+        if self._run_mode == RunModeEnum.FAST:
+            self._run_back_test_fast()
+        else:
+            self._run_back_test_heartbeat()
+        self._elapsed_seconds = time.perf_counter() - start_time
+
+    def _run_back_test_heartbeat(self):
         heartbeats = 0
         while True:
             """
@@ -121,72 +187,58 @@ class BackTestEngine(object):
             内层:循环处理事件
             """
             # Handle the events
-            while True:
-                try:
-                    current_event: MarketEvent = self._global_events_que.get(False)
-                except queue.Empty:
-                    break
-                else:
-                    if current_event is None:
-                        continue
-                    else:
-                        self._process_event(current_event)
-                        # 记录前一次处理交易日Index
-                        if current_event.event_type() == EventTypeEnum.MARKET:
-                            symbol_code = current_event.symbol()
-                            previous_index = self._previous_trade_date_index[symbol_code]
-                            # 处理完成
-                            if previous_index + 1 >= len(self._whole_history_trade_dates[symbol_code]):
-                                continue
-                            # 发送市场信号
-                            next_date = self._whole_history_trade_dates[symbol_code][previous_index + 1]
-                            self._global_events_que.put(MarketEvent(symbol_code, next_date, current_event.date_str()))
-                            # 更新交易日Index
-                            self._previous_trade_date_index[current_event.symbol()] \
-                                = self._previous_trade_date_index[current_event.symbol()] + 1
+            while self._scheduler.has_next():
+                self._dispatch_bar_step(self._scheduler.next_step())
 
             time.sleep(self._heartbeat_time)
 
-            count = 0
-            for symbol in self._previous_trade_date_index.keys():
-                if self._previous_trade_date_index[symbol] >= len(
-                        self._whole_history_trade_dates[symbol]) - 1:
-                    count += 1
-
-            if count >= len(self._previous_trade_date_index.keys()):
+            if not self._scheduler.has_next():
                 break
 
+    def _run_back_test_fast(self):
+        """
+        历史回放不需要等待行情, 直接把事件循环处理到结束
+        """
+        while self._scheduler.has_next():
+            self._dispatch_bar_step(self._scheduler.next_step())
+
     def _process_event(self, event: MarketEvent):
-        if event.event_type() != EventTypeEnum.MARKET:
+        if event.event_type != EventTypeEnum.MARKET:
             return
 
-        self._portfolio.update_time_index_for_market_event(event, self._data_handler)
-        # 计算策略信号
-        signal_event: Optional[SignalEvent] = self._strategy.calculate_signals(event)
+        # 更新策略声明的指标, 再计算策略信号
+        with self._stage_indicators:
+            self._strategy.update_indicators(event, self._data_view)
+        with self._stage_signals:
+            signal_event: Optional[SignalEvent] = self._strategy.calculate_signals(event, self._data_view)
 
         if signal_event is None:
             return
 
         self._signals += 1
-        order_event: Optional[OrderEvent] = self._portfolio.generate_order_event(signal_event, self._data_handler)
+        with self._stage_order:
+            order_event: Optional[OrderEvent] = self._portfolio.generate_order_event(signal_event,
+                                                                                     self._data_handler)
 
         if order_event is None:
             return
 
         self._orders += 1
-        fill_event: Optional[FillEvent] = self._execution_handler.execute_order(self._data_handler, order_event)
+        with self._stage_execute:
+            fill_event: Optional[FillEvent] = self._execution_handler.execute_order(self._data_handler, order_event)
 
         if fill_event is None:
             return
 
         self._fills += 1
-        self._portfolio.update_fill(fill_event, self._data_handler)
+        with self._stage_fill:
+            self._portfolio.update_fill(fill_event, self._data_handler, persist=False)
 
     def _put_event_2_queue(self, event: AbstractEvent):
         if event is not None:
-            self._global_events_que.put(event)
+            self._global_events_que.append(event)
 
-    def _output_performance(self):
+    def _output_performance(self) -> (StatisticSummary, EquityCurve):
         """
         Outputs the strategy performance from the backtest.
         """
@@ -202,12 +254,42 @@ class BackTestEngine(object):
         print("Signals: %s" % self._signals)
         print("Orders: %s" % self._orders)
         print("Fills: %s" % self._fills)
+        print("Events: %s, elapsed: %.3fs, events/sec: %.1f"
+              % (self.events(), self._elapsed_seconds, self.events_per_second()))
+        if self._profiler.enabled:
+            print(self._profiler.format_report())
         print("")
+        return statistic_summary, equity_curve
+
+    def events(self) -> int:
+        """
+        已处理事件总数: 市场/信号/订单/成交
+        """
+        return self._market_events + self._signals + self._orders + self._fills
+
+    def profiler(self) -> StageProfiler:
+        """
+        分阶段统计, 回测结束后可通过 profiler().to_json(path) 导出
+        """
+        return self._profiler
+
+    def events_per_second(self) -> float:
+        if self._elapsed_seconds <= 0:
+            return 0.0
+        return self.events() / self._elapsed_seconds
 
-    def simulate_trading(self):
+    def simulate_trading(self) -> (StatisticSummary, EquityCurve):
         """
         Simulates the backtest and outputs portfolios performance.
         """
         self._init_first_market_events()
-        self._run_back_test()
-        self._output_performance()
+        self._profiler.start()
+        try:
+            with self._profiler.instrumented(self._data_handler, DATA_FETCH_METHODS,
+                                             PipelineStageEnum.DATA_FETCH.value):
+                self._run_back_test()
+                return self._output_performance()
+        finally:
+            with self._stage_persist:
+                self._portfolio.close()
+            self._profiler.stop()
@@ -5,15 +5,17 @@ import queue
 import time
 from typing import List, Dict, Optional, Set
 
-import pandas
-
 from backend.commons.abstract_strategy import AbstractStrategy
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.point_in_time import PointInTimeView
 from backend.commons.enums.event_type_enums import EventTypeEnum
+from backend.commons.enums.pipeline_stage_enums import PipelineStageEnum
 from backend.commons.enums.symbol_type import SymbolTypeEnum
 from backend.commons.events.base import MarketEvent, AbstractEvent, OrderEvent, SignalEvent, FillEvent
 from backend.commons.order_execution.order_execute_handler import SimulatedOrderExecuteHandler
 from backend.commons.portfolios.base import Portfolio
+from backend.commons.profiling import StageProfiler, NULL_PROFILER, DATA_FETCH_METHODS
+from backend.commons.utils.date_keys import day_key_of
 
 
 class OnlineEngine(object):
@@ -26,7 +28,8 @@ class OnlineEngine(object):
     """
 
     def __init__(self, back_test_name, symbol_type: SymbolTypeEnum, symbol_code_list: List[str], initial_capital: float,
-                 start_date: datetime.datetime, data_handler: CommonDataHandler, strategy: AbstractStrategy):
+                 start_date: datetime.datetime, data_handler: CommonDataHandler, strategy: AbstractStrategy,
+                 profiler: StageProfiler = None):
         """
         :param back_test_name
         :param symbol_type
@@ -35,6 +38,7 @@ class OnlineEngine(object):
         :param start_date:
         :param data_handler:
         :param strategy:
+        :param profiler: 分阶段耗时及mongo命令统计, 默认不统计
         """
         self._back_test_name = back_test_name
         self._symbol_type: SymbolTypeEnum = symbol_type
@@ -43,6 +47,14 @@ class OnlineEngine(object):
         self._start_date: datetime = start_date
         self._data_handler: CommonDataHandler = data_handler
         self._strategy: AbstractStrategy = strategy
+        self._profiler: StageProfiler = profiler if profiler is not None else NULL_PROFILER
+        self._stage_mark = self._profiler.stage(PipelineStageEnum.MARK_TO_MARKET.value)
+        self._stage_indicators = self._profiler.stage(PipelineStageEnum.UPDATE_INDICATORS.value)
+        self._stage_signals = self._profiler.stage(PipelineStageEnum.CALCULATE_SIGNALS.value)
+        self._stage_order = self._profiler.stage(PipelineStageEnum.GENERATE_ORDER.value)
+        self._stage_execute = self._profiler.stage(PipelineStageEnum.EXECUTE_ORDER.value)
+        self._stage_fill = self._profiler.stage(PipelineStageEnum.UPDATE_FILL.value)
+        self._stage_persist = self._profiler.stage(PipelineStageEnum.PERSIST.value)
 
         """
 
@@ -70,6 +82,8 @@ class OnlineEngine(object):
             [(symbol_code, None)
              for symbol_code in self._symbol_code_list]
         )
+        # 策略可见的历史数据, K线每天增加, 时点前移时重新获取
+        self._data_view: PointInTimeView = PointInTimeView(data_handler, reload_on_advance=True)
 
     @staticmethod
     def _convert_to_seventeen_clock(current_date_time: datetime.datetime) -> datetime.datetime:
@@ -97,8 +111,10 @@ class OnlineEngine(object):
                 current_date_time = self._convert_to_seventeen_clock(now)
                 if current_date_time not in self._processed_trade_date_time[symbol_code]:
                     continue
+                previous_date_time = self._previous_trade_date_time[symbol_code]
                 self._put_event_2_queue(
-                    MarketEvent(symbol_code, current_date_time, self._previous_trade_date_time[symbol_code])
+                    MarketEvent(symbol_code, day_key_of(current_date_time),
+                                None if previous_date_time is None else day_key_of(previous_date_time))
                 )
                 self._previous_trade_date_time[symbol_code] = current_date_time
                 self._processed_trade_date_time[symbol_code].add(current_date_time)
@@ -124,29 +140,40 @@ class OnlineEngine(object):
             self._output_performance()
 
     def _process_event(self, event: AbstractEvent):
-        if event.event_type() == EventTypeEnum.MARKET:
-            self._portfolio.update_time_index_for_market_event(event, self._data_handler)
-            # 计算策略信号
-            features: pandas.DataFrame = self._data_handler.get_features(event.symbol(), event.date_str())
-            signal_event: Optional[SignalEvent] = self._strategy.calculate_signals(features, event)
+        if event.event_type == EventTypeEnum.MARKET:
+            with self._stage_mark:
+                self._portfolio.update_time_index_for_date(event.date_str, [event.symbol], self._data_handler)
+            with self._stage_persist:
+                self._portfolio.persist()
+            # 更新策略声明的指标, 再计算策略信号
+            self._data_view.advance(event.date_str)
+            with self._stage_indicators:
+                self._strategy.update_indicators(event, self._data_view)
+            with self._stage_signals:
+                signal_event: Optional[SignalEvent] = self._strategy.calculate_signals(event, self._data_view)
 
             self._put_event_2_queue(signal_event)
 
-        elif event.event_type() == EventTypeEnum.SIGNAL:
+        elif event.event_type == EventTypeEnum.SIGNAL:
             self._signals += 1
-            order_event: Optional[OrderEvent] = self._portfolio.generate_order_event(event)
+            with self._stage_order:
+                order_event: Optional[OrderEvent] = self._portfolio.generate_order_event(event)
 
             self._put_event_2_queue(order_event)
 
-        elif event.event_type() == EventTypeEnum.ORDER:
+        elif event.event_type == EventTypeEnum.ORDER:
             self._orders += 1
-            fill_event: Optional[FillEvent] = self._execution_handler.execute_order(event)
+            with self._stage_execute:
+                fill_event: Optional[FillEvent] = self._execution_handler.execute_order(event)
 
             self._put_event_2_queue(fill_event)
 
-        elif event.event_type() == EventTypeEnum.FILL:
+        elif event.event_type == EventTypeEnum.FILL:
             self._fills += 1
-            self._portfolio.update_fill(event, self._data_handler)
+            with self._stage_fill:
+                self._portfolio.update_fill(event, self._data_handler, persist=False)
+            with self._stage_persist:
+                self._portfolio.persist()
 
     def _put_event_2_queue(self, event: AbstractEvent):
         if event is not None:
@@ -156,20 +183,32 @@ class OnlineEngine(object):
         """
         Outputs the strategy performance from the backtest.
         """
-        statistic_summary, equity_curve = self._portfolio.statistic_summary(self._symbol_type)
+        # 增量指标, 每次心跳不再重建资金曲线
+        metrics = self._portfolio.streaming_metrics()
+        statistic_summary = metrics.statistic_summary(self._symbol_type)
 
         print("Creating summary stats...")
-        print(statistic_summary)
-
-        print("Creating equity curve...")
-        print(equity_curve.data.tail(10))
+        print(statistic_summary.total_return, statistic_summary.sharpe_ratio, statistic_summary.drawn_down_duration,
+              statistic_summary.max_drawn_down)
+        print(metrics)
 
         print("Signals: %s" % self._signals)
         print("Orders: %s" % self._orders)
         print("Fills: %s" % self._fills)
+        if self._profiler.enabled:
+            print(self._profiler.format_report())
+
+    def profiler(self) -> StageProfiler:
+        return self._profiler
 
     def simulate_trading(self):
         """
         Simulates the backtest and outputs portfolios performance.
         """
-        self._run_back_test()
+        self._profiler.start()
+        try:
+            with self._profiler.instrumented(self._data_handler, DATA_FETCH_METHODS,
+                                             PipelineStageEnum.DATA_FETCH.value):
+                self._run_back_test()
+        finally:
+            self._profiler.stop()
@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import contextlib
+import functools
+import io
+import itertools
+import math
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import pandas
+
+from backend.commons.abstract_strategy import AbstractStrategy
+from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.cached_data_handler import CachedBackTestDataHandler
+from backend.commons.data_handlers.shared_memory_handler import SharedBarPublisher, SharedMemoryDataHandler, \
+    shared_memory_available
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.enums.persistence_policy_enums import PersistencePolicyEnum
+from backend.commons.enums.run_mode_enums import RunModeEnum
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.event_engine.back_test_engine import BackTestEngine
+from backend.event_engine.vectorized_engine import VectorizedBackTestEngine
+
+# 工作进程内的数据处理器, 由 _init_worker 创建, 进程内所有参数组合共用
+_worker_data_handler: Optional[CommonDataHandler] = None
+
+
+def _init_worker(data_handler_factory: Callable[[], CommonDataHandler], symbol_list: List[str]):
+    global _worker_data_handler
+    _worker_data_handler = data_handler_factory()
+    if hasattr(_worker_data_handler, 'warm_up'):
+        _worker_data_handler.warm_up(symbol_list)
+
+
+def _supports_vectorized(strategy_cls: Type[AbstractStrategy]) -> bool:
+    return strategy_cls.calculate_vectorized_signals is not AbstractStrategy.calculate_vectorized_signals
+
+
+def _run_one(task: Dict[str, Any]) -> Dict[str, Any]:
+    params: Dict[str, Any] = task['params']
+    strategy = task['strategy_cls'](task['strategy_id'], _worker_data_handler, **params)
+
+    engine_cls = VectorizedBackTestEngine if task['vectorized'] else BackTestEngine
+    engine_kwargs = {} if task['vectorized'] \
+        else {'run_mode': RunModeEnum.FAST, 'persistence_policy': task['persistence_policy']}
+    engine = engine_cls(
+        task['portfolio_id'],
+        "%s-sweep-%s" % (task['strategy_cls'].__name__, task['portfolio_id']),
+        str(params),
+        task['symbol_type'],
+        task['symbol_list'],
+        task['initial_capital'],
+        task['start_date_str'],
+        task['date_format_enum'],
+        _worker_data_handler,
+        strategy,
+        **engine_kwargs
+    )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        statistic_summary, _ = engine.simulate_trading()
+
+    result = dict(params)
+    result.update(vars(statistic_summary))
+    return result
+
+
+class ParameterSweepRunner(object):
+    """
+    策略参数扫描
+    在进程池中对参数网格的每个组合运行一次回测, 汇总每次回测的 StatisticSummary
+    每个工作进程只加载一次行情数据, 在它处理的所有参数组合之间复用;
+    share_memory 时由主进程加载一次并发布到共享内存, 工作进程只挂载, 不复制
+    策略实现了 calculate_vectorized_signals 时使用 VectorizedBackTestEngine, 否则使用 BackTestEngine(FAST)
+    """
+
+    def __init__(self,
+                 strategy_cls: Type[AbstractStrategy],
+                 param_grid: Dict[str, List[Any]],
+                 symbol_list: List[str],
+                 start_date_str: str,
+                 initial_capital: float = 100000.0,
+                 symbol_type: SymbolTypeEnum = SymbolTypeEnum.CHINA_STOCK,
+                 date_format_enum: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE,
+                 data_handler_factory: Callable[[], CommonDataHandler] = None,
+                 processes: int = None,
+                 base_portfolio_id: int = 10000,
+                 vectorized: bool = None,
+                 share_memory: bool = None,
+                 persistence_policy: PersistencePolicyEnum = PersistencePolicyEnum.NEVER):
+        """
+        :param strategy_cls: 策略类, 构造参数为 (strategy_id, data_handler, **params)
+        :param param_grid: map(参数名 -> 候选值列表), 取笛卡尔积
+        :param symbol_list:
+        :param start_date_str:
+        :param initial_capital:
+        :param symbol_type:
+        :param date_format_enum:
+        :param data_handler_factory: 可序列化的无参工厂, 在每个工作进程中调用一次, 默认 CachedBackTestDataHandler
+        :param processes: 进程数, 默认CPU核数
+        :param base_portfolio_id: 第i个参数组合使用 base_portfolio_id + i 作为组合ID
+        :param vectorized: 是否使用向量化引擎, 默认由策略是否实现 calculate_vectorized_signals 决定
+        :param share_memory: 多进程时是否通过共享内存分发行情数据, 默认在支持 shared_memory 时启用
+        :param persistence_policy: BackTestEngine 的组合持久化策略, 默认 NEVER: 扫描不需要mongo,
+                                   也不会覆盖组合ID相同的已有组合
+        """
+        self._strategy_cls = strategy_cls
+        self._param_grid: Dict[str, List[Any]] = param_grid
+        self._symbol_list: List[str] = symbol_list
+        self._start_date_str: str = start_date_str
+        self._initial_capital: float = initial_capital
+        self._symbol_type: SymbolTypeEnum = symbol_type
+        self._date_format_enum: DateFormatStrEnum = date_format_enum
+        self._data_handler_factory = data_handler_factory if data_handler_factory is not None \
+            else functools.partial(CachedBackTestDataHandler, symbol_type, [])
+        self._processes: int = processes if processes is not None else multiprocessing.cpu_count()
+        self._base_portfolio_id: int = base_portfolio_id
+        self._vectorized: bool = vectorized if vectorized is not None else _supports_vectorized(strategy_cls)
+        self._share_memory: bool = share_memory if share_memory is not None else shared_memory_available()
+        self._persistence_policy: PersistencePolicyEnum = persistence_policy
+
+    def param_combinations(self) -> List[Dict[str, Any]]:
+        names = list(self._param_grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*[self._param_grid[n] for n in names])]
+
+    def _tasks(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'strategy_cls': self._strategy_cls,
+                'strategy_id': i,
+                'portfolio_id': self._base_portfolio_id + i,
+                'params': params,
+                'symbol_type': self._symbol_type,
+                'symbol_list': self._symbol_list,
+                'initial_capital': self._initial_capital,
+                'start_date_str': self._start_date_str,
+                'date_format_enum': self._date_format_enum,
+                'vectorized': self._vectorized,
+                'persistence_policy': self._persistence_policy
+            }
+            for i, params in enumerate(self.param_combinations())
+        ]
+
+    def run(self) -> pandas.DataFrame:
+        """
+        :return: 每行一个参数组合, 列为参数及 StatisticSummary 各字段
+        """
+        tasks = self._tasks()
+        if not tasks:
+            return pandas.DataFrame()
+
+        processes = max(1, min(self._processes, len(tasks)))
+        if processes == 1:
+            _init_worker(self._data_handler_factory, self._symbol_list)
+            results = [_run_one(task) for task in tasks]
+        elif self._share_memory:
+            publisher = SharedBarPublisher.from_data_handler(self._data_handler_factory(), self._symbol_list)
+            try:
+                factory = functools.partial(SharedMemoryDataHandler, self._symbol_type, [], publisher.layout)
+                results = self._run_pool(processes, factory, tasks)
+            finally:
+                publisher.close()
+        else:
+            results = self._run_pool(processes, self._data_handler_factory, tasks)
+
+        return pandas.DataFrame(results)
+
+    def _run_pool(self, processes: int, data_handler_factory: Callable[[], CommonDataHandler],
+                  tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        chunk_size = int(math.ceil(len(tasks) / float(processes * 4)))
+        with multiprocessing.Pool(processes, initializer=_init_worker,
+                                  initargs=(data_handler_factory, self._symbol_list)) as pool:
+            return pool.map(_run_one, tasks, chunksize=chunk_size)
@@ -0,0 +1,88 @@
+import heapq
+from typing import Dict, List, Tuple
+
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.events.base import MarketEvent
+from backend.commons.utils.date_keys import date_strs_2_keys, key_2_date_str
+
+
+class BarStep(object):
+    __slots__ = ('date_key', 'market_events', 'date_format')
+
+    def __init__(self, date_key: int, market_events: List[MarketEvent],
+                 date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE):
+        """
+        同一交易日所有证券的截面行情
+
+        :param date_key: 交易日期键
+        :param market_events: 当日有行情的证券对应的市场事件, 按 symbol_list 顺序排列
+        :param date_format: 日期格式, 决定 date_str 的格式
+        """
+        self.date_key: int = date_key
+        self.market_events: List[MarketEvent] = market_events
+        self.date_format: DateFormatStrEnum = date_format
+
+    @property
+    def date_str(self) -> str:
+        return key_2_date_str(self.date_key, self.date_format)
+
+    def symbols(self) -> List[str]:
+        return [event.symbol for event in self.market_events]
+
+    def __str__(self):
+        return "BarStep(date_str=%s, symbols=%s)" % (self.date_str, self.symbols())
+
+
+class MergedCalendarScheduler(object):
+    """
+    多证券时间同步调度器
+    用最小堆合并每只证券的交易日历, 按全局时间线逐日输出截面行情,
+    保证组合处理完日期D的全部证券之后才会看到任何证券的D+1
+    交易日期在构建时一次性转为整数日期键, 堆中只比较整数
+    """
+
+    def __init__(self, whole_history_trade_dates: Dict[str, List[str]], symbol_list: List[str], init_index: int = 1,
+                 date_format: DateFormatStrEnum = DateFormatStrEnum.DAY_BASE):
+        """
+
+        :param whole_history_trade_dates: map(symbol_code -> 升序交易日期)
+        :param symbol_list: 证券顺序, 同一日期内按该顺序输出
+        :param init_index: 每只证券从第几个交易日开始, 之前的交易日作为 previous_date
+        :param date_format: 交易日期的格式, 决定日期键的类型
+        """
+        self._date_format: DateFormatStrEnum = date_format
+        # map(symbol_code -> 升序交易日期键)
+        self._trade_date_keys: Dict[str, List[int]] = dict([
+            (symbol_code, date_strs_2_keys(whole_history_trade_dates.get(symbol_code, []), date_format).tolist())
+            for symbol_code in symbol_list
+        ])
+        # heap item: (date_key, symbol_order, symbol_code, date_index)
+        self._heap: List[Tuple[int, int, str, int]] = []
+        for order, symbol_code in enumerate(symbol_list):
+            keys = self._trade_date_keys[symbol_code]
+            if len(keys) > init_index:
+                self._heap.append((keys[init_index], order, symbol_code, init_index))
+        heapq.heapify(self._heap)
+
+        # map(symbol_code -> 最近一次输出的交易日期Index)
+        self.current_index: Dict[str, int] = {}
+
+    def has_next(self) -> bool:
+        return len(self._heap) > 0
+
+    def next_step(self) -> BarStep:
+        """
+        弹出全局时间线上下一个交易日的全部证券
+        """
+        date_key = self._heap[0][0]
+        market_events = []
+        while self._heap and self._heap[0][0] == date_key:
+            _, order, symbol_code, index = heapq.heappop(self._heap)
+            keys = self._trade_date_keys[symbol_code]
+            market_events.append(MarketEvent(symbol_code, date_key, keys[index - 1] if index > 0 else None))
+            self.current_index[symbol_code] = index
+
+            if index + 1 < len(keys):
+                heapq.heappush(self._heap, (keys[index + 1], order, symbol_code, index + 1))
+
+        return BarStep(date_key, market_events, self._date_format)
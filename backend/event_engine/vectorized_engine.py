@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+from typing import List
+
+import numpy as np
+import pandas
+
+from backend.commons.abstract_strategy import AbstractStrategy
+from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.enums.date_format_enums import DateFormatStrEnum
+from backend.commons.enums.signal_type_enums import SignalTypeEnum
+from backend.commons.enums.symbol_type import SymbolTypeEnum
+from backend.commons.order_execution.order_execute_handler import SimulatedOrderExecuteHandler
+from backend.commons.performance import StatisticSummary, EquityCurve
+from backend.commons.performance.base_performance import create_statistic_summary
+from backend.commons.portfolios.base import ORDER_LOT_SIZE
+
+
+class VectorizedBackTestEngine(object):
+    """
+    向量化回测框架
+    适用于信号可以由整段历史一次性计算的策略(实现 AbstractStrategy.calculate_vectorized_signals)
+    process_pipeline:
+    Strategy:全历史信号矩阵 => 逐笔下单决策(仅标量运算) =>
+    头寸/持有金额/佣金/资金曲线 批量计算
+
+    与 BackTestEngine 使用相同的交易日历、下单规则(Portfolio._generate_naive_order)
+    和佣金规则(SimulatedOrderExecuteHandler), 输出相同结构的资金曲线, 不访问mongo
+    """
+
+    def __init__(self,
+                 portfolio_id: int,
+                 back_test_name,
+                 description: str,
+                 symbol_type: SymbolTypeEnum,
+                 symbol_list: List[str],
+                 initial_capital: float,
+                 start_date_str: str,
+                 date_format_enum: DateFormatStrEnum,
+                 data_handler: CommonDataHandler,
+                 strategy: AbstractStrategy):
+        """
+        :param back_test_name
+        :param symbol_type
+        :param symbol_list:
+        :param initial_capital:
+        :param start_date_str:
+        :param data_handler:
+        :param strategy: 必须实现 calculate_vectorized_signals
+        """
+        self._portfolio_id = portfolio_id
+        self._name = back_test_name
+        self._description = description
+        self._symbol_type: SymbolTypeEnum = symbol_type
+        self._symbol_list: List[str] = symbol_list
+        self._initial_capital: float = initial_capital
+        self._start_date_str: str = start_date_str
+        self._date_format_enum = date_format_enum
+        self._data_handler: CommonDataHandler = data_handler
+        self._strategy: AbstractStrategy = strategy
+
+        self._signals = 0
+        self._orders = 0
+        self._fills = 0
+        self._elapsed_seconds = 0.0
+
+        self._equity_curve: pandas.DataFrame = None
+
+    def _load_matrices(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        合并交易日历, 构建 日期 × 证券 的收盘价矩阵和信号矩阵
+        每只证券与 BackTestEngine 一致, 从起始日期后的第二个交易日开始
+        """
+        symbol_dates = []
+        symbol_closes = []
+        symbol_signals = []
+        for symbol in self._symbol_list:
+            bar_columns = self._data_handler.get_bar_columns(symbol)
+            signals = self._strategy.calculate_vectorized_signals(bar_columns)
+            if signals is None:
+                raise NotImplementedError("%s does not support vectorized back test"
+                                          % type(self._strategy).__name__)
+
+            first = bar_columns.count_before(self._start_date_str) + 1
+            symbol_dates.append(bar_columns.dates[first:])
+            symbol_closes.append(bar_columns.close[first:])
+            symbol_signals.append(signals[first:])
+
+        all_dates = np.unique(np.concatenate(symbol_dates)) if symbol_dates else np.array([], dtype=str)
+
+        close_matrix = np.full((len(all_dates), len(self._symbol_list)), np.nan)
+        signal_matrix = np.full((len(all_dates), len(self._symbol_list)), None, dtype=object)
+        for j in range(len(self._symbol_list)):
+            rows = np.searchsorted(all_dates, symbol_dates[j])
+            close_matrix[rows, j] = symbol_closes[j]
+            signal_matrix[rows, j] = symbol_signals[j]
+
+        return all_dates, close_matrix, signal_matrix
+
+    def _run_back_test(self):
+        dates, close_matrix, signal_matrix = self._load_matrices()
+        n_dates, n_symbols = close_matrix.shape
+
+        # 下单决策依赖现金, 只能按 日期 -> 证券 顺序逐笔处理, 这里只做标量运算
+        quantity_delta = np.zeros((n_dates, n_symbols), dtype=np.int64)
+        cash_flow = np.zeros(n_dates)
+        commission = np.zeros(n_dates)
+        traded_value = np.zeros(n_dates)
+
+        cash = self._initial_capital
+        quantity = [0] * n_symbols
+        close_rows = close_matrix.tolist()
+        signal_rows = signal_matrix.tolist()
+        for t in range(n_dates):
+            close_row = close_rows[t]
+            for j, signal_type in enumerate(signal_rows[t]):
+                if signal_type is None:
+                    continue
+                self._signals += 1
+
+                price = close_row[j]
+                if signal_type == SignalTypeEnum.UP and quantity[j] == 0:
+                    fill_dir = 1
+                    fill_quantity = int(cash / (ORDER_LOT_SIZE * price)) * ORDER_LOT_SIZE
+                elif signal_type in (SignalTypeEnum.DOWN, SignalTypeEnum.EXIT) and quantity[j] > 0:
+                    fill_dir = -1
+                    fill_quantity = quantity[j]
+                else:
+                    continue
+
+                self._orders += 1
+                self._fills += 1
+                cost = fill_dir * price * fill_quantity
+                fill_commission = SimulatedOrderExecuteHandler.commission(fill_quantity)
+
+                quantity[j] += fill_dir * fill_quantity
+                cash -= (cost + fill_commission)
+                quantity_delta[t, j] += fill_dir * fill_quantity
+                cash_flow[t] -= (cost + fill_commission)
+                commission[t] += fill_commission
+                traded_value[t] += abs(cost)
+
+        # 批量计算头寸、持有金额与资金曲线
+        positions = np.cumsum(quantity_delta, axis=0)
+        # 当日无行情的证券沿用最近一次收盘价估值
+        last_close = pandas.DataFrame(close_matrix).ffill().values
+        market_value = np.where(positions == 0, 0.0, positions * last_close)
+        cash_col = self._initial_capital + np.cumsum(cash_flow)
+        commission_col = np.cumsum(commission)
+
+        curve = pandas.DataFrame(market_value, columns=self._symbol_list)
+        curve['date'] = dates
+        curve['cash'] = cash_col
+        curve['total'] = cash_col + market_value.sum(axis=1)
+        curve['commission'] = commission_col
+        curve['traded_value'] = np.cumsum(traded_value)
+
+        # 与 Portfolio 一致, 第一行为起始日期的初始资金
+        first_row = dict([(s, 0.0) for s in self._symbol_list])
+        first_row.update({'date': self._start_date_str, 'cash': self._initial_capital,
+                          'total': self._initial_capital, 'commission': 0.0, 'traded_value': 0.0})
+        curve = pandas.concat([pandas.DataFrame([first_row], columns=curve.columns), curve], ignore_index=True)
+        curve.set_index('date', inplace=True)
+        self._equity_curve = curve
+
+    def _output_performance(self) -> (StatisticSummary, EquityCurve):
+        """
+        Outputs the strategy performance from the backtest.
+        """
+        statistic_summary, equity_curve = create_statistic_summary(self._equity_curve, self._symbol_type,
+                                                                    self._date_format_enum)
+
+        print("Creating summary stats...")
+        print(statistic_summary.total_return, statistic_summary.sharpe_ratio, statistic_summary.drawn_down_duration,
+              statistic_summary.max_drawn_down)
+
+        print("Creating equity curve...")
+        print(equity_curve.data.tail(10))
+
+        print("Signals: %s" % self._signals)
+        print("Orders: %s" % self._orders)
+        print("Fills: %s" % self._fills)
+        print("Elapsed: %.3fs" % self._elapsed_seconds)
+        print("")
+        return statistic_summary, equity_curve
+
+    def equity_curve(self) -> pandas.DataFrame:
+        return self._equity_curve
+
+    def simulate_trading(self) -> (StatisticSummary, EquityCurve):
+        """
+        Simulates the backtest and outputs portfolios performance.
+        """
+        start_time = time.perf_counter()
+        self._run_back_test()
+        self._elapsed_seconds = time.perf_counter() - start_time
+        return self._output_performance()
@@ -1,8 +1,14 @@
+import numpy as np
+import pandas
+
 from backend.commons.abstract_strategy import AbstractStrategy
+from backend.commons.data_handlers.bar_columns import BarColumns
 from backend.commons.data_handlers.abstract_handler import CommonDataHandler
+from backend.commons.data_handlers.point_in_time import PointInTimeView
 from backend.commons.enums.event_type_enums import EventTypeEnum
 from backend.commons.enums.signal_type_enums import SignalTypeEnum
 from backend.commons.events.base import SignalEvent, MarketEvent
+from backend.commons.indicators import SMA
 
 
 class MovingAverageCrossAbstractStrategy(AbstractStrategy):
@@ -10,8 +16,13 @@ class MovingAverageCrossAbstractStrategy(AbstractStrategy):
     Carries out a basic Moving Average Crossover strategy with a
     short/long simple weighted moving average. Default short/long
     windows are 100/400 periods respectively.
+
+    均线窗口截至 previous_date 的前一根K线(不含 previous_date), 与引入流式指标之前按
+    get_k_data_previous(previous_date) 计算的结果一致
     """
 
+    indicator_lag = 1
+
     def __init__(self, strategy_id: int, data_handler: CommonDataHandler, short_window=10, long_window=20):
         """
         Initialises the buy and hold strategy.
@@ -27,6 +38,9 @@ class MovingAverageCrossAbstractStrategy(AbstractStrategy):
         self.short_window = short_window
         self.long_window = long_window
 
+        self.declare_indicator('short_mav', lambda: SMA(self.short_window))
+        self.declare_indicator('long_mav', lambda: SMA(self.long_window))
+
         # Set to True if a symbol is in the market
         # self.bought = self._calculate_initial_bought()
 
@@ -40,7 +54,7 @@ class MovingAverageCrossAbstractStrategy(AbstractStrategy):
             bought[s] = 'OUT'
         return bought
 
-    def calculate_signals(self, market_event: MarketEvent) -> SignalEvent:
+    def calculate_signals(self, market_event: MarketEvent, data_view: PointInTimeView = None) -> SignalEvent:
         """
         Generates a new set of signals based on the MAC
         SMA with the short window crossing the long window
@@ -48,20 +62,27 @@ class MovingAverageCrossAbstractStrategy(AbstractStrategy):
 
         Parameters
         event - A MarketEvent object.
+        data_view - 当前时点可见的历史数据; 均线由 update_indicators 从同一视图输入, 不读取 data_handler 的历史
         """
-        if market_event.event_type() != EventTypeEnum.MARKET:
+        if market_event.event_type != EventTypeEnum.MARKET:
             return None
 
-        date: str = market_event.previous_date
-        short_df = self.data_handler.get_k_data_previous(market_event.symbol(), date, self.short_window)
-        long_df = self.data_handler.get_k_data_previous(market_event.symbol(), date, self.long_window)
+        # 截至 previous_date 前一根K线的均线, 由引擎在调用前更新
+        short_mav = self.indicators.value(market_event.symbol, 'short_mav')
+        long_mav = self.indicators.value(market_event.symbol, 'long_mav')
+        if short_mav is None or long_mav is None:
+            return SignalEvent(
+                market_event.symbol,
+                market_event.date_key,
+                SignalTypeEnum.DOWN,
+                self.strategy_id,
+                None
+            )
 
-        short_mav = short_df['close'].mean()
-        long_mav = long_df['close'].mean()
         if short_mav > long_mav:
             return SignalEvent(
-                market_event.symbol(),
-                market_event.date_str(),
+                market_event.symbol,
+                market_event.date_key,
                 SignalTypeEnum.UP,
                 self.strategy_id,
                 None
@@ -69,17 +90,31 @@ class MovingAverageCrossAbstractStrategy(AbstractStrategy):
 
         elif short_mav == long_mav:
             return SignalEvent(
-                market_event.symbol(),
-                market_event.date_str(),
+                market_event.symbol,
+                market_event.date_key,
                 SignalTypeEnum.HOLD,
                 self.strategy_id,
                 None
             )
         else:
             return SignalEvent(
-                market_event.symbol(),
-                market_event.date_str(),
+                market_event.symbol,
+                market_event.date_key,
                 SignalTypeEnum.DOWN,
                 self.strategy_id,
                 None
             )
+
+    def calculate_vectorized_signals(self, bar_columns: BarColumns) -> np.ndarray:
+        """
+        与 calculate_signals 等价的向量化实现
+        dates[i] 的信号使用 previous_date(dates[i-1]) 之前的 window 个收盘价, 即 close[i-1-window: i-1]
+        """
+        close = pandas.Series(bar_columns.close)
+        short_mav = close.rolling(self.short_window, min_periods=1).mean().shift(2).values
+        long_mav = close.rolling(self.long_window, min_periods=1).mean().shift(2).values
+
+        signals = np.full(len(close), SignalTypeEnum.DOWN, dtype=object)
+        signals[short_mav > long_mav] = SignalTypeEnum.UP
+        signals[short_mav == long_mav] = SignalTypeEnum.HOLD
+        return signals
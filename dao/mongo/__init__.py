@@ -1,25 +1,175 @@
-from pymongo import MongoClient
+from typing import Any, Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+from dao.mongo.client_pool import MongoConfig, configure, get_client, close_all_clients
+from dao.mongo.command_monitor import CommandStats, COMMAND_MONITOR
+from dao.mongo.indexes import QuerySpec, get_registered_indexes, get_registered_queries, \
+    registered_collections
+
+
+class BulkUpsertResult(object):
+    def __init__(self, inserted: int = 0, modified: int = 0, unchanged: int = 0):
+        """
+
+        :param inserted: 新插入记录数
+        :param modified: 已存在且被修改的记录数
+        :param unchanged: 已存在且内容未变化的记录数
+        """
+        self.inserted: int = inserted
+        self.modified: int = modified
+        self.unchanged: int = unchanged
+
+    def merge(self, other: 'BulkUpsertResult') -> 'BulkUpsertResult':
+        self.inserted += other.inserted
+        self.modified += other.modified
+        self.unchanged += other.unchanged
+        return self
+
+    def __str__(self):
+        return "BulkUpsertResult(inserted=%s, modified=%s, unchanged=%s)" \
+               % (self.inserted, self.modified, self.unchanged)
+
+
+class IndexCheckReport(object):
+    def __init__(self, db_name: str, table_name: str):
+        """
+
+        :param db_name:
+        :param table_name:
+        """
+        self.db_name: str = db_name
+        self.table_name: str = table_name
+        # 缺失或属性不一致的索引名称
+        self.missing_indexes: List[str] = []
+        # 执行计划中出现 COLLSCAN 的查询描述
+        self.collection_scans: List[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing_indexes and not self.collection_scans
+
+    def __str__(self):
+        return "IndexCheckReport(collection=%s.%s, missing_indexes=%s, collection_scans=%s)" \
+               % (self.db_name, self.table_name, self.missing_indexes, self.collection_scans)
 
 
 class MongoBase:
-    def __init__(self, db_name, table_name):
+    """
+    mongo集合句柄, 只持有共享连接池(client_pool)中的 collection 引用, 创建代价很小
+    """
+
+    def __init__(self, db_name, table_name, config: MongoConfig = None):
         self._db_name = db_name
         self._table_name = table_name
+        self._config = config
         self._open_table()
 
     def _open_table(self, ):
-        user_name = ''
-        pass_word = ''
-        host = '127.0.0.1'
-        port = '27017'
-
-        # uri = "mongodb://" + user_name + ":" + pass_word + "@" + host + ":" + port + "/" + self._db_name
-        uri = "mongodb://" + host + ":" + port + "/" + self._db_name
-        self._con = MongoClient(uri, connect=True)
+        self._con = get_client(self._config)
         self._db = self._con[self._db_name]
         self.table = self._db[self._table_name]
 
+    def bulk_upsert(
+            self,
+            records: Iterable[Dict[str, Any]],
+            key_fields: List[str],
+            batch_size: int = 1000
+    ) -> BulkUpsertResult:
+        """
+        按 key_fields 批量 upsert, 每 batch_size 条记录合并为一次无序 bulk_write
+        :param records:
+        :param key_fields: 唯一键字段
+        :param batch_size: 每批写入条数
+        :return: BulkUpsertResult
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must > 0")
+
+        result = BulkUpsertResult()
+        operations = []
+        for record in records:
+            operations.append(UpdateOne(dict([(k, record[k]) for k in key_fields]), {"$set": record}, upsert=True))
+            if len(operations) >= batch_size:
+                result.merge(self._bulk_write(operations))
+                operations = []
+
+        if operations:
+            result.merge(self._bulk_write(operations))
+        return result
+
+    def _bulk_write(self, operations: List[UpdateOne]) -> BulkUpsertResult:
+        write_result = self.table.bulk_write(operations, ordered=False)
+        return BulkUpsertResult(
+            write_result.upserted_count,
+            write_result.modified_count,
+            write_result.matched_count - write_result.modified_count
+        )
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        创建当前集合登记的全部索引, create_index 是幂等的
+        :return: 索引名称
+        """
+        return [
+            self.table.create_index(spec.keys, unique=spec.unique, name=spec.name)
+            for spec in get_registered_indexes(self._db_name, self._table_name)
+        ]
+
+    def check_indexes(self, query_specs: List[QuerySpec] = None) -> IndexCheckReport:
+        """
+        检查登记的索引是否存在, 以及典型查询是否退化为全表扫描
+        :param query_specs: 需要检查执行计划的查询, 默认使用登记的查询
+        :return: IndexCheckReport
+        """
+        report = IndexCheckReport(self._db_name, self._table_name)
+
+        existing = dict([
+            (tuple((k, int(d)) for k, d in info['key']), info.get('unique', False))
+            for info in self.table.index_information().values()
+        ])
+        for spec in get_registered_indexes(self._db_name, self._table_name):
+            keys = tuple((k, int(d)) for k, d in spec.keys)
+            if keys not in existing or (spec.unique and not existing[keys]):
+                report.missing_indexes.append(spec.name)
+
+        if query_specs is None:
+            query_specs = get_registered_queries(self._db_name, self._table_name)
+        for query_spec in query_specs:
+            cursor = self.table.find(query_spec.query_filter)
+            if query_spec.sort:
+                cursor = cursor.sort(query_spec.sort)
+            plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+            if self._has_stage(plan, 'COLLSCAN'):
+                report.collection_scans.append(query_spec.description)
+
+        return report
+
+    @staticmethod
+    def _has_stage(plan: Dict[str, Any], stage: str) -> bool:
+        if plan.get('stage') == stage:
+            return True
+        children = [plan[k] for k in ('inputStage', 'queryPlan') if k in plan]
+        children.extend(plan.get('inputStages', []))
+        return any(MongoBase._has_stage(child, stage) for child in children)
+
     def close(self):
-        self._con.close()
+        """
+        连接由进程内所有 MongoBase 共享, 这里只释放引用; 关闭连接使用 close_all_clients
+        """
+        self.table = None
+
+
+def ensure_registered_indexes() -> Dict[str, List[str]]:
+    """
+    启动时调用, 为所有登记的集合创建索引
+    """
+    result = {}
+    for db_name, table_name in registered_collections():
+        mongo = MongoBase(db_name, table_name)
+        result["%s.%s" % (db_name, table_name)] = mongo.ensure_indexes()
+    return result
 
 
+def check_registered_indexes() -> List[IndexCheckReport]:
+    return [MongoBase(db_name, table_name).check_indexes() for db_name, table_name in registered_collections()]
@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from pymongo import MongoClient
+
+from dao.mongo.command_monitor import COMMAND_MONITOR
+
+
+class MongoConfig(object):
+    def __init__(
+            self,
+            uri: str = "mongodb://127.0.0.1:27017",
+            max_pool_size: int = 100,
+            min_pool_size: int = 0,
+            connect_timeout_ms: int = 20000,
+            server_selection_timeout_ms: int = 30000,
+            socket_timeout_ms: Optional[int] = None
+    ):
+        """
+
+        :param uri: mongodb://[user:password@]host:port
+        :param max_pool_size: 连接池最大连接数
+        :param min_pool_size: 连接池最小连接数
+        :param connect_timeout_ms: 建立连接超时
+        :param server_selection_timeout_ms: 选择服务器超时
+        :param socket_timeout_ms: 读写超时, None 表示不超时
+        """
+        self.uri: str = uri
+        self.max_pool_size: int = max_pool_size
+        self.min_pool_size: int = min_pool_size
+        self.connect_timeout_ms: int = connect_timeout_ms
+        self.server_selection_timeout_ms: int = server_selection_timeout_ms
+        self.socket_timeout_ms: Optional[int] = socket_timeout_ms
+
+    @staticmethod
+    def from_env() -> 'MongoConfig':
+        """
+        从环境变量读取配置, 未设置的项使用默认值
+        QUANT_MONGO_URI, QUANT_MONGO_MAX_POOL_SIZE, QUANT_MONGO_MIN_POOL_SIZE,
+        QUANT_MONGO_CONNECT_TIMEOUT_MS, QUANT_MONGO_SERVER_SELECTION_TIMEOUT_MS, QUANT_MONGO_SOCKET_TIMEOUT_MS
+        """
+        default = MongoConfig()
+
+        def get_int(name: str, default_val: Optional[int]) -> Optional[int]:
+            val = os.environ.get(name)
+            return int(val) if val else default_val
+
+        return MongoConfig(
+            os.environ.get("QUANT_MONGO_URI") or default.uri,
+            get_int("QUANT_MONGO_MAX_POOL_SIZE", default.max_pool_size),
+            get_int("QUANT_MONGO_MIN_POOL_SIZE", default.min_pool_size),
+            get_int("QUANT_MONGO_CONNECT_TIMEOUT_MS", default.connect_timeout_ms),
+            get_int("QUANT_MONGO_SERVER_SELECTION_TIMEOUT_MS", default.server_selection_timeout_ms),
+            get_int("QUANT_MONGO_SOCKET_TIMEOUT_MS", default.socket_timeout_ms)
+        )
+
+
+_lock = threading.Lock()
+_default_config: Optional[MongoConfig] = None
+# map((pid, uri) -> MongoClient), MongoClient 不能跨 fork 使用, 因此按进程区分
+_clients: Dict[Tuple[int, str], MongoClient] = {}
+
+
+def configure(config: MongoConfig):
+    """
+    设置进程默认配置, 需在第一次创建 MongoBase 之前调用
+    """
+    global _default_config
+    with _lock:
+        _default_config = config
+
+
+def get_default_config() -> MongoConfig:
+    global _default_config
+    with _lock:
+        if _default_config is None:
+            _default_config = MongoConfig.from_env()
+        return _default_config
+
+
+def get_client(config: MongoConfig = None) -> MongoClient:
+    """
+    获取共享的 MongoClient, 同一进程内相同 uri 只创建一次
+    """
+    if config is None:
+        config = get_default_config()
+
+    key = (os.getpid(), config.uri)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(
+                config.uri,
+                maxPoolSize=config.max_pool_size,
+                minPoolSize=config.min_pool_size,
+                connectTimeoutMS=config.connect_timeout_ms,
+                serverSelectionTimeoutMS=config.server_selection_timeout_ms,
+                socketTimeoutMS=config.socket_timeout_ms,
+                connect=False,
+                event_listeners=[COMMAND_MONITOR]
+            )
+            _clients[key] = client
+        return client
+
+
+def close_all_clients():
+    """
+    进程退出前关闭当前进程创建的全部连接
+    """
+    pid = os.getpid()
+    with _lock:
+        for key in [k for k in _clients.keys() if k[0] == pid]:
+            _clients.pop(key).close()
@@ -0,0 +1,132 @@
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from pymongo import monitoring
+
+try:
+    from bson import encode as _bson_encode
+except ImportError:  # pymongo < 3.9
+    from bson import BSON
+
+    _bson_encode = BSON.encode
+
+
+def bson_size(document: Mapping[str, Any]) -> int:
+    try:
+        return len(_bson_encode(document))
+    except Exception:
+        return 0
+
+
+class CommandStats(object):
+    """
+    mongo命令统计: 按命令名(find/insert/update/...)累计次数, 失败次数, 请求/响应字节数及服务端耗时,
+    并按 scope_fn 返回的作用域(例如当前处理阶段)汇总
+    订阅 COMMAND_MONITOR 后才开始统计, 字节数通过重新编码命令/响应得到, 只在统计时产生开销
+    """
+
+    def __init__(self, scope_fn: Callable[[], Optional[str]] = None):
+        """
+
+        :param scope_fn: 在发起命令的线程中调用, 返回命令所属的作用域, 为None时不按作用域汇总
+        """
+        self._scope_fn: Optional[Callable[[], Optional[str]]] = scope_fn
+        self._lock = threading.Lock()
+        # map(command_name -> map(field -> value))
+        self._commands: Dict[str, Dict[str, int]] = {}
+        # map(scope -> map(field -> value))
+        self._scopes: Dict[str, Dict[str, int]] = {}
+        # map(request_id -> scope), 响应可能在其他线程回调, 按请求记录作用域
+        self._request_scopes: Dict[int, str] = {}
+
+    @staticmethod
+    def _fields_of(table: Dict[str, Dict[str, int]], key: str) -> Dict[str, int]:
+        fields = table.get(key)
+        if fields is None:
+            fields = {'count': 0, 'failed': 0, 'request_bytes': 0, 'reply_bytes': 0, 'duration_micros': 0}
+            table[key] = fields
+        return fields
+
+    def _tables_of(self, scope: Optional[str]) -> List[Dict[str, Dict[str, int]]]:
+        return [self._commands] if scope is None else [self._commands, self._scopes]
+
+    def on_started(self, request_id: int, command_name: str, request_bytes: int):
+        scope = self._scope_fn() if self._scope_fn is not None else None
+        with self._lock:
+            if scope is not None:
+                self._request_scopes[request_id] = scope
+            for table, key in zip(self._tables_of(scope), [command_name, scope]):
+                fields = self._fields_of(table, key)
+                fields['count'] += 1
+                fields['request_bytes'] += request_bytes
+
+    def on_finished(self, request_id: int, command_name: str, reply_bytes: int, duration_micros: int,
+                    failed: bool):
+        with self._lock:
+            scope = self._request_scopes.pop(request_id, None)
+            for table, key in zip(self._tables_of(scope), [command_name, scope]):
+                fields = self._fields_of(table, key)
+                fields['reply_bytes'] += reply_bytes
+                fields['duration_micros'] += duration_micros
+                if failed:
+                    fields['failed'] += 1
+
+    def total(self, field: str = 'count') -> int:
+        with self._lock:
+            return sum([fields[field] for fields in self._commands.values()])
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        :return: {'commands': map(command_name -> 统计), 'scopes': map(scope -> 统计)}
+        """
+        with self._lock:
+            return {
+                'commands': dict([(name, dict(fields)) for name, fields in self._commands.items()]),
+                'scopes': dict([(name, dict(fields)) for name, fields in self._scopes.items()])
+            }
+
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """
+    进程内唯一的命令监听器, 由 client_pool 在创建 MongoClient 时注册,
+    没有订阅者时回调直接返回
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[CommandStats] = []
+
+    def subscribe(self, stats: CommandStats):
+        with self._lock:
+            if stats not in self._subscribers:
+                self._subscribers = self._subscribers + [stats]
+
+    def unsubscribe(self, stats: CommandStats):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not stats]
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        request_bytes = bson_size(event.command)
+        for stats in subscribers:
+            stats.on_started(event.request_id, event.command_name, request_bytes)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        reply_bytes = bson_size(event.reply)
+        for stats in subscribers:
+            stats.on_finished(event.request_id, event.command_name, reply_bytes, event.duration_micros, False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        for stats in subscribers:
+            stats.on_finished(event.request_id, event.command_name, 0, event.duration_micros, True)
+
+
+COMMAND_MONITOR: MongoCommandMonitor = MongoCommandMonitor()
@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import pymongo
+
+
+class IndexSpec(object):
+    def __init__(self, keys: List[Tuple[str, int]], unique: bool = False, name: Optional[str] = None):
+        """
+
+        :param keys: 索引字段, 例如 [('symbol', pymongo.ASCENDING), ('date', pymongo.ASCENDING)]
+        :param unique: 是否唯一索引
+        :param name: 索引名称, 默认与mongo命名规则一致 symbol_1_date_1
+        """
+        self.keys: List[Tuple[str, int]] = keys
+        self.unique: bool = unique
+        self.name: str = name if name is not None else "_".join(["%s_%s" % (k, d) for k, d in keys])
+
+    def __str__(self):
+        return "IndexSpec(name=%s, keys=%s, unique=%s)" % (self.name, self.keys, self.unique)
+
+
+class QuerySpec(object):
+    def __init__(self, description: str, query_filter: Dict[str, Any], sort: List[Tuple[str, int]] = None):
+        """
+        用于检查是否走索引的典型查询
+
+        :param description: 查询描述
+        :param query_filter: 查询条件
+        :param sort: 排序字段
+        """
+        self.description: str = description
+        self.query_filter: Dict[str, Any] = query_filter
+        self.sort: List[Tuple[str, int]] = sort
+
+
+# map((db_name, table_name) -> 必须存在的索引)
+_INDEX_REGISTRY: Dict[Tuple[str, str], List[IndexSpec]] = {}
+# map((db_name, table_name) -> 需要检查执行计划的查询)
+_QUERY_REGISTRY: Dict[Tuple[str, str], List[QuerySpec]] = {}
+
+
+def register_indexes(db_name: str, table_name: str, index_specs: List[IndexSpec],
+                     query_specs: List[QuerySpec] = None):
+    _INDEX_REGISTRY.setdefault((db_name, table_name), []).extend(index_specs)
+    if query_specs:
+        _QUERY_REGISTRY.setdefault((db_name, table_name), []).extend(query_specs)
+
+
+def get_registered_indexes(db_name: str, table_name: str) -> List[IndexSpec]:
+    return _INDEX_REGISTRY.get((db_name, table_name), [])
+
+
+def get_registered_queries(db_name: str, table_name: str) -> List[QuerySpec]:
+    return _QUERY_REGISTRY.get((db_name, table_name), [])
+
+
+def registered_collections() -> List[Tuple[str, str]]:
+    return sorted(_INDEX_REGISTRY.keys())
+
+
+# 历史K线: 按 (symbol, date区间) 查询并按 date 排序
+register_indexes(
+    "stock", "xueqiu",
+    [IndexSpec([('symbol', pymongo.ASCENDING), ('date', pymongo.ASCENDING)], unique=True)],
+    [QuerySpec("k data by symbol and date range",
+               {"symbol": "SH510300", "date": {"$gte": "2000-01-01", "$lte": "2019-03-15"}},
+               [('date', pymongo.ASCENDING)])]
+)
+
+# 证券投资组合账户: 按 portfolio_id 更新
+for _table_name in ("back_test", "online"):
+    register_indexes(
+        "portfolio", _table_name,
+        [IndexSpec([('portfolio_id', pymongo.ASCENDING)], unique=True)],
+        [QuerySpec("portfolio by portfolio_id", {"portfolio_id": 1})]
+    )
+
+# 证券投资组合分桶历史记录: 按 portfolio_id 及 bucket_start 区间读取
+for _table_name in ("back_test_bucket", "online_bucket"):
+    register_indexes(
+        "portfolio", _table_name,
+        [IndexSpec([('portfolio_id', pymongo.ASCENDING), ('bucket_start', pymongo.ASCENDING)], unique=True)],
+        [QuerySpec("portfolio buckets by bucket_start range",
+                   {"portfolio_id": 1, "bucket_start": {"$gte": "2019-01-01", "$lte": "2019-03-15"}},
+                   [('bucket_start', pymongo.ASCENDING)])]
+    )
@@ -1,17 +1,26 @@
 import requests
 from requests.cookies import RequestsCookieJar
 
+XUEQIU_HOME_URL = "https://xueqiu.com"
 
-def get_cookies() -> RequestsCookieJar:
-    headers = {
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Origin": "https://xueqiu.com",
-        "Accept-Encoding": "br, gzip, deflate",
-        "Host": "xueqiu.com",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_3) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/12.0.3 Safari/605.1.15",
-        "Accept-Language": "en-us",
-        "Referer": "https://xueqiu.com/",
-        "Connection": "keep-alive"
-    }
+BROWSER_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Origin": "https://xueqiu.com",
+    "Accept-Encoding": "br, gzip, deflate",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_3) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/12.0.3 Safari/605.1.15",
+    "Accept-Language": "en-us",
+    "Referer": "https://xueqiu.com/",
+    "Connection": "keep-alive"
+}
 
-    return requests.get(url="https://xueqiu.com", headers=headers, timeout=30).cookies
+
+def get_cookies(session: requests.Session = None, url: str = XUEQIU_HOME_URL) -> RequestsCookieJar:
+    """
+    访问首页获取cookie
+    :param session: 传入时复用其连接池, 并且cookie会保存在该session中
+    :param url: 首页地址
+    """
+    # Host 由 url 决定, 不单独指定
+    if session is None:
+        return requests.get(url=url, headers=BROWSER_HEADERS, timeout=30).cookies
+    return session.get(url=url, headers=BROWSER_HEADERS, timeout=30).cookies
@@ -0,0 +1,246 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas
+import requests
+from requests.adapters import HTTPAdapter
+
+from data_crawler.xueqiu import BROWSER_HEADERS, XUEQIU_HOME_URL, get_cookies
+
+KLINE_BASE_URL = "https://stock.xueqiu.com"
+KLINE_PATH = "/v5/stock/chart/kline.json"
+KLINE_COLUMNS = ['symbol', 'date', 'volume', 'open', 'high', 'low', 'close', 'chg', 'percent']
+
+# 行情时间戳为北京时间
+_CHINA_TZ = datetime.timezone(datetime.timedelta(hours=8))
+_DATE_FORMAT = '%Y-%m-%d'
+
+
+class TokenBucket(object):
+    """
+    令牌桶限流, 线程安全
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量(允许的突发请求数), 默认等于 rate
+        """
+        self._rate: float = float(rate)
+        self._capacity: float = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens: float = self._capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        阻塞直到取得令牌
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class TransientHttpError(Exception):
+    """
+    可重试的错误: 429 / 5xx
+    """
+    pass
+
+
+class DownloadResult(object):
+    def __init__(self, symbol: str, start_date_str: str, end_date_str: str,
+                 data: Optional[pandas.DataFrame] = None, error: Optional[BaseException] = None, attempts: int = 0):
+        """
+
+        :param symbol:
+        :param start_date_str:
+        :param end_date_str:
+        :param data: K线, 失败时为None
+        :param error: 重试耗尽后的最后一个错误
+        :param attempts: 请求次数
+        """
+        self.symbol: str = symbol
+        self.start_date_str: str = start_date_str
+        self.end_date_str: str = end_date_str
+        self.data: Optional[pandas.DataFrame] = data
+        self.error: Optional[BaseException] = error
+        self.attempts: int = attempts
+        # 写入结果, 由 download 的 writer 返回
+        self.write_result = None
+
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __str__(self):
+        return "DownloadResult(symbol=%s, range=%s~%s, rows=%s, attempts=%s, error=%s)" % (
+            self.symbol, self.start_date_str, self.end_date_str,
+            None if self.data is None else len(self.data), self.attempts, self.error)
+
+
+class KlineDownloader(object):
+    """
+    并发K线下载器
+    固定大小的线程池共用一个带连接池的 requests.Session, 令牌桶限制全局请求速率,
+    网络错误/429/5xx 按指数退避重试; 每只证券下载完成后立即交给 writer 写入
+    get_his_k_data 与在线接口签名一致, 可作为 StockXueqiuData 的在线数据源
+    """
+
+    def __init__(
+            self,
+            base_url: str = KLINE_BASE_URL,
+            cookie_url: Optional[str] = XUEQIU_HOME_URL,
+            max_workers: int = 4,
+            rate_per_second: float = 5.0,
+            burst: float = None,
+            max_retries: int = 3,
+            backoff_seconds: float = 0.5,
+            timeout: float = 30.0,
+            session: requests.Session = None
+    ):
+        """
+
+        :param base_url: K线接口地址, 测试时可指向本地服务
+        :param cookie_url: 获取cookie的首页地址, 为None时不获取
+        :param max_workers: 并发线程数
+        :param rate_per_second: 全局每秒请求数
+        :param burst: 允许的突发请求数, 默认等于 rate_per_second
+        :param max_retries: 失败后的最大重试次数
+        :param backoff_seconds: 第n次重试前等待 backoff_seconds * 2^(n-1) 秒
+        :param timeout: 单次请求超时
+        :param session: 复用的 session, 默认新建
+        """
+        self._base_url: str = base_url.rstrip('/')
+        self._cookie_url: Optional[str] = cookie_url
+        self._max_workers: int = max(1, max_workers)
+        self._bucket: TokenBucket = TokenBucket(rate_per_second, burst)
+        self._max_retries: int = max(0, max_retries)
+        self._backoff_seconds: float = backoff_seconds
+        self._timeout: float = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self._max_workers, pool_maxsize=self._max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        session.headers.update(BROWSER_HEADERS)
+        self._session: requests.Session = session
+        self._cookie_lock = threading.Lock()
+        self._has_cookies = False
+
+    def _ensure_cookies(self):
+        if self._cookie_url is None or self._has_cookies:
+            return
+        with self._cookie_lock:
+            if not self._has_cookies:
+                self._bucket.acquire()
+                get_cookies(self._session, self._cookie_url)
+                self._has_cookies = True
+
+    @staticmethod
+    def _to_millis(date_str: str) -> int:
+        d = datetime.datetime.strptime(date_str, _DATE_FORMAT).replace(tzinfo=_CHINA_TZ)
+        return int(d.timestamp() * 1000)
+
+    def _request(self, symbol: str, start_date_str: str, end_date_str: str) -> pandas.DataFrame:
+        # 从 end 的次日零点向前取, 条数按自然日数估计, 多取的部分在解析时过滤
+        end_next = (datetime.datetime.strptime(end_date_str, _DATE_FORMAT)
+                    + datetime.timedelta(days=1)).strftime(_DATE_FORMAT)
+        days = (datetime.datetime.strptime(end_next, _DATE_FORMAT)
+                - datetime.datetime.strptime(start_date_str, _DATE_FORMAT)).days
+        params = {
+            "symbol": symbol,
+            "begin": self._to_millis(end_next),
+            "period": "day",
+            "type": "before",
+            "count": -max(1, days),
+            "indicator": "kline"
+        }
+
+        self._bucket.acquire()
+        response = self._session.get(self._base_url + KLINE_PATH, params=params, timeout=self._timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientHttpError("HTTP %s for %s" % (response.status_code, symbol))
+        response.raise_for_status()
+        return self.parse_kline(symbol, response.json(), start_date_str, end_date_str)
+
+    @staticmethod
+    def parse_kline(symbol: str, body: Dict, start_date_str: str, end_date_str: str) -> pandas.DataFrame:
+        """
+        解析接口返回 {"data": {"column": [...], "item": [[...], ...]}, "error_code": 0}
+        :return: 列为 KLINE_COLUMNS 的 DataFrame, 只保留 [start_date_str, end_date_str] 内的记录
+        """
+        data = body.get("data") or {}
+        columns = data.get("column") or []
+        items = data.get("item") or []
+        df = pandas.DataFrame(items, columns=columns)
+        if df.empty or "timestamp" not in df.columns:
+            return pandas.DataFrame(columns=KLINE_COLUMNS)
+
+        df["date"] = [datetime.datetime.fromtimestamp(ts / 1000.0, _CHINA_TZ).strftime(_DATE_FORMAT)
+                      for ts in df["timestamp"]]
+        df["symbol"] = symbol
+        for name in KLINE_COLUMNS:
+            if name not in df.columns:
+                df[name] = None
+        df = df[(df["date"] >= start_date_str) & (df["date"] <= end_date_str)]
+        return df[KLINE_COLUMNS].reset_index(drop=True)
+
+    def _fetch_with_retry(self, symbol: str, start_date_str: str, end_date_str: str) -> DownloadResult:
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self._ensure_cookies()
+                data = self._request(symbol, start_date_str, end_date_str)
+                return DownloadResult(symbol, start_date_str, end_date_str, data, None, attempts)
+            except (requests.ConnectionError, requests.Timeout, TransientHttpError) as e:
+                if attempts > self._max_retries:
+                    return DownloadResult(symbol, start_date_str, end_date_str, None, e, attempts)
+                time.sleep(self._backoff_seconds * (2 ** (attempts - 1)))
+            except Exception as e:
+                return DownloadResult(symbol, start_date_str, end_date_str, None, e, attempts)
+
+    def get_his_k_data(self, symbol: str, start_date_str: str, end_date_str: str) -> pandas.DataFrame:
+        """
+        下载单只证券, 重试耗尽后抛出最后一个错误
+        """
+        result = self._fetch_with_retry(symbol, start_date_str, end_date_str)
+        if result.error is not None:
+            raise result.error
+        return result.data
+
+    def download(
+            self,
+            tasks: List[Tuple[str, str, str]],
+            writer: Callable[[pandas.DataFrame], object] = None
+    ) -> List[DownloadResult]:
+        """
+        并发下载
+        :param tasks: [(symbol, start_date_str, end_date_str)]
+        :param writer: 每个成功的下载结果在调用线程中立即写入, 例如 StockXueqiuData.bulk_upsert_k_data
+        :return: 按完成顺序排列的下载结果
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            futures = [executor.submit(self._fetch_with_retry, symbol, start, end) for symbol, start, end in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                if result.ok() and writer is not None:
+                    result.write_result = writer(result.data)
+                results.append(result)
+        return results
+
+    def close(self):
+        self._session.close()
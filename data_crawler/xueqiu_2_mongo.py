@@ -1,18 +1,39 @@
+import datetime
 import json
 import typing
-from typing import List
+from typing import List, Optional, Tuple
 
+import numpy as np
 import pandas
 import pymongo
 
-from dao.mongo import MongoBase
+from dao.mongo import MongoBase, BulkUpsertResult, ensure_registered_indexes
+from data_crawler.xueqiu.downloader import KlineDownloader
 from data_crawler.xueqiu.online_api import StockApiXueqiu
 
 
+# 全量同步的起始日期
+FULL_SYNC_START_DATE_STR = '2000-01-01'
+_DATE_FORMAT = '%Y-%m-%d'
+
+
+def _shift_date_str(date_str: str, days: int) -> str:
+    return (datetime.datetime.strptime(date_str, _DATE_FORMAT) + datetime.timedelta(days=days)).strftime(_DATE_FORMAT)
+
+
+def _today_str() -> str:
+    return datetime.date.today().strftime(_DATE_FORMAT)
+
+
 class StockXueqiuData:
-    def __init__(self):
+    def __init__(self, online_api=None):
+        """
+
+        :param online_api: 在线数据源, 需要提供 get_his_k_data(symbol, start_date_str, end_date_str),
+                           默认 StockApiXueqiu, 也可以使用 KlineDownloader
+        """
         self._mongo = MongoBase("stock", "xueqiu")
-        self._online_api = StockApiXueqiu()
+        self._online_api = online_api if online_api is not None else StockApiXueqiu()
         self._default_columns = ['symbol', 'date', 'volume', 'open', 'high', 'low', 'close', 'chg', 'percent']
 
     def get_his_k_data(
@@ -38,12 +59,9 @@ class StockXueqiuData:
             return_columns = self._default_columns
 
         if force_update:
-            tmp_df = self._online_api.get_his_k_data(symbol, start_date_str, end_date_str)
-            data_list = json.loads(tmp_df.to_json(orient='records'))
-            for record in data_list:
-                self._mongo.table.update({"symbol": record['symbol'], "date": record['date']}, {"$set": record},
-                                         upsert=True)
-            return tmp_df
+            # 只从在线接口补齐mongo中缺失的区间, 已有数据不重写
+            self.sync_k_data_incremental(symbol, end_date_str, start_date_str or FULL_SYNC_START_DATE_STR,
+                                         backfill=True)
 
         if start_date_str is None:
             start_date_str = ""
@@ -62,6 +80,252 @@ class StockXueqiuData:
         result_df.set_index(['date'], inplace=True)
         return result_df.sort_index(ascending=True)
 
+    def get_his_k_data_many(
+            self,
+            symbols: List[str],
+            start_date_str: str,
+            end_date_str: str,
+            return_columns: List[str] = None,
+            as_frame: bool = True,
+            batch_size: int = 10000
+    ) -> typing.Union[pandas.DataFrame, typing.Dict[str, typing.Dict[str, np.ndarray]]]:
+        """
+        一次 $in 查询获取多只证券的历史数据, 游标按 batch_size 分批拉取
+        :param symbols:
+        :param start_date_str:
+        :param end_date_str:
+        :param return_columns: default ['symbol', 'date', 'volume', 'open', 'high', 'low', 'close', 'chg', 'percent']
+        :param as_frame: True 返回以 (symbol, date) 为索引的 DataFrame,
+                         False 返回 map(symbol -> map(column -> np.ndarray))
+        :param batch_size: 游标每批拉取记录数
+        :return:
+        """
+        if return_columns is None:
+            return_columns = self._default_columns
+        if start_date_str is None:
+            start_date_str = ""
+        if end_date_str is None:
+            end_date_str = ""
+
+        cursor = self._mongo.table.find(filter={
+            "symbol": {"$in": list(symbols)},
+            "date": {"$gte": start_date_str, "$lte": end_date_str}
+        }, projection=dict([(k, True) for k in set(return_columns) | {'symbol', 'date'}] + [("_id", False)])) \
+            .sort([('symbol', pymongo.ASCENDING), ('date', pymongo.ASCENDING)]) \
+            .batch_size(batch_size)
+
+        if as_frame:
+            frame_columns = ['symbol', 'date'] + [k for k in return_columns if k not in ('symbol', 'date')]
+            parsed_data = [self._parse(record, frame_columns) for record in cursor]
+            result_df = pandas.DataFrame(data=parsed_data, columns=frame_columns)
+            result_df.set_index(['symbol', 'date'], inplace=True)
+            return result_df
+
+        # map(symbol -> map(column -> values))
+        column_lists: typing.Dict[str, typing.Dict[str, List[typing.Any]]] = dict(
+            [(s, dict([(k, []) for k in return_columns])) for s in symbols]
+        )
+        for record in cursor:
+            lists = column_lists[record['symbol']]
+            for k in return_columns:
+                lists[k].append(record.get(k))
+
+        return dict([
+            (s, dict([(k, np.asarray(v)) for k, v in lists.items()]))
+            for s, lists in column_lists.items()
+        ])
+
+    def sync_k_data(
+            self,
+            symbol: str,
+            start_date_str: str,
+            end_date_str: str,
+            batch_size: int = 1000
+    ) -> BulkUpsertResult:
+        """
+        从在线接口爬取数据并批量写入mongo
+        :param symbol:
+        :param start_date_str:
+        :param end_date_str:
+        :param batch_size: 每批写入条数
+        :return: BulkUpsertResult
+        """
+        tmp_df = self._online_api.get_his_k_data(symbol, start_date_str, end_date_str)
+        return self.bulk_upsert_k_data(tmp_df, batch_size)
+
+    def get_watermark(self, symbol: str) -> Optional[str]:
+        """
+        mongo中该证券最新的K线日期, 没有数据时返回None
+        按 (symbol, date) 索引倒序取一条
+        """
+        record = self._mongo.table.find_one({"symbol": symbol}, projection={"_id": False, "date": True},
+                                            sort=[('date', pymongo.DESCENDING)])
+        return None if record is None else record['date']
+
+    def get_low_watermark(self, symbol: str) -> Optional[str]:
+        """
+        mongo中该证券最早的K线日期, 没有数据时返回None
+        """
+        record = self._mongo.table.find_one({"symbol": symbol}, projection={"_id": False, "date": True},
+                                            sort=[('date', pymongo.ASCENDING)])
+        return None if record is None else record['date']
+
+    def get_stored_dates(self, symbol: str) -> List[str]:
+        cursor = self._mongo.table.find({"symbol": symbol}, projection={"_id": False, "date": True}) \
+            .sort('date', pymongo.ASCENDING)
+        return [record['date'] for record in cursor]
+
+    def missing_ranges(
+            self,
+            symbol: str,
+            end_date_str: str = None,
+            start_date_str: str = FULL_SYNC_START_DATE_STR,
+            backfill: bool = False
+    ) -> List[Tuple[str, str]]:
+        """
+        需要从在线接口获取的日期区间: 最新K线(高水位)之后的部分
+        :param end_date_str: 默认今天
+        :param start_date_str: 没有数据时从该日期开始
+        :param backfill: 是否同时获取 start_date_str 到最早K线之前的部分
+        :return: [(start_date_str, end_date_str)] 闭区间
+        """
+        end_date_str = end_date_str or _today_str()
+        high = self.get_watermark(symbol)
+        if high is None:
+            return [(start_date_str, end_date_str)] if start_date_str <= end_date_str else []
+
+        ranges = []
+        low = self.get_low_watermark(symbol)
+        if backfill and start_date_str < low:
+            ranges.append((start_date_str, _shift_date_str(low, -1)))
+        next_date_str = _shift_date_str(high, 1)
+        if next_date_str <= end_date_str:
+            ranges.append((next_date_str, end_date_str))
+        return ranges
+
+    def find_gaps(
+            self,
+            symbol: str,
+            reference_dates: List[str] = None,
+            max_calendar_days: int = 15
+    ) -> List[Tuple[str, str]]:
+        """
+        检测已存储历史中间的缺口
+        :param reference_dates: 参考交易日历(例如指数的K线日期), 给定时已存储区间内缺少的参考日期即为缺口
+        :param max_calendar_days: 未给定参考日历时, 相邻两条K线间隔超过该自然日数视为缺口(长假约9天)
+        :return: [(start_date_str, end_date_str)] 缺口闭区间
+        """
+        stored = self.get_stored_dates(symbol)
+        if len(stored) < 2:
+            return []
+
+        gaps = []
+        if reference_dates is not None:
+            stored_set = set(stored)
+            gap_start = None
+            previous = None
+            for d in sorted(reference_dates):
+                if d < stored[0] or d > stored[-1]:
+                    continue
+                if d not in stored_set:
+                    gap_start = d if gap_start is None else gap_start
+                elif gap_start is not None:
+                    gaps.append((gap_start, previous))
+                    gap_start = None
+                previous = d
+            return gaps
+
+        for previous, current in zip(stored[:-1], stored[1:]):
+            days = (datetime.datetime.strptime(current, _DATE_FORMAT)
+                    - datetime.datetime.strptime(previous, _DATE_FORMAT)).days
+            if days > max_calendar_days:
+                gaps.append((_shift_date_str(previous, 1), _shift_date_str(current, -1)))
+        return gaps
+
+    def watermark_changed(self, symbol: str, watermark: str) -> bool:
+        """
+        重新获取高水位那一条K线, 收盘价与mongo中不一致时返回True
+        在线数据为前复权(type=before), 除权除息后历史价格整体调整, 只同步高水位之后的部分会与已存储历史不连续
+        :param watermark: get_watermark 返回的最新K线日期
+        """
+        record = self._mongo.table.find_one({"symbol": symbol, "date": watermark},
+                                            projection={"_id": False, "close": True})
+        if record is None or record.get('close') is None:
+            return False
+
+        online_df = self._online_api.get_his_k_data(symbol, watermark, watermark)
+        if online_df is None or online_df.empty:
+            return False
+        online_df = online_df[online_df['date'] == watermark]
+        if online_df.empty or online_df['close'].iloc[-1] is None:
+            return False
+        return not np.isclose(float(online_df['close'].iloc[-1]), float(record['close']))
+
+    def ranges_to_sync(
+            self,
+            symbol: str,
+            end_date_str: str = None,
+            start_date_str: str = FULL_SYNC_START_DATE_STR,
+            fill_gaps: bool = False,
+            reference_dates: List[str] = None,
+            backfill: bool = False,
+            check_watermark: bool = True
+    ) -> List[Tuple[str, str]]:
+        """
+        增量同步需要获取的全部区间, 参数见 sync_k_data_incremental
+        """
+        high = self.get_watermark(symbol) if check_watermark else None
+        if high is not None and self.watermark_changed(symbol, high):
+            # 已存储历史已被复权调整, 重新同步整个区间
+            low = self.get_low_watermark(symbol)
+            range_start = min(start_date_str, low) if backfill else low
+            return [(range_start, end_date_str or _today_str())]
+
+        ranges = self.missing_ranges(symbol, end_date_str, start_date_str, backfill)
+        if fill_gaps:
+            ranges.extend(self.find_gaps(symbol, reference_dates))
+        return sorted(ranges)
+
+    def sync_k_data_incremental(
+            self,
+            symbol: str,
+            end_date_str: str = None,
+            start_date_str: str = FULL_SYNC_START_DATE_STR,
+            fill_gaps: bool = False,
+            reference_dates: List[str] = None,
+            batch_size: int = 1000,
+            backfill: bool = False,
+            check_watermark: bool = True
+    ) -> BulkUpsertResult:
+        """
+        按高水位增量同步: 只获取mongo中缺失的区间
+        高水位那一条K线的收盘价与在线数据不一致(复权调整)时重新同步整个区间
+        :param end_date_str: 默认今天
+        :param start_date_str: 没有数据时从该日期开始
+        :param fill_gaps: 是否同时补齐已存储历史中间的缺口
+        :param reference_dates: 缺口检测使用的参考交易日历, 见 find_gaps
+        :param batch_size: 每批写入条数
+        :param backfill: 是否同时获取 start_date_str 到最早K线之前的部分
+        :param check_watermark: 是否重新获取高水位K线检查复权调整, 每只证券多一次在线请求
+        """
+        total = BulkUpsertResult()
+        for range_start, range_end in self.ranges_to_sync(symbol, end_date_str, start_date_str, fill_gaps,
+                                                          reference_dates, backfill, check_watermark):
+            total.merge(self.sync_k_data(symbol, range_start, range_end, batch_size))
+        return total
+
+    def bulk_upsert_k_data(self, k_data_df: pandas.DataFrame, batch_size: int = 1000) -> BulkUpsertResult:
+        """
+        按 (symbol, date) 批量写入K线数据
+        :param k_data_df: 在线接口返回的K线数据
+        :param batch_size: 每批写入条数
+        :return: BulkUpsertResult
+        """
+        if k_data_df is None or k_data_df.empty:
+            return BulkUpsertResult()
+        data_list = json.loads(k_data_df.to_json(orient='records'))
+        return self._mongo.bulk_upsert(data_list, ['symbol', 'date'], batch_size)
+
     @staticmethod
     def _parse(
             dict_obj: typing.Dict,
@@ -77,17 +341,52 @@ class StockXueqiuData:
         return [get(dict_obj, k) for k in return_column]
 
 
-def syn_data_2_mongo(symbol_list: List[str]):
-    stock = StockXueqiuData()
+def syn_data_2_mongo(
+        symbol_list: List[str],
+        batch_size: int = 1000,
+        end_date_str: str = None,
+        fill_gaps: bool = False,
+        reference_symbol: str = None,
+        downloader: KlineDownloader = None
+) -> BulkUpsertResult:
+    """
+    增量同步: 每只证券只获取最新K线之后(到 end_date_str, 默认今天)的数据
+    最新K线的收盘价与在线数据不一致(复权调整)时重新同步该证券的整个区间
+    :param fill_gaps: 是否补齐已存储历史中间的缺口
+    :param reference_symbol: 缺口检测使用该证券的K线日期作为交易日历, 例如 'SH000001'
+    :param downloader: 传入时所有证券并发下载, 每只证券下载完成后立即批量写入
+    """
+    ensure_registered_indexes()
+    stock = StockXueqiuData(downloader)
+    reference_dates = stock.get_stored_dates(reference_symbol) if fill_gaps and reference_symbol else None
+    total = BulkUpsertResult()
+
+    if downloader is not None:
+        tasks = [(s, start, end) for s in symbol_list
+                 for start, end in stock.ranges_to_sync(s, end_date_str, FULL_SYNC_START_DATE_STR, fill_gaps,
+                                                        reference_dates)]
+        for download_result in downloader.download(tasks, lambda df: stock.bulk_upsert_k_data(df, batch_size)):
+            if download_result.ok():
+                print("%s: %s" % (download_result.symbol, download_result.write_result))
+                total.merge(download_result.write_result)
+            else:
+                print("%s: failed %s" % (download_result.symbol, download_result))
+        return total
+
     for s in symbol_list:
-        stock.get_his_k_data(s, '2000-01-01', '2019-03-15', force_update=True)
+        result = stock.sync_k_data_incremental(s, end_date_str, FULL_SYNC_START_DATE_STR, fill_gaps,
+                                               reference_dates, batch_size)
+        print("%s: %s" % (s, result))
+        total.merge(result)
+    return total
 
 
 def load_data_2_csv_file(symbol_list: List[str], start_date: str, end_date: str, file_path_suffix: str):
     stock_data = StockXueqiuData()
+    all_df = stock_data.get_his_k_data_many(symbol_list, start_date, end_date).reset_index(level='symbol')
+    symbol_df = dict([(s, df) for s, df in all_df.groupby('symbol', sort=False)])
     for s in symbol_list:
-        df = stock_data.get_his_k_data(s, start_date, end_date, force_update=False)
+        df = symbol_df.get(s, all_df.iloc[0:0])
 
         file_path = s + file_path_suffix
         df.to_csv(file_path, mode='w')
-